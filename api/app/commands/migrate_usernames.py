@@ -0,0 +1,103 @@
+"""
+Backfill the usernames reservation index from existing users.
+
+    python -m app.commands.migrate_usernames [--dry-run] [--page-size 1000]
+
+Registration now reserves usernames/{username} with op_type=create, and
+/users/username/{username} resolves through it, so every user created
+before that change needs a reservation. Users are streamed in
+(created_at, username) order and reserved with one bulk `create` per
+page. Re-running is safe: a reservation that already points at the same
+user is skipped. If the old check-then-insert race ever let two users
+share a name, the oldest keeps it and the others are listed so they can
+be renamed by hand.
+
+Until this has run, serve with USERNAME_LEGACY_FALLBACK=true so those
+users can still be looked up and their names aren't registered again;
+unset it afterwards.
+"""
+
+import argparse
+import asyncio
+
+from app.database import close_es, get_es, init_es
+from app.main import SIMPLE_INDICES
+
+
+async def migrate(page_size: int, dry_run: bool) -> tuple[int, int, list[tuple[str, str]]]:
+    """Returns (users scanned, reservations created, [(username, losing user_id)])."""
+    es = get_es()
+    if not await es.indices.exists(index="usernames"):
+        await es.indices.create(index="usernames", **SIMPLE_INDICES["usernames"])
+
+    search_after = None
+    scanned = created = 0
+    duplicates = []
+
+    while True:
+        kwargs = {"search_after": search_after} if search_after else {}
+        result = await es.search(
+            index="users",
+            query={"match_all": {}},
+            sort=[{"created_at": {"order": "asc"}}, {"username": {"order": "asc"}}],
+            source=["username", "created_at"],
+            size=page_size,
+            **kwargs,
+        )
+        hits = result["hits"]["hits"]
+        if not hits:
+            break
+        scanned += len(hits)
+        search_after = hits[-1]["sort"]
+
+        operations = []
+        for hit in hits:
+            operations += [
+                {"create": {"_index": "usernames", "_id": hit["_source"]["username"]}},
+                {"user_id": hit["_id"], "created_at": hit["_source"]["created_at"]},
+            ]
+        if dry_run:
+            existing = await es.mget(index="usernames", ids=[h["_source"]["username"] for h in hits])
+            created += sum(1 for doc in existing["docs"] if not doc.get("found"))
+            continue
+
+        response = await es.bulk(operations=operations)
+        conflicted = []
+        for hit, item in zip(hits, response["items"]):
+            outcome = item["create"]
+            if outcome.get("status") == 409:
+                conflicted.append(hit)
+            elif "error" in outcome:
+                raise RuntimeError(f"Could not reserve {hit['_source']['username']}: {outcome['error']}")
+            else:
+                created += 1
+
+        if conflicted:
+            owners = await es.mget(index="usernames", ids=[h["_source"]["username"] for h in conflicted])
+            for hit, owner in zip(conflicted, owners["docs"]):
+                if owner["_source"]["user_id"] != hit["_id"]:
+                    duplicates.append((hit["_source"]["username"], hit["_id"]))
+
+    return scanned, created, duplicates
+
+
+async def main(page_size: int, dry_run: bool):
+    await init_es()
+    try:
+        scanned, created, duplicates = await migrate(page_size, dry_run)
+        verb = "would reserve" if dry_run else "reserved"
+        print(f"Scanned {scanned} users, {verb} {created} usernames")
+        if not dry_run and not duplicates:
+            print("Every user has a reservation: USERNAME_LEGACY_FALLBACK can be unset")
+        for username, user_id in duplicates:
+            print(f"  ! duplicate username {username!r}: user {user_id} has no reservation")
+    finally:
+        await close_es()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="count missing reservations without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.page_size, args.dry_run))
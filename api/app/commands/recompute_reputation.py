@@ -0,0 +1,144 @@
+"""
+Rebuild users.reputation from scratch out of the votes index.
+
+    python -m app.commands.recompute_reputation [--dry-run] [--page-size 1000]
+
+The votes index is streamed with a composite aggregation (one bucket per
+vote, keyed target-first so each page touches a contiguous run of targets).
+Each page resolves its targets' authors with a single mget. Users are then
+streamed in (created_at, username) order and only the ones whose stored
+reputation differs are rewritten, through _bulk.
+
+Votes that land while this runs are picked up by the incremental engine,
+but a user whose reputation changes between the vote scan and the user
+scan can be overwritten with the scanned value — run it at a quiet time.
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+
+from app.database import close_es, get_es, init_es
+from app.services.reputation import vote_reputation
+
+TARGET_INDICES = {"question": "questions", "answer": "answers"}
+
+
+async def compute_reputation(page_size: int) -> dict[str, int]:
+    """Stream every vote and sum the weighted reputation per content author."""
+    es = get_es()
+    reputation: dict[str, int] = defaultdict(int)
+    after_key = None
+    scanned = 0
+
+    while True:
+        composite = {
+            "size": page_size,
+            "sources": [
+                {"target_type": {"terms": {"field": "target_type"}}},
+                {"target_id": {"terms": {"field": "target_id"}}},
+                {"user_id": {"terms": {"field": "user_id"}}},
+                {"vote_type": {"terms": {"field": "vote_type"}}},
+            ],
+        }
+        if after_key:
+            composite["after"] = after_key
+        result = await es.search(
+            index="votes",
+            size=0,
+            aggs={"votes": {"composite": composite}},
+        )
+        buckets = result["aggregations"]["votes"]["buckets"]
+        if not buckets:
+            break
+
+        targets = list(dict.fromkeys((b["key"]["target_type"], b["key"]["target_id"]) for b in buckets))
+        authors = await _resolve_authors(targets)
+        for bucket in buckets:
+            key = bucket["key"]
+            author_id = authors.get((key["target_type"], key["target_id"]))
+            if not author_id or author_id == key["user_id"]:
+                continue
+            reputation[author_id] += vote_reputation(key["target_type"], key["vote_type"]) * bucket["doc_count"]
+
+        scanned += len(buckets)
+        print(f"  scanned {scanned} votes")
+        after_key = result["aggregations"]["votes"].get("after_key")
+        if not after_key:
+            break
+
+    return reputation
+
+
+async def _resolve_authors(targets: list[tuple[str, str]]) -> dict[tuple[str, str], str]:
+    targets = [target for target in targets if target[0] in TARGET_INDICES]
+    if not targets:
+        return {}
+    result = await get_es().mget(
+        docs=[
+            {"_index": TARGET_INDICES[target_type], "_id": target_id, "_source": ["author_id"]}
+            for target_type, target_id in targets
+        ]
+    )
+    return {
+        target: doc["_source"]["author_id"]
+        for target, doc in zip(targets, result["docs"])
+        if doc.get("found")
+    }
+
+
+async def write_reputation(reputation: dict[str, int], page_size: int, dry_run: bool) -> int:
+    """Stream users and rewrite the ones whose stored reputation is wrong."""
+    es = get_es()
+    search_after = None
+    corrected = 0
+
+    while True:
+        kwargs = {"search_after": search_after} if search_after else {}
+        result = await es.search(
+            index="users",
+            query={"match_all": {}},
+            sort=[{"created_at": {"order": "asc"}}, {"username": {"order": "asc"}}],
+            source=["reputation"],
+            size=page_size,
+            **kwargs,
+        )
+        hits = result["hits"]["hits"]
+        if not hits:
+            break
+
+        operations = []
+        for hit in hits:
+            expected = reputation.get(hit["_id"], 0)
+            if hit["_source"].get("reputation", 0) != expected:
+                operations += [
+                    {"update": {"_index": "users", "_id": hit["_id"]}},
+                    {"doc": {"reputation": expected}},
+                ]
+        if operations and not dry_run:
+            await es.bulk(operations=operations)
+        corrected += len(operations) // 2
+        search_after = hits[-1]["sort"]
+
+    return corrected
+
+
+async def main(page_size: int, dry_run: bool):
+    await init_es()
+    try:
+        print("Computing reputation from votes...")
+        reputation = await compute_reputation(page_size)
+        print(f"  {len(reputation)} authors have received votes")
+        corrected = await write_reputation(reputation, page_size, dry_run)
+        verb = "would correct" if dry_run else "corrected"
+        print(f"Done: {verb} {corrected} users")
+    finally:
+        await close_es()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="report corrections without writing them")
+    args = parser.parse_args()
+    asyncio.run(main(args.page_size, args.dry_run))
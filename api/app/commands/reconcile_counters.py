@@ -0,0 +1,326 @@
+"""
+Rebuild the denormalized counters from the source-of-truth indices.
+
+    python -m app.commands.reconcile_counters [--dry-run] [--restart]
+        [--page-size 500] [--max-docs-per-second 2000] [--settle-seconds 2]
+        [--only questions,answers]
+
+Counters and where they come from:
+    questions  upvote_count / downvote_count / score  ← votes (target_type=question)
+               answer_count                          ← answers.question_id
+    answers    upvote_count / downvote_count / score  ← votes (target_type=answer)
+    forums     question_count                        ← questions.forum_id
+    users      question_count                        ← questions.author_id
+               answer_count                          ← answers.author_id
+
+Each counter-carrying index is streamed in pages (point-in-time +
+search_after, oldest first). For every page, one msearch runs a composite
+aggregation per source restricted to that page's ids, and the expected
+values are diffed against the stored ones.
+
+Neither side of that diff is live: the page comes from the point-in-time
+snapshot, and the aggregations only see refreshed writes. So a document
+that looks drifted is re-checked before it is touched: it is re-read
+with a realtime mget (current counters + _seq_no), then, --settle-seconds
+later (longer than the index refresh interval, so every source write
+counted in that read is searchable), its counters are recomputed and
+written only if the document is still at the _seq_no that was read
+(if_seq_no/if_primary_term). A live counter update in between fails that
+condition; the document is skipped and reported, for a later run.
+
+Running against live traffic:
+- Resumable: progress (the created_at of the last finished page per
+  index) is checkpointed to --checkpoint after every page. A rerun picks
+  up from there unless --restart is given. Re-processing a page is
+  harmless: a counter that is already right gets no correction.
+- Rate-limited: --max-docs-per-second paces the scan so the extra search
+  load stays flat instead of bursting.
+- Not covered: increments that are owed but not yet applied — deltas
+  buffered by VOTE_WRITE_BEHIND, or increment jobs still queued (e.g.
+  while ES was failing them) — look like drift, and land on top of the
+  correction later. Check that the job queue is drained
+  (jobs.sqlite3 has no pending rows) and run with VOTE_WRITE_BEHIND off,
+  or at a quiet time.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.database import close_es, get_es, init_es
+from app.services.counters import SCORED_INDICES
+
+# index → the aggregations that rebuild its counters. `split` turns one
+# source into several counters keyed by that field's value.
+RECONCILE_PLAN = {
+    "questions": [
+        {
+            "index": "votes",
+            "key": "target_id",
+            "filter": {"term": {"target_type": "question"}},
+            "split": "vote_type",
+            "fields": {"up": "upvote_count", "down": "downvote_count"},
+        },
+        {"index": "answers", "key": "question_id", "fields": "answer_count"},
+    ],
+    "answers": [
+        {
+            "index": "votes",
+            "key": "target_id",
+            "filter": {"term": {"target_type": "answer"}},
+            "split": "vote_type",
+            "fields": {"up": "upvote_count", "down": "downvote_count"},
+        },
+    ],
+    "forums": [
+        {"index": "questions", "key": "forum_id", "fields": "question_count"},
+    ],
+    "users": [
+        {"index": "questions", "key": "author_id", "fields": "question_count"},
+        {"index": "answers", "key": "author_id", "fields": "answer_count"},
+    ],
+}
+
+
+def _counter_fields(index: str) -> list[str]:
+    fields = []
+    for source in RECONCILE_PLAN[index]:
+        spec = source["fields"]
+        fields += list(spec.values()) if isinstance(spec, dict) else [spec]
+    if index in SCORED_INDICES:
+        fields.append("score")
+    return fields
+
+
+def _composite_size(source: dict, ids: list[str]) -> int:
+    """Enough buckets for the whole page in one go: one per id (per split value)."""
+    return len(ids) * (len(source["fields"]) if source.get("split") else 1)
+
+
+def _composite_body(source: dict, ids: list[str], after: dict | None = None) -> dict:
+    filters = [{"terms": {source["key"]: ids}}]
+    if source.get("filter"):
+        filters.append(source["filter"])
+    sources = [{"key": {"terms": {"field": source["key"]}}}]
+    if source.get("split"):
+        sources.append({"split": {"terms": {"field": source["split"]}}})
+    composite = {"size": _composite_size(source, ids), "sources": sources}
+    if after:
+        composite["after"] = after
+    return {
+        "size": 0,
+        "query": {"bool": {"filter": filters}},
+        "aggs": {"counts": {"composite": composite}},
+    }
+
+
+async def expected_counters(index: str, ids: list[str]) -> dict[str, dict[str, int]]:
+    """Recompute every counter of the given documents with one msearch."""
+    es = get_es()
+    expected = {doc_id: {field: 0 for field in _counter_fields(index)} for doc_id in ids}
+    plan = RECONCILE_PLAN[index]
+
+    searches = []
+    for source in plan:
+        searches += [{"index": source["index"]}, _composite_body(source, ids)]
+    responses = (await es.msearch(searches=searches))["responses"]
+
+    for source, response in zip(plan, responses):
+        while True:
+            if "error" in response:
+                raise RuntimeError(f"Aggregation on {source['index']} failed: {response['error']}")
+            agg = response["aggregations"]["counts"]
+            for bucket in agg["buckets"]:
+                doc_id = bucket["key"]["key"]
+                if source.get("split"):
+                    field = source["fields"].get(bucket["key"]["split"])
+                else:
+                    field = source["fields"]
+                if field and doc_id in expected:
+                    expected[doc_id][field] += bucket["doc_count"]
+            # A page normally fits in one composite page; follow after_key if not
+            if len(agg["buckets"]) < _composite_size(source, ids):
+                break
+            response = await es.search(
+                index=source["index"], **_composite_body(source, ids, agg["after_key"])
+            )
+
+    if index in SCORED_INDICES:
+        for counters in expected.values():
+            counters["score"] = counters["upvote_count"] - counters["downvote_count"]
+    return expected
+
+
+def _drifted(hits: list[dict], expected: dict[str, dict[str, int]]) -> list[str]:
+    """Ids whose stored counters differ from the expected ones (missing counts as 0)."""
+    return [
+        hit["_id"]
+        for hit in hits
+        if any((hit["_source"].get(field) or 0) != value for field, value in expected[hit["_id"]].items())
+    ]
+
+
+async def _correct(index: str, ids: list[str], settle_seconds: float, dry_run: bool) -> tuple[int, int]:
+    """
+    Re-check documents that looked drifted and fix the ones that still are.
+
+    Returns (corrected, skipped): skipped documents had a live counter
+    update while they were being checked.
+    """
+    es = get_es()
+    current = (await es.mget(index=index, ids=ids, source=_counter_fields(index)))["docs"]
+    current = [doc for doc in current if doc.get("found")]
+    await asyncio.sleep(settle_seconds)
+    expected = await expected_counters(index, [doc["_id"] for doc in current])
+
+    operations = []
+    for doc in current:
+        want = expected[doc["_id"]]
+        changes = {
+            field: (doc["_source"].get(field), value)
+            for field, value in want.items()
+            if doc["_source"].get(field) != value
+        }
+        if not changes:
+            continue  # it was only lagging
+        if dry_run:
+            print(f"    {index}/{doc['_id']}: " + ", ".join(f"{f} {a} → {b}" for f, (a, b) in changes.items()))
+        operations += [
+            {
+                "update": {
+                    "_index": index,
+                    "_id": doc["_id"],
+                    "if_seq_no": doc["_seq_no"],
+                    "if_primary_term": doc["_primary_term"],
+                }
+            },
+            {"doc": want},
+        ]
+    if dry_run or not operations:
+        return len(operations) // 2, 0
+
+    result = await es.bulk(operations=operations)
+    skipped = sum(1 for item in result["items"] if "error" in item["update"])
+    return len(operations) // 2 - skipped, skipped
+
+
+class Checkpoint:
+    """Per-index scan progress persisted as JSON between runs."""
+
+    def __init__(self, path: str, restart: bool):
+        self.path = path
+        self.state: dict = {}
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def resume_from(self, index: str) -> str | None:
+        return self.state.get(index, {}).get("created_at")
+
+    def is_done(self, index: str) -> bool:
+        return self.state.get(index, {}).get("done", False)
+
+    def save(self, index: str, created_at: str | None, done: bool = False) -> None:
+        self.state[index] = {"created_at": created_at, "done": done}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+async def reconcile_index(
+    index: str,
+    checkpoint: Checkpoint,
+    page_size: int,
+    max_docs_per_second: float,
+    settle_seconds: float,
+    dry_run: bool,
+) -> tuple[int, int, int]:
+    """Stream one index and correct its counters. Returns (scanned, corrected, skipped)."""
+    es = get_es()
+    resume_from = checkpoint.resume_from(index)
+    query = {"range": {"created_at": {"gte": resume_from}}} if resume_from else {"match_all": {}}
+
+    pit = await es.open_point_in_time(index=index, keep_alive="5m")
+    pit_id = pit["id"]
+    search_after = None
+    scanned = corrected = skipped = 0
+    started = time.monotonic()
+
+    try:
+        while True:
+            kwargs = {"search_after": search_after} if search_after else {}
+            result = await es.search(
+                pit={"id": pit_id, "keep_alive": "5m"},
+                query=query,
+                sort=[{"created_at": {"order": "asc"}}, {"_shard_doc": {"order": "asc"}}],
+                source=_counter_fields(index) + ["created_at"],
+                size=page_size,
+                **kwargs,
+            )
+            pit_id = result.get("pit_id", pit_id)
+            hits = result["hits"]["hits"]
+            if not hits:
+                break
+
+            expected = await expected_counters(index, [hit["_id"] for hit in hits])
+            drifted = _drifted(hits, expected)
+            if drifted:
+                fixed, busy = await _correct(index, drifted, settle_seconds, dry_run)
+                corrected += fixed
+                skipped += busy
+            scanned += len(hits)
+            search_after = hits[-1]["sort"]
+            if not dry_run:
+                checkpoint.save(index, hits[-1]["_source"]["created_at"])
+
+            # Pace the scan: never run ahead of the configured docs/second
+            ahead = scanned / max_docs_per_second - (time.monotonic() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+    finally:
+        await es.close_point_in_time(id=pit_id)
+
+    if not dry_run:
+        checkpoint.save(index, None, done=True)
+    return scanned, corrected, skipped
+
+
+async def main(args):
+    await init_es()
+    checkpoint = Checkpoint(args.checkpoint, args.restart)
+    indices = args.only.split(",") if args.only else list(RECONCILE_PLAN)
+    try:
+        for index in indices:
+            if checkpoint.is_done(index):
+                print(f"{index}: already reconciled (use --restart to run again)")
+                continue
+            print(f"{index}: reconciling {', '.join(_counter_fields(index))}...")
+            scanned, corrected, skipped = await reconcile_index(
+                index, checkpoint, args.page_size, args.max_docs_per_second, args.settle_seconds, args.dry_run
+            )
+            verb = "would correct" if args.dry_run else "corrected"
+            print(f"{index}: scanned {scanned}, {verb} {corrected}, skipped {skipped} updated meanwhile")
+        if all(checkpoint.is_done(index) for index in RECONCILE_PLAN):
+            os.remove(args.checkpoint)
+    finally:
+        await close_es()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--max-docs-per-second", type=float, default=2000)
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=2.0,
+        help="wait before recomputing a drifted document (> the index refresh interval)",
+    )
+    parser.add_argument("--checkpoint", default=".reconcile_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--only", help="comma-separated subset of: " + ", ".join(RECONCILE_PLAN))
+    parser.add_argument("--dry-run", action="store_true", help="print corrections without writing them")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""
+Run the API, with one or more worker processes.
+
+    python -m app.commands.serve [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+One worker is plain uvicorn. With several, uvicorn forks them from this
+process and this process also runs the CacheHub (app/services/cache.py)
+on CACHE_SOCKET_PATH, and the workers are started with
+CACHE_BACKEND=socket. Through it they share cached API key metadata,
+username lookups and search pages, and pass each other their forum
+catalog, leaderboard and /stats updates, so responses agree no matter
+which worker serves them.
+
+Still per worker: rate limit buckets (each worker grants the full
+budget, so the effective limit is up to `workers` times the setting),
+write-behind vote and reputation buffers (each flushes its own),
+/stats/stream subscriber caps and /metrics counters.
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+
+import uvicorn
+
+from app.config import settings
+from app.services.cache import CacheHub
+
+
+def start_hub(path: str, max_entries: int) -> None:
+    """Run a CacheHub on its own event loop in a daemon thread; returns once it listens."""
+    ready = threading.Event()
+
+    async def run():
+        hub = CacheHub(path, max_entries)
+        await hub.start()
+        ready.set()
+        await asyncio.Event().wait()  # until the process exits
+
+    threading.Thread(target=asyncio.run, args=(run(),), name="cache-hub", daemon=True).start()
+    if not ready.wait(timeout=5):
+        raise RuntimeError(f"Cache hub did not start on {path}")
+
+
+def main(host: str, port: int, workers: int) -> None:
+    if workers > 1:
+        start_hub(settings.cache_socket_path, settings.cache_local_max_entries)
+        print(f"Cache hub listening on {settings.cache_socket_path}")
+        # Inherited by the worker processes
+        os.environ["CACHE_BACKEND"] = "socket"
+        os.environ["CACHE_SOCKET_PATH"] = settings.cache_socket_path
+    # The client address (rate limit key, logs) comes from X-Forwarded-For
+    # when the peer is a trusted proxy
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+        help="worker processes (default: $WEB_CONCURRENCY or 1)",
+    )
+    args = parser.parse_args()
+    main(args.host, args.port, args.workers)
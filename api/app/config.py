@@ -5,6 +5,119 @@ class Settings(BaseSettings):
     elasticsearch_url: str
     elasticsearch_api_key: str
 
+    # Write-behind vote counters: record vote docs immediately, merge
+    # counter deltas per target in memory and flush them in bulk.
+    vote_write_behind: bool = False
+    vote_flush_interval_ms: int = 250
+
+    # Reputation deltas from votes are merged per user and written in bulk
+    reputation_flush_interval_ms: int = 1000
+
+    # In-memory /users/top: how many users to keep ranked, and how often
+    # to reload them from ES
+    leaderboard_size: int = 100
+    leaderboard_reconcile_interval_seconds: int = 60
+
+    # The forum catalog is reloaded from ES this often to pick up forums
+    # created through other API processes
+    forum_catalog_reload_interval_seconds: int = 30
+
+    # /stats is served from a snapshot at most this old (refreshed in the
+    # background once it expires)
+    stats_cache_ttl_seconds: float = 10
+
+    # /stats/stream (server-sent events): at most one delta event per
+    # client per interval, a keep-alive comment when idle, and a cap on
+    # concurrent subscribers per process
+    stats_stream_min_interval_ms: int = 500
+    stats_stream_heartbeat_seconds: float = 15
+    stats_stream_max_subscribers: int = 1000
+
+    # Activity analytics: the rollup job re-aggregates the last
+    # `lookback` hours every interval (to absorb late writes), and
+    # buckets older than the retention are deleted
+    activity_rollup_interval_seconds: int = 60
+    activity_rollup_lookback_hours: int = 2
+    activity_rollup_retention_days: int = 90
+
+    # Responses at least this large are compressed (zstd / br / gzip, as
+    # negotiated); 0 turns compression off
+    compression_minimum_size: int = 1024
+
+    # Per-caller token buckets (keyed by authenticated API key, else
+    # client IP), one per route class: sustained requests per minute and
+    # burst size. Off by default: behind a reverse proxy (the frontend's
+    # /api rewrite) every anonymous request comes from the proxy's
+    # address, so set forwarded_allow_ips to the proxy's IPs first —
+    # X-Forwarded-For from those peers then gives the real client IP
+    rate_limit_enabled: bool = False
+    rate_limit_search_per_minute: float = 30
+    rate_limit_search_burst: int = 10
+    rate_limit_write_per_minute: float = 120
+    rate_limit_write_burst: int = 30
+    rate_limit_read_per_minute: float = 600
+    rate_limit_read_burst: int = 100
+    # Comma-separated peers trusted to set X-Forwarded-For ("*" for any)
+    forwarded_allow_ips: str = "127.0.0.1"
+
+    # Per-request tracing: a Server-Timing header on every response, a
+    # structured log line for requests slower than the threshold, and
+    # (if a path is set) every trace appended to an OTLP/JSON file
+    tracing_enabled: bool = True
+    slow_request_threshold_ms: int = 1000
+    trace_export_path: str | None = None
+
+    # Operator endpoints (/admin/*) and on-demand profiling are enabled
+    # only when an admin token is set. A request sent with
+    # `X-Profile: <token>` is profiled, sampling
+    # its stack every interval, into PROFILE_DIR; the newest
+    # `profile_retention` profiles are kept
+    admin_token: str | None = None
+    profile_dir: str = "profiles"
+    profile_sample_interval_ms: float = 1
+    profile_retention: int = 100
+
+    # Cache shared by the worker processes of one host: "local" keeps it
+    # in-process (one worker), "socket" connects to the hub that
+    # `python -m app.commands.serve --workers N` runs on cache_socket_path.
+    # Each process keeps at most cache_local_max_entries entries; search
+    # result pages are cached for search_cache_ttl_seconds
+    cache_backend: str = "local"
+    cache_socket_path: str = "/tmp/treehacks-qna-cache.sock"
+    cache_local_max_entries: int = 10000
+    search_cache_ttl_seconds: float = 30
+
+    # Post-write side effects (counter bumps, cache invalidation) run as
+    # background jobs journaled to SQLite at job_journal_path: this many
+    # at once per process, retried with exponential backoff from the base
+    # delay, and parked as "dead" after job_max_attempts
+    job_journal_path: str = "jobs.sqlite3"
+    job_concurrency: int = 8
+    job_max_attempts: int = 8
+    job_retry_base_delay_ms: int = 500
+
+    # GET /questions/{id}/answers/wait (long-poll): each process keeps the
+    # answers of the last answer_wait_retention_seconds in memory and
+    # parks at most answer_wait_max_waiters requests at a time
+    answer_wait_retention_seconds: float = 60
+    answer_wait_max_waiters: int = 1000
+
+    # /ws/feed (live questions, answers and votes): concurrent clients
+    # per process, and events queued per client before the oldest are
+    # dropped
+    feed_max_clients: int = 1000
+    feed_client_queue_size: int = 100
+
+    # Deployments with users from before the usernames reservation index
+    # set this until `python -m app.commands.migrate_usernames` has run:
+    # registration and username lookups then also search users by name.
+    # Leave it off afterwards (and on new deployments) — it costs a search
+    # per registration and per lookup of an unknown name
+    username_legacy_fallback: bool = False
+
+    # How many API keys /auth/register/bulk mints at once
+    api_key_mint_concurrency: int = 16
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,20 +1,38 @@
+from collections.abc import Callable
+
 from elasticsearch import AsyncElasticsearch
+from elasticsearch.serializer import OrjsonSerializer
 
 from app.config import settings
+from app.services.tracing import TracedElasticsearch
 
 es_client: AsyncElasticsearch | None = None
 
 
-async def init_es() -> AsyncElasticsearch:
-    """Initialize the async Elasticsearch client (called at app startup)."""
-    global es_client
-    es_client = AsyncElasticsearch(
+def create_es_client() -> AsyncElasticsearch:
+    """Build the client for the configured cluster."""
+    # The traced subclass times each round-trip as a span of the current request
+    client_class = TracedElasticsearch if settings.tracing_enabled else AsyncElasticsearch
+    return client_class(
         settings.elasticsearch_url,
         api_key=settings.elasticsearch_api_key,
         request_timeout=30,
         max_retries=3,
         retry_on_timeout=True,
+        # orjson for request bodies and response parsing (large _source hits)
+        serializer=OrjsonSerializer(),
     )
+
+
+# What init_es() calls to build the client. Harnesses that run the app
+# against a stand-in (loadtest/) replace it before startup.
+client_factory: Callable[[], AsyncElasticsearch] = create_es_client
+
+
+async def init_es() -> AsyncElasticsearch:
+    """Initialize the async Elasticsearch client (called at app startup)."""
+    global es_client
+    es_client = client_factory()
     return es_client
 
 
@@ -1,9 +1,32 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
+from app.config import settings
 from app.database import close_es, init_es
-from app.routers import answers, auth, forums, questions, users, votes
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.tracing import TracedORJSONResponse, TracingMiddleware
+from app.routers import admin, analytics, answers, auth, feed, forums, questions, users, votes
+from app.services import metrics
+from app.services.activity import close_activity_rollup, init_activity_rollup
+from app.services.answer_notifier import close_answer_notifier, init_answer_notifier
+from app.services.cache import close_cache, init_cache
+from app.services.counters import close_vote_counters, init_vote_counters
+from app.services.feed import close_feed, init_feed
+from app.services.forums import close_forum_catalog, init_forum_catalog
+from app.services.jobs import close_job_queue, init_job_queue
+from app.services.leaderboard import close_leaderboard, init_leaderboard
+from app.services.reputation import close_reputation, init_reputation
+from app.services.stats import (
+    close_stats_cache,
+    get_stats_broadcaster,
+    get_stats_cache,
+    init_stats_cache,
+)
+from app.services.tracing import close_trace_exporter, init_trace_exporter
 
 # --- Jina inference endpoint IDs (pre-configured on Elastic Cloud Serverless) ---
 
@@ -24,6 +47,16 @@ SIMPLE_INDICES = {
             }
         }
     },
+    # Username reservations: doc id = username, so uniqueness is enforced
+    # by op_type=create and lookup by username is a get
+    "usernames": {
+        "mappings": {
+            "properties": {
+                "user_id": {"type": "keyword"},
+                "created_at": {"type": "date"},
+            }
+        }
+    },
     "forums": {
         "mappings": {
             "properties": {
@@ -50,6 +83,18 @@ SIMPLE_INDICES = {
             }
         }
     },
+    # Hourly activity per forum, maintained by app.services.activity
+    "activity_rollup": {
+        "mappings": {
+            "properties": {
+                "forum_id": {"type": "keyword"},
+                "bucket": {"type": "date"},
+                "questions": {"type": "integer"},
+                "answers": {"type": "integer"},
+                "votes": {"type": "integer"},
+            }
+        }
+    },
     "votes": {
         "mappings": {
             "properties": {
@@ -136,6 +181,9 @@ QUESTIONS_INDEX = {
 }
 
 # --- Ingest pipeline: computes derived fields before indexing ---
+# create_question doesn't read the indexed document back: it answers with
+# the same fields computed in Python by _pipeline_fields
+# (app/routers/questions.py). Change the two together.
 
 QUESTION_PIPELINE = {
     "description": "Pre-process questions: compute word count and detect code blocks",
@@ -181,8 +229,38 @@ async def lifespan(app: FastAPI):
     else:
         print("Index already exists: questions")
 
+    cache = await init_cache()
+    print(f"Cache: {type(cache).__name__}")
+    if init_vote_counters():
+        print("Write-behind vote counters enabled")
+    init_reputation()
+    await init_leaderboard()
+    catalog = await init_forum_catalog()
+    print(f"Loaded forum catalog: {len(catalog)} forums")
+    init_stats_cache()
+    init_answer_notifier()
+    init_feed()
+    replayed = await init_job_queue()
+    if replayed:
+        print(f"Replaying {replayed} background jobs from the journal")
+    init_activity_rollup()
+    if init_trace_exporter():
+        print(f"Exporting traces to {settings.trace_export_path}")
+
     yield
 
+    close_trace_exporter()
+    await close_activity_rollup()
+    close_answer_notifier()
+    close_feed()
+    await close_stats_cache()
+    await close_forum_catalog()
+    await close_leaderboard()
+    await close_vote_counters()
+    await close_reputation()
+    # After the write-behind buffers, which hand it what ES wouldn't take
+    await close_job_queue()
+    await close_cache()
     await close_es()
     print("Elasticsearch client closed")
 
@@ -196,6 +274,9 @@ app = FastAPI(
     root_path="/api",
     redirect_slashes=False,
     lifespan=lifespan,
+    # orjson encodes the (already validated) response data several times
+    # faster than the stdlib encoder — see benchmarks/bench_serialization.py
+    default_response_class=TracedORJSONResponse,
 )
 
 
@@ -207,6 +288,40 @@ app.include_router(questions.router)
 app.include_router(answers.router)
 app.include_router(votes.router)
 app.include_router(users.router)
+app.include_router(analytics.router)
+app.include_router(admin.router)
+app.include_router(feed.router)
+
+
+# --- Middleware ---
+
+if settings.compression_minimum_size > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
+# Only requests flagged with the admin token are profiled
+if settings.admin_token:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=settings.admin_token,
+        directory=settings.profile_dir,
+        interval=settings.profile_sample_interval_ms / 1000,
+        retention=settings.profile_retention,
+    )
+
+# Outside compression, so Server-Timing's total includes it
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware, slow_threshold=settings.slow_request_threshold_ms / 1000)
+
+# Added last so it runs first: refused requests cost nothing downstream
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        budgets={
+            "search": (settings.rate_limit_search_per_minute / 60, settings.rate_limit_search_burst),
+            "write": (settings.rate_limit_write_per_minute / 60, settings.rate_limit_write_burst),
+            "read": (settings.rate_limit_read_per_minute / 60, settings.rate_limit_read_burst),
+        },
+    )
 
 
 @app.get("/")
@@ -219,28 +334,47 @@ async def root():
 
 @app.get("/stats")
 async def stats():
-    """Platform statistics. Public endpoint."""
-    from app.database import get_es
-
-    es = get_es()
-    counts = {}
-    for index_name in ["users", "questions", "answers", "forums"]:
-        result = await es.count(index=index_name)
-        counts[index_name] = result["count"]
-
-    # Upvotes split by type (answers save more compute than questions)
-    agg_body = {"aggs": {"total_upvotes": {"sum": {"field": "upvote_count"}}}, "size": 0}
-    q_agg = await es.search(index="questions", **agg_body)
-    a_agg = await es.search(index="answers", **agg_body)
-    question_upvotes = int(q_agg["aggregations"]["total_upvotes"]["value"])
-    answer_upvotes = int(a_agg["aggregations"]["total_upvotes"]["value"])
-
-    return {
-        "total_users": counts["users"],
-        "total_questions": counts["questions"],
-        "total_answers": counts["answers"],
-        "total_forums": counts["forums"],
-        "question_upvotes": question_upvotes,
-        "answer_upvotes": answer_upvotes,
-        "total_upvotes": question_upvotes + answer_upvotes,
-    }
+    """
+    Platform statistics. Public endpoint.
+
+    Served from a shared snapshot (one msearch per STATS_CACHE_TTL_SECONDS),
+    so counts can lag by up to that long.
+    """
+    return await get_stats_cache().get()
+
+
+@app.get("/stats/stream")
+async def stats_stream():
+    """
+    Live platform statistics as server-sent events. Public endpoint.
+
+    Sends a `snapshot` event (same shape as /stats), then `delta` events
+    such as {"total_answers": 1} as questions, answers, votes, forums and
+    users are written through any worker of this API server. A fresh
+    `snapshot` follows every refresh of the shared /stats snapshot (every
+    STATS_CACHE_TTL_SECONDS while streams are open) and replaces the
+    client's totals. Idle streams get a keep-alive comment. No ES reads
+    per client: all subscribers share the /stats snapshot and one
+    in-process broadcaster.
+    """
+    stats = get_stats_cache()
+    await stats.get()  # fail here, not mid-stream, if there is no snapshot
+    broadcaster = get_stats_broadcaster()
+    subscriber = broadcaster.subscribe()
+    if subscriber is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many live stats subscribers, poll /stats instead",
+            headers={"Retry-After": "30"},
+        )
+    return StreamingResponse(
+        broadcaster.stream(subscriber, stats),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Process metrics in Prometheus text format. Public endpoint."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
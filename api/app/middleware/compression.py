@@ -0,0 +1,242 @@
+"""
+Negotiated response compression (zstd, brotli, gzip) as pure ASGI middleware.
+
+Unlike Starlette's GZipMiddleware this picks the best encoding the client
+accepts, compresses streamed bodies chunk by chunk, and keeps conditional
+requests working: a compressed response gets its own strong ETag (the
+encoding is appended inside the quotes, "abc" → "abc-br"), and If-None-Match
+tags carrying such a suffix are stripped again before the app sees them, so
+handlers keep comparing against their plain ETags.
+
+brotli and zstandard are optional; without them only gzip is offered.
+"""
+
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Levels tuned for throughput rather than ratio: past these the CPU cost
+# climbs steeply for a few percent fewer bytes (benchmarks/bench_compression.py)
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+# Streams that must reach the client event by event
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Server preference, best first, among the encodings that are installed
+ENCODERS = {
+    name: encoder
+    for name, encoder, available in [
+        ("zstd", _Zstd, zstandard is not None),
+        ("br", _Brotli, brotli is not None),
+        ("gzip", _Gzip, True),
+    ]
+    if available
+}
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Pick the encoding to use for an Accept-Encoding header, or None."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _strip_suffixes(if_none_match: str) -> tuple[str, str | None]:
+    """Remove our encoding suffix from each tag; also return the suffix seen."""
+    tags, seen = [], None
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        for name in ENCODERS:
+            suffix = f'-{name}"'
+            if tag.endswith(suffix) and not tag.startswith("W/"):
+                tag = tag[: -len(suffix)] + '"'
+                seen = name
+                break
+        tags.append(tag)
+    return ", ".join(tags), seen
+
+
+def _suffix_etag(headers: MutableHeaders, encoding: str) -> None:
+    etag = headers.get("etag")
+    if etag and etag.endswith('"') and not etag.startswith("W/"):
+        headers["etag"] = f'{etag[:-1]}-{encoding}"'
+
+
+def _add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate(headers.get("accept-encoding", ""))
+
+        # Hand the app the plain ETags it issued
+        revalidated_as = None
+        if "if-none-match" in headers:
+            stripped, revalidated_as = _strip_suffixes(headers["if-none-match"])
+            scope = dict(scope)
+            scope["headers"] = [
+                (key, stripped.encode("latin-1") if key == b"if-none-match" else value)
+                for key, value in scope["headers"]
+            ]
+
+        if encoding is None and revalidated_as is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, revalidated_as, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    """Wraps `send`: decides on the first body chunk whether to compress."""
+
+    def __init__(self, send: Send, encoding: str | None, revalidated_as: str | None, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.revalidated_as = revalidated_as
+        self.minimum_size = minimum_size
+        self.start: Message | None = None
+        self.started = False
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(raw=message["headers"])
+            if message["status"] == 304:
+                # Keep the validator the client holds: re-add the suffix it sent
+                if self.revalidated_as:
+                    _suffix_etag(headers, self.revalidated_as)
+                self.passthrough = True
+                await self.send(message)
+                return
+            content_type = headers.get("content-type", "")
+            if (
+                self.encoding is None
+                or message["status"] < 200
+                or message["status"] in (204, 206)
+                or "content-encoding" in headers
+                or content_type.startswith(EXCLUDED_TYPES)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.minimum_size:
+                # Small enough that compression isn't worth it
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["content-encoding"] = self.encoding
+            _add_vary(headers)
+            _suffix_etag(headers, self.encoding)
+            if "content-length" in headers:
+                del headers["content-length"]
+            self.encoder = ENCODERS[self.encoding]()
+
+        if more_body:
+            chunk = self.encoder.compress(body)
+            if not self.started:
+                await self.send(self.start)
+                self.started = True
+            if chunk:
+                await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+            return
+
+        compressed = self.encoder.compress(body) + self.encoder.finish()
+        if not self.started:
+            # Single-message body: we know the final length
+            MutableHeaders(raw=self.start["headers"])["content-length"] = str(len(compressed))
+            await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
@@ -0,0 +1,81 @@
+"""
+Profile one request on demand, as pure ASGI middleware.
+
+A request carrying the admin token in `X-Profile: <ADMIN_TOKEN>` runs
+under a SamplingProfiler (app/services/profiler.py); the profile is saved
+to PROFILE_DIR and its id returned in an X-Profile-Id response header.
+Browse them at GET /admin/profiles. Only a header: a query parameter
+would leave the admin token in access logs and browser history.
+
+Other requests only pay for the flag check. The middleware is not
+installed at all unless ADMIN_TOKEN is set.
+"""
+
+import asyncio
+import hmac
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.profiler import SamplingProfiler, new_profile_id, prune_profiles, save_profile
+
+PROFILE_HEADER = b"x-profile"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, token: str, directory: str, interval: float, retention: int):
+        self.app = app
+        self.token = token
+        self.directory = directory
+        self.interval = interval
+        self.retention = retention
+
+    def _flag(self, scope: Scope) -> bytes | None:
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                return value
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        flag = self._flag(scope)
+        if flag is None or not hmac.compare_digest(flag, self.token.encode()):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(self.interval)
+        profile_id = new_profile_id()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            duration = time.perf_counter() - started
+            await asyncio.to_thread(
+                self._save,
+                profile_id,
+                profiler,
+                duration,
+                method=scope["method"],
+                path=scope["path"],
+                query=scope.get("query_string", b"").decode("latin-1"),
+                status=status,
+                user_agent=Headers(scope=scope).get("user-agent"),
+            )
+
+    def _save(self, profile_id: str, profiler: SamplingProfiler, duration: float, **request) -> None:
+        save_profile(self.directory, profile_id, profiler, duration, **request)
+        prune_profiles(self.directory, self.retention)
@@ -0,0 +1,169 @@
+"""
+Per-caller token-bucket rate limiting, as pure ASGI middleware.
+
+Every request is charged one token from the bucket of (caller, route
+class). Callers are identified by their API key (never stored: only a
+64-bit blake2b digest of it) or, for anonymous requests, by client IP.
+Route classes have separate budgets because their cost differs by orders
+of magnitude:
+
+    search  GET .../questions/search   two embeddings + a rerank per call
+    write   POST / PUT / PATCH / DELETE
+    read    everything else
+
+An empty bucket answers 429 with Retry-After (seconds until one token is
+back) before the request reaches the app, so a misbehaving agent is shed
+without costing ES anything.
+
+Buckets live in two flat float arrays (tokens, last refill time) indexed
+through one dict of int keys — about 130 bytes per active bucket, so tens
+of thousands of callers fit in a few MB. A bucket that has refilled to
+capacity is indistinguishable from a new one, so a periodic sweep frees
+those slots for reuse.
+"""
+
+import hashlib
+import math
+import time
+from array import array
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services import metrics
+
+ROUTE_CLASSES = ("search", "write", "read")
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Prometheus scrapes are never limited
+EXEMPT_PATHS = ("/metrics",)
+SWEEP_INTERVAL = 60.0
+# Digests of API keys seen to authenticate, least recently used first
+VERIFIED_KEYS_SIZE = 100_000
+
+_verified: OrderedDict[int, None] = OrderedDict()
+
+
+def route_class(method: str, path: str) -> str:
+    if method in WRITE_METHODS:
+        return "write"
+    if path.endswith("/questions/search"):
+        return "search"
+    return "read"
+
+
+def _digest(material: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(material, digest_size=8).digest(), "big")
+
+
+def mark_verified(token: str) -> None:
+    """Record that an API key authenticated, so its requests get their own buckets."""
+    key = _digest(b"k:" + token.strip().encode())
+    _verified[key] = None
+    _verified.move_to_end(key)
+    if len(_verified) > VERIFIED_KEYS_SIZE:
+        _verified.popitem(last=False)
+
+
+def caller_key(scope: Scope) -> int:
+    """64-bit id of the caller: digest of a verified bearer token, else of the client IP."""
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        key = _digest(b"k:" + token.strip().encode())
+        if key in _verified:
+            return key
+    client = scope.get("client")
+    return _digest(b"ip:" + (client[0] if client else "").encode())
+
+
+class TokenBuckets:
+    """
+    Token buckets for many (caller, class) pairs in flat arrays.
+
+    `budgets` maps each route class to (tokens per second, capacity).
+    """
+
+    def __init__(self, budgets: dict[str, tuple[float, float]]):
+        self.budgets = [budgets[name] for name in ROUTE_CLASSES]
+        self._slots: dict[int, int] = {}
+        self._tokens = array("d")
+        self._stamps = array("d")
+        self._free: list[int] = []
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def take(self, caller: int, route: str, now: float | None = None) -> float:
+        """Spend one token. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        class_index = ROUTE_CLASSES.index(route)
+        rate, capacity = self.budgets[class_index]
+        key = caller * len(ROUTE_CLASSES) + class_index
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key, capacity, now)
+        tokens = min(capacity, self._tokens[slot] + (now - self._stamps[slot]) * rate)
+        self._stamps[slot] = now
+
+        if tokens >= 1:
+            self._tokens[slot] = tokens - 1
+            allowed = True
+        else:
+            self._tokens[slot] = tokens
+            allowed = False
+
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self.sweep(now)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def _allocate(self, key: int, capacity: float, now: float) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._tokens[slot] = capacity
+            self._stamps[slot] = now
+        else:
+            slot = len(self._tokens)
+            self._tokens.append(capacity)
+            self._stamps.append(now)
+        self._slots[key] = slot
+        return slot
+
+    def sweep(self, now: float) -> None:
+        """Free every bucket that has refilled to capacity."""
+        full = []
+        for key, slot in self._slots.items():
+            rate, capacity = self.budgets[key % len(ROUTE_CLASSES)]
+            if self._tokens[slot] + (now - self._stamps[slot]) * rate >= capacity:
+                full.append(key)
+        for key in full:
+            self._free.append(self._slots.pop(key))
+        self._last_sweep = now
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, budgets: dict[str, tuple[float, float]]):
+        self.app = app
+        self.buckets = TokenBuckets(budgets)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].endswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        route = route_class(scope["method"], scope["path"])
+        wait = self.buckets.take(caller_key(scope), route)
+        if wait:
+            metrics.inc(f"rate_limited_{route}_total")
+            response = JSONResponse(
+                {"detail": f"Rate limit exceeded for {route} requests, retry later"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,122 @@
+"""
+Per-request tracing as pure ASGI middleware (spans: app/services/tracing.py).
+
+Every response gets a Server-Timing header with the self time of each
+span name plus the rest ("app") and the total up to the response start:
+
+    Server-Timing: auth;dur=4.1, es;dur=38.2;desc="3 calls", render;dur=0.6, app;dur=2.3, total;dur=45.2
+
+Requests slower than the threshold are logged as one JSON object
+(method, route, status, breakdown and every ES call), and each trace is
+handed to the OTLP/JSON exporter when one is configured. Event streams
+are left out of both: they are slow by design. Time spent in "wait"
+spans (long-polls) doesn't count towards the threshold either.
+"""
+
+import logging
+import time
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.tracing import Trace, end_trace, get_trace_exporter, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+STREAMING_TYPES = ("text/event-stream",)
+
+
+class TracedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that times body encoding as the "render" span."""
+
+    def render(self, content) -> bytes:
+        with span("render"):
+            return super().render(content)
+
+
+def server_timing(trace: Trace, now: float) -> str:
+    parts = []
+    for name, seconds, count in trace.breakdown(now):
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    parts.append(f"total;dur={(now - trace.root.start) * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp, slow_threshold: float = 1.0):
+        self.app = app
+        self.slow_threshold = slow_threshold
+        self._route_paths: dict | None = None
+
+    def _route(self, scope: Scope) -> str | None:
+        """The matched route's path template (e.g. /questions/{question_id})."""
+        endpoint = scope.get("endpoint")
+        if endpoint is None or "app" not in scope:
+            return None
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace("request", **{"http.method": scope["method"], "http.target": scope["path"]})
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                streaming = headers.get("content-type", "").startswith(STREAMING_TYPES)
+                headers.append("Server-Timing", server_timing(trace, time.perf_counter()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            trace.finish()
+            end_trace(token)
+            if not streaming:
+                route = self._route(scope)
+                trace.root.attributes["http.status_code"] = status
+                if route:
+                    trace.root.attributes["http.route"] = route
+                    trace.root.name = f"{scope['method']} {route}"
+                waited = sum(s.duration for s in trace.spans if s.name == "wait")
+                if trace.root.duration - waited >= self.slow_threshold:
+                    self._log_slow(trace, scope, route, status)
+                exporter = get_trace_exporter()
+                if exporter is not None:
+                    exporter.export(trace)
+
+    def _log_slow(self, trace: Trace, scope: Scope, route: str | None, status: int) -> None:
+        record = {
+            "trace_id": trace.trace_id,
+            "method": scope["method"],
+            "route": route,
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(trace.root.duration * 1000, 1),
+            "breakdown_ms": {name: round(seconds * 1000, 1) for name, seconds, _ in trace.breakdown(trace.root.end)},
+            "es_calls": [
+                {
+                    "operation": s.attributes.get("db.operation"),
+                    "index": s.attributes.get("db.elasticsearch.index"),
+                    "ms": round(s.duration * 1000, 1),
+                }
+                for s in trace.spans
+                if s.name == "es"
+            ],
+        }
+        logger.warning("Slow request: %s", orjson.dumps(record).decode())
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class HotFrame(BaseModel):
+    frame: str
+    # Samples with this frame on top of the stack / anywhere in it
+    self_samples: int
+    total_samples: int
+
+
+class ProfileSummary(BaseModel):
+    id: str
+    created_at: datetime
+    method: str
+    path: str
+    query: str = ""
+    status: int
+    duration_ms: float
+    interval_ms: float
+    # Samples while the request was running on the CPU / suspended
+    samples: int
+    waiting_samples: int
+    hottest_frames: list[HotFrame]
+
+
+class ProfileListResponse(BaseModel):
+    profiles: list[ProfileSummary]
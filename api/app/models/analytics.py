@@ -0,0 +1,24 @@
+from datetime import datetime
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class ActivityResolution(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
+class ActivityBucket(BaseModel):
+    bucket: datetime
+    questions: int = 0
+    answers: int = 0
+    votes: int = 0
+
+
+class ActivityResponse(BaseModel):
+    resolution: ActivityResolution
+    forum_id: str | None = None
+    since: datetime
+    until: datetime
+    buckets: list[ActivityBucket]
@@ -19,8 +19,31 @@ class AnswerPublic(BaseModel):
     created_at: datetime
     user_vote: str | None = None
 
+    @classmethod
+    def from_hit(cls, hit: dict, user_vote: str | None = None) -> "AnswerPublic":
+        """Build from an ES hit without re-validating (see QuestionPublic.from_hit)."""
+        src = hit["_source"]
+        return cls.model_construct(
+            id=hit["_id"],
+            body=src["body"],
+            question_id=src["question_id"],
+            author_id=src["author_id"],
+            author_username=src["author_username"],
+            upvote_count=src.get("upvote_count", 0),
+            downvote_count=src.get("downvote_count", 0),
+            score=src.get("score", 0),
+            created_at=datetime.fromisoformat(src["created_at"]),
+            user_vote=user_vote,
+        )
+
 
 class AnswerListResponse(BaseModel):
     answers: list[AnswerPublic]
     page: int
     total_pages: int
+
+
+class AnswerWaitResponse(BaseModel):
+    answers: list[AnswerPublic]
+    # Pass as `since` on the next wait to get only newer answers
+    since: datetime
@@ -32,6 +32,33 @@ class QuestionPublic(BaseModel):
     created_at: datetime
     user_vote: str | None = None
 
+    @classmethod
+    def from_hit(cls, hit: dict, user_vote: str | None = None) -> "QuestionPublic":
+        """
+        Build from an ES hit without re-validating.
+
+        The source was validated on the way in, and FastAPI validates the
+        response again on the way out, so construction skips it.
+        """
+        src = hit["_source"]
+        return cls.model_construct(
+            id=hit["_id"],
+            title=src["title"],
+            body=src["body"],
+            forum_id=src["forum_id"],
+            forum_name=src["forum_name"],
+            author_id=src["author_id"],
+            author_username=src["author_username"],
+            upvote_count=src.get("upvote_count", 0),
+            downvote_count=src.get("downvote_count", 0),
+            score=src.get("score", 0),
+            answer_count=src.get("answer_count", 0),
+            has_code=src.get("has_code", False),
+            word_count=src.get("word_count", 0),
+            created_at=datetime.fromisoformat(src["created_at"]),
+            user_vote=user_vote,
+        )
+
 
 class QuestionListResponse(BaseModel):
     questions: list[QuestionPublic]
@@ -1,16 +1,25 @@
 from datetime import datetime
+from typing import Annotated
 
 from pydantic import BaseModel, Field
 
-
-class UserRegisterRequest(BaseModel):
-    username: str = Field(
-        ...,
+Username = Annotated[
+    str,
+    Field(
         min_length=6,
         max_length=30,
         pattern=r"^[a-zA-Z0-9_-]+$",
         description="Username (6-30 chars, alphanumeric with _ and -)",
-    )
+    ),
+]
+
+
+class UserRegisterRequest(BaseModel):
+    username: Username
+
+
+class UserBulkRegisterRequest(BaseModel):
+    usernames: list[Username] = Field(..., min_length=1, max_length=500)
 
 
 class UserPublic(BaseModel):
@@ -26,3 +35,15 @@ class UserRegisterResponse(BaseModel):
     user: UserPublic
     api_key: str
     message: str = "Welcome to treehacks-qna! Save your API key — it won't be shown again."
+
+
+class UserBulkRegisterResult(BaseModel):
+    username: str
+    status: int
+    user: UserPublic | None = None
+    api_key: str | None = None
+    detail: str | None = None
+
+
+class UserBulkRegisterResponse(BaseModel):
+    results: list[UserBulkRegisterResult]
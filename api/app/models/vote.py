@@ -1,6 +1,6 @@
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class VoteType(str, Enum):
@@ -9,6 +9,11 @@ class VoteType(str, Enum):
     none = "none"
 
 
+class TargetType(str, Enum):
+    question = "question"
+    answer = "answer"
+
+
 class VoteRequest(BaseModel):
     vote: VoteType
 
@@ -18,3 +23,28 @@ class VoteResponse(BaseModel):
     upvote_count: int
     downvote_count: int
     score: int
+
+
+class VoteBatchItem(BaseModel):
+    target_type: TargetType
+    target_id: str
+    vote: VoteType
+
+
+class VoteBatchRequest(BaseModel):
+    votes: list[VoteBatchItem] = Field(..., min_length=1, max_length=100)
+
+
+class VoteBatchItemResult(BaseModel):
+    target_type: str
+    target_id: str
+    status: int
+    vote: str | None = None
+    upvote_count: int | None = None
+    downvote_count: int | None = None
+    score: int | None = None
+    detail: str | None = None
+
+
+class VoteBatchResponse(BaseModel):
+    results: list[VoteBatchItemResult]
@@ -0,0 +1,54 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.models.admin import ProfileListResponse, ProfileSummary
+from app.services.profiler import hottest_frames, load_profile, load_profiles
+from app.utils.auth import require_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+# ──────────────────────────────────────────────────────────────
+# GET /admin/profiles  — Recent request profiles
+# ──────────────────────────────────────────────────────────────
+
+
+@router.get("/profiles", response_model=ProfileListResponse)
+async def list_profiles(
+    limit: int = Query(20, ge=1, le=100),
+    frames: int = Query(10, ge=1, le=50, description="Hottest frames to show per profile"),
+):
+    """
+    Recent on-demand profiles, newest first, each with its hottest frames
+    by self samples. Requires X-Admin-Token.
+
+    Profile a request by sending it with `X-Profile: <admin token>`; the
+    response's X-Profile-Id names the profile.
+    """
+    profiles = await asyncio.to_thread(load_profiles, settings.profile_dir, limit)
+    return ProfileListResponse(
+        profiles=[
+            ProfileSummary(**profile, hottest_frames=hottest_frames(profile["stacks"], frames))
+            for profile in profiles
+        ]
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+# GET /admin/profiles/{profile_id}  — One profile as folded stacks
+# ──────────────────────────────────────────────────────────────
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """
+    The profile's samples in folded-stack format ("outer;inner;leaf count"
+    per line), for flamegraph.pl or speedscope. Requires X-Admin-Token.
+    """
+    profile = await asyncio.to_thread(load_profile, settings.profile_dir, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items()))
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.database import get_es
+from app.models.analytics import ActivityBucket, ActivityResolution, ActivityResponse
+from app.services.activity import ACTIVITY_FIELDS, ROLLUP_INDEX
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+STEPS = {
+    ActivityResolution.hour: timedelta(hours=1),
+    ActivityResolution.day: timedelta(days=1),
+}
+DEFAULT_WINDOWS = {
+    ActivityResolution.hour: timedelta(hours=48),
+    ActivityResolution.day: timedelta(days=30),
+}
+MAX_BUCKETS = 1000
+
+
+def _utc(moment: datetime) -> datetime:
+    # Query strings without an offset are taken as UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def _floor(moment: datetime, resolution: ActivityResolution) -> datetime:
+    moment = _utc(moment).replace(minute=0, second=0, microsecond=0)
+    if resolution == ActivityResolution.day:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+# ──────────────────────────────────────────────────────────────
+# GET /analytics/activity  — Questions / answers / votes over time
+# ──────────────────────────────────────────────────────────────
+
+
+@router.get("/activity", response_model=ActivityResponse)
+async def get_activity(
+    resolution: ActivityResolution = Query(ActivityResolution.hour),
+    forum_id: str | None = Query(None, description="Only this forum (default: all forums)"),
+    since: datetime | None = Query(None, description="Start (default: 48 hours / 30 days ago)"),
+    until: datetime | None = Query(None, description="End, exclusive (default: now)"),
+):
+    """
+    Activity counts per hour or per day, optionally for one forum. Public endpoint.
+
+    Reads only the activity_rollup index (hourly buckets per forum, kept
+    up to date by a background job), never the raw indices. Every bucket
+    in the range is returned, empty ones as zeros. The current bucket can
+    lag by up to ACTIVITY_ROLLUP_INTERVAL_SECONDS.
+    """
+    until = _utc(until) if until else datetime.now(timezone.utc)
+    since = _floor(since or until - DEFAULT_WINDOWS[resolution], resolution)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    step = STEPS[resolution]
+    if (until - since) / step > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too large: at most {MAX_BUCKETS} buckets")
+
+    filters = [{"range": {"bucket": {"gte": since.isoformat(), "lt": until.isoformat()}}}]
+    if forum_id:
+        filters.append({"term": {"forum_id": forum_id}})
+
+    result = await get_es().search(
+        index=ROLLUP_INDEX,
+        size=0,
+        query={"bool": {"filter": filters}},
+        aggs={
+            "activity": {
+                "date_histogram": {"field": "bucket", "calendar_interval": resolution.value},
+                "aggs": {field: {"sum": {"field": field}} for field in ACTIVITY_FIELDS},
+            }
+        },
+    )
+
+    found = {
+        bucket["key"]: {field: int(bucket[field]["value"]) for field in ACTIVITY_FIELDS}
+        for bucket in result["aggregations"]["activity"]["buckets"]
+    }
+    buckets = []
+    moment = since
+    while moment < until:
+        counts = found.get(int(moment.timestamp() * 1000), {})
+        buckets.append(ActivityBucket(bucket=moment, **counts))
+        moment += step
+
+    return ActivityResponse(
+        resolution=resolution,
+        forum_id=forum_id,
+        since=since,
+        until=until,
+        buckets=buckets,
+    )
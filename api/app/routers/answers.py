@@ -1,33 +1,31 @@
 import math
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from app.database import get_es
-from app.models.answer import AnswerCreateRequest, AnswerListResponse, AnswerPublic
+from app.models.answer import AnswerCreateRequest, AnswerListResponse, AnswerPublic, AnswerWaitResponse
 from app.models.question import SortOption
+from app.services.answer_notifier import get_answer_notifier
+from app.services.feed import get_feed_broadcaster
+from app.services.jobs import get_job_queue
+from app.services.leaderboard import get_leaderboard
+from app.services.stats import publish_stats
+from app.services.tracing import span
 from app.utils.auth import get_current_user, get_optional_user
+from app.utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    composite_etag,
+    etag_matches,
+    not_modified,
+    set_validators,
+)
 
 router = APIRouter(tags=["answers"])
 
 PAGE_SIZE = 20
 
-
-def _hit_to_answer(hit: dict, user_vote: str | None = None) -> AnswerPublic:
-    """Convert an ES hit to an AnswerPublic response."""
-    src = hit["_source"]
-    return AnswerPublic(
-        id=hit["_id"],
-        body=src["body"],
-        question_id=src["question_id"],
-        author_id=src["author_id"],
-        author_username=src["author_username"],
-        upvote_count=src.get("upvote_count", 0),
-        downvote_count=src.get("downvote_count", 0),
-        score=src.get("score", 0),
-        created_at=src["created_at"],
-        user_vote=user_vote,
-    )
+ANSWERS_CACHE_CONTROL = "public, max-age=5, stale-while-revalidate=30"
 
 
 # ──────────────────────────────────────────────────────────────
@@ -45,12 +43,18 @@ async def create_answer(
     body: AnswerCreateRequest,
     user: dict = Depends(get_current_user),
 ):
-    """Create an answer to a question. Requires authentication."""
+    """
+    Create an answer to a question. Requires authentication.
+
+    Responds once the answer is indexed; the answer_count increments on
+    the question and the author run as background jobs, and the answer
+    is listed under its question after the next index refresh.
+    """
     es = get_es()
 
     # Validate question exists
     try:
-        await es.get(index="questions", id=question_id)
+        question = await es.get(index="questions", id=question_id, source=["forum_id"])
     except Exception:
         raise HTTPException(status_code=404, detail="Question not found")
 
@@ -67,23 +71,32 @@ async def create_answer(
         "created_at": now.isoformat(),
     }
 
-    result = await es.index(
-        index="answers",
-        document=answer_doc,
-        refresh="wait_for",
-    )
+    result = await es.index(index="answers", document=answer_doc)
 
     # Increment answer_count on the question + answer_count on the user
-    await es.update(
-        index="questions",
-        id=question_id,
-        script={"source": "ctx._source.answer_count += 1"},
-    )
-    await es.update(
-        index="users",
-        id=user["id"],
-        script={"source": "ctx._source.answer_count += 1"},
-    )
+    jobs = get_job_queue()
+    if jobs is not None:
+        jobs.enqueue("increment", index="questions", doc_id=question_id, deltas={"answer_count": 1})
+        jobs.enqueue("increment", index="users", doc_id=user["id"], deltas={"answer_count": 1})
+    leaderboard = get_leaderboard()
+    if leaderboard is not None:
+        leaderboard.apply(user["id"], answer_count=1)
+    publish_stats(total_answers=1)
+    notifier = get_answer_notifier()
+    if notifier is not None:
+        notifier.publish({"id": result["_id"], **answer_doc})
+    feed = get_feed_broadcaster()
+    if feed is not None:
+        feed.publish(
+            {
+                "type": "answer",
+                "id": result["_id"],
+                "question_id": question_id,
+                "forum_id": question["_source"].get("forum_id"),
+                "author_username": user["username"],
+                "created_at": answer_doc["created_at"],
+            }
+        )
 
     return AnswerPublic(id=result["_id"], **answer_doc)
 
@@ -99,11 +112,19 @@ async def create_answer(
 )
 async def list_answers(
     question_id: str,
+    request: Request,
+    response: Response,
     sort: SortOption = Query(SortOption.top),
     page: int = Query(1, ge=1),
     user: dict | None = Depends(get_optional_user),
 ):
-    """List answers for a question. Default sort: top (by score)."""
+    """
+    List answers for a question. Default sort: top (by score).
+
+    The ETag covers the page's answers (_primary_term/_seq_no of each),
+    the total, and for authenticated callers their own votes — a repeat
+    read with If-None-Match gets a 304 unless any of those changed.
+    """
     es = get_es()
 
     # Validate question exists
@@ -128,6 +149,7 @@ async def list_answers(
         sort=sort_clause,
         from_=from_,
         size=PAGE_SIZE,
+        seq_no_primary_term=True,
     )
 
     total = result["hits"]["total"]["value"]
@@ -149,9 +171,20 @@ async def list_answers(
         except Exception:
             pass
 
+    etag = composite_etag(
+        total,
+        [(h["_id"], h["_primary_term"], h["_seq_no"]) for h in answers],
+        user["id"] if user else None,
+        sorted(user_votes.items()),
+    )
+    cache_control = PRIVATE_CACHE_CONTROL if user else ANSWERS_CACHE_CONTROL
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control, vary="Authorization")
+    set_validators(response, etag, cache_control, vary="Authorization")
+
     return AnswerListResponse(
         answers=[
-            _hit_to_answer(h, user_vote=user_votes.get(h["_id"]))
+            AnswerPublic.from_hit(h, user_vote=user_votes.get(h["_id"]))
             for h in answers
         ],
         page=page,
@@ -159,6 +192,104 @@ async def list_answers(
     )
 
 
+# ──────────────────────────────────────────────────────────────
+# GET /questions/{question_id}/answers/wait  — Long-poll for new answers
+# ──────────────────────────────────────────────────────────────
+
+
+@router.get(
+    "/questions/{question_id}/answers/wait",
+    response_model=AnswerWaitResponse,
+)
+async def wait_for_answers(
+    question_id: str,
+    since: datetime | None = Query(None, description="Only answers created after this time (default: now)"),
+    timeout: float = Query(30, ge=1, le=60, description="Seconds to wait for an answer"),
+):
+    """
+    Wait for new answers to a question. Public endpoint.
+
+    Returns as soon as the question has answers created after `since`
+    (oldest first, at most one page), or with an empty list after
+    `timeout` seconds. Pass the returned `since` to the next call to
+    pick up where this one left off.
+
+    A wait costs one get (the question must exist), plus one search when
+    `since` is older than this process's memory of recent answers (or more
+    answers arrived than it keeps per question); while
+    parked it makes no ES calls — create_answer wakes it.
+    """
+    es = get_es()
+    notifier = get_answer_notifier()
+    now = datetime.now(timezone.utc)
+    if since is None:
+        since = now
+    elif since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    try:
+        await es.get(index="questions", id=question_id, source=False)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    if notifier is None:
+        # Nothing to park on outside the app lifespan; answer like a poll
+        return _wait_response(await _answers_since(question_id, since), since)
+
+    if not notifier.covers(question_id, since):
+        answers = await _answers_since(question_id, since)
+        if answers:
+            return _wait_response(answers, since)
+
+    waiter = notifier.waiter(question_id)
+    if waiter is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many waiting requests, poll GET /questions/{question_id}/answers instead",
+            headers={"Retry-After": "30"},
+        )
+    try:
+        with span("wait"):
+            fresh = await notifier.wait(waiter, since, timeout)
+    finally:
+        notifier.release(waiter)
+    if not notifier.covers(question_id, since):
+        # So many answers arrived that the notifier no longer has the oldest
+        return _wait_response(await _answers_since(question_id, since), since)
+    return _wait_response([AnswerPublic(**answer) for answer in fresh[:PAGE_SIZE]], since)
+
+
+async def _answers_since(question_id: str, since: datetime) -> list[AnswerPublic]:
+    """The first page of answers created after `since`, from ES plus those not yet searchable."""
+    result = await get_es().search(
+        index="answers",
+        query={
+            "bool": {
+                "filter": [
+                    {"term": {"question_id": question_id}},
+                    {"range": {"created_at": {"gt": since.isoformat()}}},
+                ]
+            }
+        },
+        sort=[{"created_at": {"order": "asc"}}],
+        size=PAGE_SIZE,
+    )
+    hits = result["hits"]["hits"]
+    # Answers too new to be searchable yet are only in the notifier
+    known = {hit["_id"] for hit in hits}
+    notifier = get_answer_notifier()
+    recent = notifier.recent(question_id, since) if notifier is not None else []
+    fresh = [a for a in recent if a["id"] not in known]
+    answers = [AnswerPublic.from_hit(hit) for hit in hits]
+    answers += [AnswerPublic(**answer) for answer in fresh]
+    return answers[:PAGE_SIZE]
+
+
+def _wait_response(answers: list[AnswerPublic], since: datetime) -> AnswerWaitResponse:
+    cursor = max((answer.created_at for answer in answers), default=since)
+    return AnswerWaitResponse(answers=answers, since=cursor)
+
+
 # ──────────────────────────────────────────────────────────────
 # GET /answers/{answer_id}  — Single answer by ID
 # ──────────────────────────────────────────────────────────────
@@ -188,4 +319,4 @@ async def get_answer(
         except Exception:
             pass
 
-    return _hit_to_answer(result, user_vote=user_vote)
+    return AnswerPublic.from_hit(result, user_vote=user_vote)
@@ -1,9 +1,28 @@
+import asyncio
+import logging
+import uuid
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException
+from elasticsearch import ConflictError
+from fastapi import APIRouter, Depends, HTTPException
 
+from app.config import settings
 from app.database import get_es
-from app.models.user import UserPublic, UserRegisterRequest, UserRegisterResponse
+from app.models.user import (
+    UserBulkRegisterRequest,
+    UserBulkRegisterResponse,
+    UserBulkRegisterResult,
+    UserPublic,
+    UserRegisterRequest,
+    UserRegisterResponse,
+)
+from app.services.cache import get_cache
+from app.services.leaderboard import get_leaderboard
+from app.services.stats import publish_stats
+from app.utils.auth import require_admin
+from app.utils.usernames import legacy_owners
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -15,42 +34,185 @@ async def register(body: UserRegisterRequest):
 
     The API key is generated by Elasticsearch's native security system.
     It is shown exactly once — the agent must save it immediately.
+
+    Uniqueness is a single conditional write: usernames/{username} is
+    created with op_type=create, so of two racing registrations exactly
+    one succeeds and the other gets 409 — no search, no forced refresh.
+    (With USERNAME_LEGACY_FALLBACK, set until migrate_usernames has run,
+    names held by users from before reservations are searched for first.)
     """
     es = get_es()
 
-    # Check if username is already taken
-    existing = await es.search(
-        index="users",
-        query={"term": {"username": body.username}},
-        size=1,
-    )
-    if existing["hits"]["total"]["value"] > 0:
+    if await legacy_owners([body.username]):
+        raise HTTPException(status_code=409, detail="Username already taken")
+
+    now = datetime.now(timezone.utc)
+    user_id = uuid.uuid4().hex
+
+    # Reserve the username (fails if it is already taken)
+    try:
+        await es.create(
+            index="usernames",
+            id=body.username,
+            document={"user_id": user_id, "created_at": now.isoformat()},
+        )
+    except ConflictError:
         raise HTTPException(status_code=409, detail="Username already taken")
 
-    # Create the user document in the users index
+    try:
+        user_doc = _new_user_doc(body.username, now)
+        # No refresh needed: uniqueness lives in the usernames index, and
+        # lookups by id or username are realtime gets
+        await es.create(index="users", id=user_id, document=user_doc)
+        api_key = await _mint_api_key(user_id, body.username)
+    except Exception:
+        # Roll back so the name isn't burned by a failed signup; a failing
+        # rollback must not hide why the signup failed
+        try:
+            await es.options(ignore_status=404).delete(index="users", id=user_id)
+            await es.options(ignore_status=404).delete(index="usernames", id=body.username)
+        except Exception:
+            logger.exception("Could not roll back the registration of %s", body.username)
+        _forget_usernames([body.username])
+        raise
+
+    _offer_to_leaderboard(user_id, user_doc)
+    publish_stats(total_users=1)
+    return UserRegisterResponse(user=UserPublic(id=user_id, **user_doc), api_key=api_key)
+
+
+@router.post("/register/bulk", response_model=UserBulkRegisterResponse, dependencies=[Depends(require_admin)])
+async def register_bulk(body: UserBulkRegisterRequest):
+    """
+    Register up to 500 agents in one request. Operator only (X-Admin-Token).
+
+    Every username gets its own result, in request order: 201 with the
+    user and API key, or 409 if the name is taken (or repeated in the
+    request). All names are reserved in one _bulk of conditional creates,
+    the user documents are written in a second _bulk, and API keys are
+    minted concurrently (API_KEY_MINT_CONCURRENCY at a time).
+    """
+    es = get_es()
     now = datetime.now(timezone.utc)
-    user_doc = {
-        "username": body.username,
+    results: list[UserBulkRegisterResult | None] = [None] * len(body.usernames)
+
+    # username → (position in the request, new user id)
+    pending: dict[str, tuple[int, str]] = {}
+    for i, username in enumerate(body.usernames):
+        if username in pending:
+            results[i] = UserBulkRegisterResult(
+                username=username, status=409, detail="Username repeated in request"
+            )
+        else:
+            pending[username] = (i, uuid.uuid4().hex)
+
+    # Names held by users from before reservations existed
+    for username in await legacy_owners(list(pending)):
+        i, _ = pending.pop(username)
+        results[i] = UserBulkRegisterResult(username=username, status=409, detail="Username already taken")
+
+    # 1. Reserve every username at once
+    operations = []
+    for username, (_, user_id) in pending.items():
+        operations += [
+            {"create": {"_index": "usernames", "_id": username}},
+            {"user_id": user_id, "created_at": now.isoformat()},
+        ]
+    response = await es.bulk(operations=operations) if operations else {"items": []}
+    reserved = {}
+    for (username, (i, user_id)), item in zip(pending.items(), response["items"]):
+        outcome = item["create"]
+        if outcome.get("status") == 409:
+            results[i] = UserBulkRegisterResult(username=username, status=409, detail="Username already taken")
+        elif "error" in outcome:
+            results[i] = UserBulkRegisterResult(username=username, status=500, detail="Could not reserve username")
+        else:
+            reserved[username] = (i, user_id)
+
+    # 2. Write the user documents for the names we got
+    user_docs = {username: _new_user_doc(username, now) for username in reserved}
+    created = {}
+    if reserved:
+        operations = []
+        for username, (_, user_id) in reserved.items():
+            operations += [
+                {"create": {"_index": "users", "_id": user_id}},
+                user_docs[username],
+            ]
+        response = await es.bulk(operations=operations)
+        for (username, entry), item in zip(reserved.items(), response["items"]):
+            if "error" in item["create"]:
+                results[entry[0]] = UserBulkRegisterResult(
+                    username=username, status=500, detail="Could not create user"
+                )
+            else:
+                created[username] = entry
+
+    # 3. Mint API keys, bounded so a large batch doesn't stampede ES security
+    semaphore = asyncio.Semaphore(settings.api_key_mint_concurrency)
+
+    async def mint(username: str, user_id: str) -> str | None:
+        async with semaphore:
+            try:
+                return await _mint_api_key(user_id, username)
+            except Exception:
+                return None
+
+    api_keys = await asyncio.gather(
+        *(mint(username, user_id) for username, (_, user_id) in created.items())
+    )
+    for (username, (i, user_id)), api_key in zip(created.items(), api_keys):
+        if api_key is None:
+            results[i] = UserBulkRegisterResult(username=username, status=500, detail="Could not create API key")
+            continue
+        _offer_to_leaderboard(user_id, user_docs[username])
+        results[i] = UserBulkRegisterResult(
+            username=username,
+            status=201,
+            user=UserPublic(id=user_id, **user_docs[username]),
+            api_key=api_key,
+        )
+
+    # Roll back every name that was reserved but didn't come out with a key
+    rollback, released = [], []
+    for username, (i, user_id) in reserved.items():
+        if results[i].status != 201:
+            rollback += [
+                {"delete": {"_index": "users", "_id": user_id}},
+                {"delete": {"_index": "usernames", "_id": username}},
+            ]
+            released.append(username)
+    if rollback:
+        await es.bulk(operations=rollback)
+        _forget_usernames(released)
+
+    registered = sum(1 for result in results if result.status == 201)
+    if registered:
+        publish_stats(total_users=registered)
+
+    return UserBulkRegisterResponse(results=results)
+
+
+def _new_user_doc(username: str, now: datetime) -> dict:
+    return {
+        "username": username,
         "question_count": 0,
         "answer_count": 0,
         "reputation": 0,
         "created_at": now.isoformat(),
     }
 
-    # refresh="wait_for" ensures the doc is searchable immediately
-    # (so a duplicate registration right after won't slip through)
-    result = await es.index(index="users", document=user_doc, refresh="wait_for")
-    user_id = result["_id"]
 
+async def _mint_api_key(user_id: str, username: str) -> str:
     # Generate an API key via ES native security
     # The key carries metadata with our user_id so we can look up the user later.
     # Empty role_descriptors means the key can't access ES directly —
     # all access goes through our FastAPI server using the admin client.
-    api_key_response = await es.security.create_api_key(
-        name=f"agent_{body.username}",
+    api_key_response = await get_es().security.create_api_key(
+        name=f"agent_{username}",
         metadata={
             "user_id": user_id,
-            "username": body.username,
+            "username": username,
         },
         role_descriptors={
             "agent_role": {
@@ -59,15 +221,17 @@ async def register(body: UserRegisterRequest):
             }
         },
     )
+    return api_key_response["encoded"]
 
-    return UserRegisterResponse(
-        user=UserPublic(
-            id=user_id,
-            username=body.username,
-            question_count=0,
-            answer_count=0,
-            reputation=0,
-            created_at=now,
-        ),
-        api_key=api_key_response["encoded"],
-    )
+
+def _forget_usernames(usernames: list[str]) -> None:
+    # A lookup during the failed signup may have cached the released name
+    cache = get_cache()
+    if cache is not None:
+        cache.delete(*(f"username:{username}" for username in usernames))
+
+
+def _offer_to_leaderboard(user_id: str, user_doc: dict) -> None:
+    leaderboard = get_leaderboard()
+    if leaderboard is not None:
+        leaderboard.offer({"id": user_id, **user_doc})
@@ -0,0 +1,69 @@
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+
+from app.services.feed import FeedClient, get_feed_broadcaster
+
+router = APIRouter(prefix="/ws", tags=["feed"])
+
+MAX_FORUM_FILTER = 100
+
+
+# ──────────────────────────────────────────────────────────────
+# WS /ws/feed  — Live feed of new questions, answers and votes
+# ──────────────────────────────────────────────────────────────
+
+
+@router.websocket("/feed")
+async def feed(websocket: WebSocket, forum_id: list[str] = Query([])):
+    """
+    Live activity as JSON text messages. Public endpoint.
+
+    Each message is a JSON array of one or more events, in order:
+
+        {"type": "question", "id", "forum_id", "title", "author_username", "created_at"}
+        {"type": "answer", "id", "question_id", "forum_id", "author_username", "created_at"}
+        {"type": "vote", "target_type", "target_id", "question_id"?, "forum_id",
+         "upvote_count", "downvote_count", "score"}
+        {"type": "dropped", "count"}   the client fell behind and missed `count` events
+
+    Filter by forum with ?forum_id=... (repeatable), or at any time by
+    sending {"forums": ["<forum_id>", ...]} ([] for every forum). Writes
+    made through any worker of this server show up; ES is never read.
+    """
+    broadcaster = get_feed_broadcaster()
+    await websocket.accept()
+    client = broadcaster.subscribe(set(forum_id[:MAX_FORUM_FILTER]))
+    if client is None:
+        # 1013: try again later
+        await websocket.close(code=1013, reason="Too many live feed clients")
+        return
+
+    receiver = asyncio.create_task(_receive_filters(websocket, client))
+    try:
+        while (events := await client.next()) is not None:
+            await websocket.send_text(orjson.dumps(events).decode())
+        await websocket.close(code=1001)  # server shutting down
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # the client went away mid-send
+    finally:
+        receiver.cancel()
+        broadcaster.unsubscribe(client)
+
+
+async def _receive_filters(websocket: WebSocket, client: FeedClient) -> None:
+    """Apply {"forums": [...]} messages; close the feed when the client disconnects."""
+    try:
+        while True:
+            try:
+                message = orjson.loads(await websocket.receive_text())
+                forums = message["forums"]
+            except (ValueError, KeyError, TypeError):
+                continue  # not a filter update
+            if isinstance(forums, list):
+                client.forums = {str(forum) for forum in forums[:MAX_FORUM_FILTER]}
+    except WebSocketDisconnect:
+        pass
+    client.closed = True
+    client.wakeup.set()
@@ -1,13 +1,19 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from app.database import get_es
 from app.models.forum import ForumCreateRequest, ForumPublic
+from app.services.forums import get_forum_catalog
+from app.services.stats import publish_stats
 from app.utils.auth import get_current_user
+from app.utils.http_cache import content_etag, etag_matches, not_modified, set_validators
 
 router = APIRouter(prefix="/forums", tags=["forums"])
 
+# Forums rarely change; question counts may trail by up to a minute
+FORUMS_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
 
 @router.post("", response_model=ForumPublic, status_code=201)
 async def create_forum(
@@ -16,14 +22,10 @@ async def create_forum(
 ):
     """Create a new forum. Requires authentication."""
     es = get_es()
+    catalog = get_forum_catalog()
 
-    # Check if forum name already exists (keyword field = exact match)
-    existing = await es.search(
-        index="forums",
-        query={"term": {"name": body.name}},
-        size=1,
-    )
-    if existing["hits"]["total"]["value"] > 0:
+    # Check if forum name already exists (exact match, like the keyword field)
+    if catalog.find_by_name(body.name) is not None:
         raise HTTPException(status_code=409, detail="Forum name already exists")
 
     now = datetime.now(timezone.utc)
@@ -37,45 +39,43 @@ async def create_forum(
     }
 
     result = await es.index(index="forums", document=forum_doc, refresh="wait_for")
+    catalog.put({"id": result["_id"], **forum_doc})
+    publish_stats(total_forums=1)
 
     return ForumPublic(id=result["_id"], **forum_doc)
 
 
 @router.get("", response_model=list[ForumPublic])
 async def list_forums(
+    request: Request,
+    response: Response,
     search: str | None = Query(None, description="Search forums by name"),
 ):
-    """List all forums, optionally filtered by search query. Public endpoint."""
-    es = get_es()
-
-    if search:
-        # Wildcard search on the keyword field (case-sensitive exact match)
-        # For keyword fields we use wildcard query
-        query = {"wildcard": {"name": {"value": f"*{search}*", "case_insensitive": True}}}
-    else:
-        query = {"match_all": {}}
-
-    result = await es.search(
-        index="forums",
-        query=query,
-        sort=[{"question_count": {"order": "desc"}}],
-        size=50,
-    )
-
-    return [
-        ForumPublic(id=hit["_id"], **hit["_source"])
-        for hit in result["hits"]["hits"]
-    ]
+    """
+    List all forums, optionally filtered by search query. Public endpoint.
+
+    Served from the in-memory forum catalog: the search is a
+    case-insensitive substring match on the name, with names that start
+    with it listed first, then by question count. The ETag is a hash of
+    the listed forums, so every worker agrees on it.
+    """
+    forums = get_forum_catalog().search(search)
+    etag = content_etag(forums)
+    if etag_matches(request, etag):
+        return not_modified(etag, FORUMS_CACHE_CONTROL)
+    set_validators(response, etag, FORUMS_CACHE_CONTROL)
+    return [ForumPublic(**forum) for forum in forums]
 
 
 @router.get("/{forum_id}", response_model=ForumPublic)
-async def get_forum(forum_id: str):
-    """Get a specific forum by ID. Public endpoint."""
-    es = get_es()
-
-    try:
-        result = await es.get(index="forums", id=forum_id)
-    except Exception:
+async def get_forum(forum_id: str, request: Request, response: Response):
+    """Get a specific forum by ID. Public endpoint. ETag: a hash of the forum."""
+    forum = await get_forum_catalog().lookup(forum_id)
+    if forum is None:
         raise HTTPException(status_code=404, detail="Forum not found")
 
-    return ForumPublic(id=result["_id"], **result["_source"])
+    etag = content_etag(forum)
+    if etag_matches(request, etag):
+        return not_modified(etag, FORUMS_CACHE_CONTROL)
+    set_validators(response, etag, FORUMS_CACHE_CONTROL)
+    return ForumPublic(**forum)
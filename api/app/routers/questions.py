@@ -1,8 +1,10 @@
+import hashlib
 import math
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
+from app.config import settings
 from app.database import get_es
 from app.models.question import (
     QuestionCreateRequest,
@@ -10,33 +12,24 @@ from app.models.question import (
     QuestionPublic,
     SortOption,
 )
+from app.services.cache import get_cache
+from app.services.feed import get_feed_broadcaster
+from app.services.forums import get_forum_catalog
+from app.services.jobs import get_job_queue
+from app.services.leaderboard import get_leaderboard
+from app.services.stats import publish_stats
 from app.utils.auth import get_current_user, get_optional_user
+from app.utils.http_cache import doc_etag, etag_matches, not_modified, set_validators
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
 PAGE_SIZE = 20
 
+# Counters move with every vote: a short shared lifetime, then cheap revalidation
+QUESTION_CACHE_CONTROL = "public, max-age=5, stale-while-revalidate=30"
 
-def _hit_to_question(hit: dict, user_vote: str | None = None) -> QuestionPublic:
-    """Convert an ES search hit to a QuestionPublic response."""
-    src = hit["_source"]
-    return QuestionPublic(
-        id=hit["_id"],
-        title=src["title"],
-        body=src["body"],
-        forum_id=src["forum_id"],
-        forum_name=src["forum_name"],
-        author_id=src["author_id"],
-        author_username=src["author_username"],
-        upvote_count=src.get("upvote_count", 0),
-        downvote_count=src.get("downvote_count", 0),
-        score=src.get("score", 0),
-        answer_count=src.get("answer_count", 0),
-        has_code=src.get("has_code", False),
-        word_count=src.get("word_count", 0),
-        created_at=src["created_at"],
-        user_vote=user_vote,
-    )
+# New questions show up in search after the next refresh (1s by default)
+SEARCH_REFRESH_DELAY = 1.5
 
 
 # ──────────────────────────────────────────────────────────────
@@ -56,16 +49,20 @@ async def create_question(
     - Ingest pipeline  → computes word_count and has_code before indexing
     - semantic_text    → Jina embeddings generated automatically from title/body
     - Painless script  → atomic counter increments on forum + user docs
+
+    Responds once the question is indexed: the counter increments run as
+    background jobs (app/services/jobs.py), and the question becomes
+    searchable at the next index refresh (about a second) rather than
+    being waited for.
     """
     es = get_es()
 
-    # Validate forum exists
-    try:
-        forum_doc = await es.get(index="forums", id=body.forum_id)
-    except Exception:
+    # Validate forum exists (in-memory catalog, ES only on a miss)
+    forum = await get_forum_catalog().lookup(body.forum_id)
+    if forum is None:
         raise HTTPException(status_code=404, detail="Forum not found")
 
-    forum_name = forum_doc["_source"]["name"]
+    forum_name = forum["name"]
     now = datetime.now(timezone.utc)
 
     question_doc = {
@@ -91,24 +88,46 @@ async def create_question(
         index="questions",
         document=question_doc,
         pipeline="question_pipeline",
-        refresh="wait_for",
     )
 
-    # Atomic counter increments via Painless scripts
-    await es.update(
-        index="forums",
-        id=body.forum_id,
-        script={"source": "ctx._source.question_count += 1"},
-    )
-    await es.update(
-        index="users",
-        id=user["id"],
-        script={"source": "ctx._source.question_count += 1"},
-    )
+    jobs = get_job_queue()
+    if jobs is not None:
+        jobs.enqueue("increment", index="forums", doc_id=body.forum_id, deltas={"question_count": 1})
+        jobs.enqueue("increment", index="users", doc_id=user["id"], deltas={"question_count": 1})
+        # Cached search pages can't contain the question before it is refreshed;
+        # only this forum's searches and the all-forums ones can include it
+        for forum_id in (body.forum_id, None):
+            jobs.enqueue("invalidate_prefix", delay=SEARCH_REFRESH_DELAY, prefix=_search_prefix(forum_id))
+    get_forum_catalog().apply(body.forum_id, question_count=1)
+    leaderboard = get_leaderboard()
+    if leaderboard is not None:
+        leaderboard.apply(user["id"], question_count=1)
+    publish_stats(total_questions=1)
+    feed = get_feed_broadcaster()
+    if feed is not None:
+        feed.publish(
+            {
+                "type": "question",
+                "id": result["_id"],
+                "forum_id": body.forum_id,
+                "title": body.title,
+                "author_username": user["username"],
+                "created_at": question_doc["created_at"],
+            }
+        )
 
-    # Re-fetch to get pipeline-computed fields (word_count, has_code)
-    indexed = await es.get(index="questions", id=result["_id"])
-    return _hit_to_question(indexed)
+    return QuestionPublic(id=result["_id"], **question_doc, **_pipeline_fields(body.body))
+
+
+def _pipeline_fields(body: str) -> dict:
+    """
+    The fields question_pipeline (QUESTION_PIPELINE in app/main.py) computes, computed the same way.
+
+    Saves reading the new question back just for these. Any change to the
+    pipeline script has to be mirrored here.
+    """
+    # Painless splitOnToken keeps empty tokens, like str.split with a separator
+    return {"word_count": len(body.split(" ")), "has_code": "```" in body}
 
 
 # ──────────────────────────────────────────────────────────────
@@ -134,7 +153,40 @@ async def search_questions(
     Results are then re-ranked by the Jina Reranker for higher precision.
 
     ES features used: RRF retriever, semantic query, custom analyzer, text_similarity_reranker
+
+    Result pages are cached (shared across workers) for
+    SEARCH_CACHE_TTL_SECONDS and dropped whenever a question is created
+    in their forum (or, for unfiltered searches, anywhere);
+    vote and answer counts in a cached page can lag by up to the TTL.
     """
+    cache = get_cache()
+    cache_key = _search_prefix(forum_id) + _digest(f"{page}:{q}")
+    cached = await cache.get(cache_key) if cache is not None else None
+    if cached is None:
+        cached = await _search(q, forum_id, page)
+        if cache is not None:
+            cache.set(cache_key, cached, ttl=settings.search_cache_ttl_seconds)
+    hits, total = cached
+
+    return QuestionListResponse(
+        questions=[QuestionPublic.from_hit(h) for h in hits],
+        page=page,
+        total_pages=max(1, math.ceil(total / PAGE_SIZE)),
+    )
+
+
+def _search_prefix(forum_id: str | None) -> str:
+    """Cache key prefix shared by every cached search page in one forum (or across all)."""
+    # Digests are hex, so neither part of the key can contain the separator
+    return f"search:{_digest(forum_id) if forum_id else '*'}:"
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+
+async def _search(q: str, forum_id: str | None, page: int) -> tuple[list[dict], int]:
+    """One page of hybrid search hits, and the total hit count."""
     es = get_es()
 
     from_ = (page - 1) * PAGE_SIZE
@@ -211,14 +263,7 @@ async def search_questions(
             size=PAGE_SIZE,
         )
 
-    total = result["hits"]["total"]["value"]
-    total_pages = max(1, math.ceil(total / PAGE_SIZE))
-
-    return QuestionListResponse(
-        questions=[_hit_to_question(h) for h in result["hits"]["hits"]],
-        page=page,
-        total_pages=total_pages,
-    )
+    return result["hits"]["hits"], result["hits"]["total"]["value"]
 
 
 # ──────────────────────────────────────────────────────────────
@@ -252,7 +297,7 @@ async def list_unanswered(
     total_pages = max(1, math.ceil(total / PAGE_SIZE))
 
     return QuestionListResponse(
-        questions=[_hit_to_question(h) for h in result["hits"]["hits"]],
+        questions=[QuestionPublic.from_hit(h) for h in result["hits"]["hits"]],
         page=page,
         total_pages=total_pages,
     )
@@ -300,7 +345,7 @@ async def list_questions(
     total_pages = max(1, math.ceil(total / PAGE_SIZE))
 
     return QuestionListResponse(
-        questions=[_hit_to_question(h) for h in result["hits"]["hits"]],
+        questions=[QuestionPublic.from_hit(h) for h in result["hits"]["hits"]],
         page=page,
         total_pages=total_pages,
     )
@@ -314,9 +359,16 @@ async def list_questions(
 @router.get("/{question_id}", response_model=QuestionPublic)
 async def get_question(
     question_id: str,
+    request: Request,
+    response: Response,
     user: dict | None = Depends(get_optional_user),
 ):
-    """Get a single question by ID. Public endpoint."""
+    """
+    Get a single question by ID. Public endpoint.
+
+    The ETag is the document's _primary_term/_seq_no, so a client that
+    sends it back in If-None-Match gets a 304 until the question changes.
+    """
     es = get_es()
 
     try:
@@ -324,4 +376,8 @@ async def get_question(
     except Exception:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    return _hit_to_question(result)
+    etag = doc_etag(result)
+    if etag_matches(request, etag):
+        return not_modified(etag, QUESTION_CACHE_CONTROL)
+    set_validators(response, etag, QUESTION_CACHE_CONTROL)
+    return QuestionPublic.from_hit(result)
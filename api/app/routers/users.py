@@ -1,12 +1,17 @@
 import math
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from elasticsearch import NotFoundError
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from app.database import get_es
 from app.models.answer import AnswerListResponse, AnswerPublic
 from app.models.question import QuestionListResponse, QuestionPublic, SortOption
 from app.models.user import UserPublic
+from app.services.cache import get_cache
+from app.services.leaderboard import get_leaderboard
 from app.utils.auth import get_current_user
+from app.utils.http_cache import content_etag, doc_etag, etag_matches, not_modified, set_validators
+from app.utils.usernames import legacy_owners
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -36,11 +41,32 @@ async def get_me(user: dict = Depends(get_current_user)):
 # ──────────────────────────────────────────────────────────────
 
 
+LEADERBOARD_CACHE_CONTROL = "public, max-age=5"
+USER_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=120"
+
+
 @router.get("/top", response_model=list[UserPublic])
 async def get_top_users(
+    request: Request,
+    response: Response,
     limit: int = Query(10, ge=1, le=50),
 ):
-    """Get top users by reputation. Public endpoint."""
+    """
+    Get top users by reputation. Public endpoint.
+
+    Served from the in-memory leaderboard (no ES call) with an ETag that
+    hashes the entries served, so repeat polls get a 304 from any worker
+    until the ranking changes.
+    """
+    leaderboard = get_leaderboard()
+    if leaderboard is not None:
+        entries = leaderboard.top(limit)
+        etag = content_etag(entries)
+        if etag_matches(request, etag):
+            return not_modified(etag, LEADERBOARD_CACHE_CONTROL)
+        set_validators(response, etag, LEADERBOARD_CACHE_CONTROL)
+        return [UserPublic(**entry) for entry in entries]
+
     es = get_es()
 
     result = await es.search(
@@ -66,20 +92,36 @@ async def get_top_users(
 
 @router.get("/username/{username}", response_model=UserPublic)
 async def get_user_by_username(username: str):
-    """Get a user profile by username. Public endpoint."""
+    """
+    Get a user profile by username. Public endpoint.
+
+    Resolved through the usernames reservation index — two realtime gets
+    by id instead of a search. Reservations never change, so the
+    username → id mapping is cached and repeat lookups cost one get.
+    Users from before reservations existed have none until
+    migrate_usernames has run; meanwhile USERNAME_LEGACY_FALLBACK makes a
+    miss fall back to searching users by name.
+    """
     es = get_es()
+    cache = get_cache()
 
-    result = await es.search(
-        index="users",
-        query={"term": {"username": username}},
-        size=1,
-    )
-
-    if result["hits"]["total"]["value"] == 0:
+    try:
+        user_id = await cache.get(f"username:{username}") if cache is not None else None
+        if user_id is None:
+            try:
+                reservation = await es.get(index="usernames", id=username)
+                user_id = reservation["_source"]["user_id"]
+            except NotFoundError:
+                user_id = (await legacy_owners([username])).get(username)
+                if user_id is None:
+                    raise HTTPException(status_code=404, detail="User not found")
+            if cache is not None:
+                cache.set(f"username:{username}", user_id)
+        result = await es.get(index="users", id=user_id)
+    except NotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hit = result["hits"]["hits"][0]
-    return UserPublic(id=hit["_id"], **hit["_source"])
+    return UserPublic(id=result["_id"], **result["_source"])
 
 
 # ──────────────────────────────────────────────────────────────
@@ -88,8 +130,8 @@ async def get_user_by_username(username: str):
 
 
 @router.get("/{user_id}", response_model=UserPublic)
-async def get_user(user_id: str):
-    """Get a user profile by ID. Public endpoint."""
+async def get_user(user_id: str, request: Request, response: Response):
+    """Get a user profile by ID. Public endpoint. ETag: the document's _primary_term/_seq_no."""
     es = get_es()
 
     try:
@@ -97,6 +139,10 @@ async def get_user(user_id: str):
     except Exception:
         raise HTTPException(status_code=404, detail="User not found")
 
+    etag = doc_etag(result)
+    if etag_matches(request, etag):
+        return not_modified(etag, USER_CACHE_CONTROL)
+    set_validators(response, etag, USER_CACHE_CONTROL)
     return UserPublic(id=result["_id"], **result["_source"])
 
 
@@ -136,25 +182,7 @@ async def get_user_questions(
     total_pages = max(1, math.ceil(total / PAGE_SIZE))
 
     return QuestionListResponse(
-        questions=[
-            QuestionPublic(
-                id=hit["_id"],
-                title=hit["_source"]["title"],
-                body=hit["_source"]["body"],
-                forum_id=hit["_source"]["forum_id"],
-                forum_name=hit["_source"]["forum_name"],
-                author_id=hit["_source"]["author_id"],
-                author_username=hit["_source"]["author_username"],
-                upvote_count=hit["_source"].get("upvote_count", 0),
-                downvote_count=hit["_source"].get("downvote_count", 0),
-                score=hit["_source"].get("score", 0),
-                answer_count=hit["_source"].get("answer_count", 0),
-                has_code=hit["_source"].get("has_code", False),
-                word_count=hit["_source"].get("word_count", 0),
-                created_at=hit["_source"]["created_at"],
-            )
-            for hit in result["hits"]["hits"]
-        ],
+        questions=[QuestionPublic.from_hit(hit) for hit in result["hits"]["hits"]],
         page=page,
         total_pages=total_pages,
     )
@@ -196,20 +224,7 @@ async def get_user_answers(
     total_pages = max(1, math.ceil(total / PAGE_SIZE))
 
     return AnswerListResponse(
-        answers=[
-            AnswerPublic(
-                id=hit["_id"],
-                body=hit["_source"]["body"],
-                question_id=hit["_source"]["question_id"],
-                author_id=hit["_source"]["author_id"],
-                author_username=hit["_source"]["author_username"],
-                upvote_count=hit["_source"].get("upvote_count", 0),
-                downvote_count=hit["_source"].get("downvote_count", 0),
-                score=hit["_source"].get("score", 0),
-                created_at=hit["_source"]["created_at"],
-            )
-            for hit in result["hits"]["hits"]
-        ],
+        answers=[AnswerPublic.from_hit(hit) for hit in result["hits"]["hits"]],
         page=page,
         total_pages=total_pages,
     )
@@ -3,21 +3,129 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.database import get_es
-from app.models.vote import VoteRequest, VoteResponse, VoteType
+from app.models.vote import (
+    TargetType,
+    VoteBatchItemResult,
+    VoteBatchRequest,
+    VoteBatchResponse,
+    VoteRequest,
+    VoteResponse,
+    VoteType,
+)
+from app.services import metrics
+from app.services.counters import get_vote_counters
+from app.services.feed import get_feed_broadcaster
+from app.services.jobs import get_job_queue
+from app.services.reputation import get_reputation
+from app.services.stats import publish_stats
 from app.utils.auth import get_current_user
 
 router = APIRouter(tags=["votes"])
 
+# Painless script that applies vote deltas to a question/answer's counters
+VOTE_COUNTER_SCRIPT = """
+    ctx._source.upvote_count += params.up_delta;
+    ctx._source.downvote_count += params.down_delta;
+    ctx._source.score = ctx._source.upvote_count - ctx._source.downvote_count;
+"""
 
-async def _cast_vote(
+COUNTER_FIELDS = ["upvote_count", "downvote_count", "score"]
+
+# Attempts at a conditional vote write before giving up with 409
+MAX_VOTE_ATTEMPTS = 4
+
+TARGET_INDICES = {
+    TargetType.question: "questions",
+    TargetType.answer: "answers",
+}
+
+
+def _vote_deltas(existing_vote: str | None, new_vote: VoteType) -> tuple[int, int]:
+    """
+    Work out the (upvote_delta, downvote_delta) for a vote state transition.
+
+    Raises 400 when removing a vote that doesn't exist and 409 when the
+    user already voted the same way — both before anything is written.
+    """
+    if new_vote == VoteType.none:
+        if existing_vote is None:
+            raise HTTPException(status_code=400, detail="No vote to remove")
+        return (-1, 0) if existing_vote == "up" else (0, -1)
+
+    if existing_vote == new_vote.value:
+        raise HTTPException(status_code=409, detail=f"Already voted {new_vote.value}")
+
+    up_delta, down_delta = (1, 0) if new_vote == VoteType.up else (0, 1)
+    if existing_vote is not None:
+        # Changing direction also takes back the old vote
+        up_delta, down_delta = up_delta - down_delta, down_delta - up_delta
+    return up_delta, down_delta
+
+
+def _vote_doc_id(user: dict, target_id: str) -> str:
+    return f"vote_{user['id']}_{target_id}"
+
+
+def _vote_operations(
+    vote_doc_id: str,
+    existing_doc: dict,
+    final_vote: str | None,
     target_id: str,
     target_type: str,
-    target_index: str,
-    vote_req: VoteRequest,
     user: dict,
-) -> VoteResponse:
+) -> list[dict]:
     """
-    Shared voting logic for questions and answers.
+    Build the _bulk action lines that move the vote document to its final state.
+
+    Every write is conditional on the vote we read: create-only when there
+    was none, otherwise pinned to its _seq_no/_primary_term.
+    """
+    if not existing_doc.get("found"):
+        vote_doc = {
+            "target_id": target_id,
+            "target_type": target_type,
+            "user_id": user["id"],
+            "vote_type": final_vote,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return [{"create": {"_index": "votes", "_id": vote_doc_id}}, vote_doc]
+
+    version = {
+        "if_seq_no": existing_doc["_seq_no"],
+        "if_primary_term": existing_doc["_primary_term"],
+    }
+    if final_vote is None:
+        return [{"delete": {"_index": "votes", "_id": vote_doc_id, **version}}]
+
+    return [
+        {"update": {"_index": "votes", "_id": vote_doc_id, **version}},
+        {"doc": {"vote_type": final_vote}},
+    ]
+
+
+def _counter_operations(target_index: str, target_id: str, up_delta: int, down_delta: int) -> list[dict]:
+    """Atomic counter update on the target document via Painless script."""
+    return [
+        {"update": {"_index": target_index, "_id": target_id, "retry_on_conflict": 3}},
+        {
+            "script": {
+                "source": VOTE_COUNTER_SCRIPT,
+                "params": {
+                    "up_delta": up_delta,
+                    "down_delta": down_delta,
+                },
+            },
+            "_source": COUNTER_FIELDS,
+        },
+    ]
+
+
+async def _apply_votes(
+    votes: list[tuple[TargetType, str, VoteType]],
+    user: dict,
+) -> list[VoteBatchItemResult]:
+    """
+    Shared voting logic for questions and answers, single or batched.
 
     Uses deterministic document IDs (vote_{user_id}_{target_id}) so
     ES naturally enforces one-vote-per-user — same ID = same document.
@@ -27,107 +135,319 @@ async def _cast_vote(
     - Existing up → down: UPDATE vote, decrement up + increment down
     - Existing up → none: DELETE vote, decrement up
     - Existing vote → same vote: 409 conflict (already voted that way)
+
+    Two ES round-trips regardless of batch size, no forced refreshes:
+    1. mget  → every target's existence + the user's current votes
+    2. _bulk → vote document writes + Painless counter updates, which hand
+               back the updated counters via _source (no re-fetch)
+
+    Votes on the same target are replayed in order against an in-memory
+    state first, so each target gets at most one vote write and one
+    counter update carrying the net delta.
+
+    Vote writes are conditional on the state that was read: op_type=create
+    when there was no vote, if_seq_no/if_primary_term otherwise. If another
+    request got there first, that target's counter update (which rode in
+    the same _bulk) is compensated in the next attempt, its vote is re-read
+    and the transition replayed — up to MAX_VOTE_ATTEMPTS times, after
+    which the item fails with 409. Conflicts and exhausted retries are
+    counted in /metrics.
+
+    A counter update that finds its target gone (deleted after the mget)
+    fails the item with 404, and the vote document written beside it is
+    deleted again so nothing is left pointing at the missing target.
+
+    Counter updates retry their own version conflicts (retry_on_conflict).
+    One that still fails is not a failed vote — the vote write beside it
+    has landed — so its delta is handed to the job queue as a background
+    increment and the reply carries the counts it will produce.
+
+    With VOTE_WRITE_BEHIND enabled the counter updates are left out of the
+    _bulk and merged into the in-memory aggregator instead; the returned
+    counts are then eventually consistent (see CounterAggregator).
     """
     es = get_es()
+    counters = get_vote_counters()
+    reputation = get_reputation()
 
-    # Validate target exists
-    try:
-        await es.get(index=target_index, id=target_id)
-    except Exception:
-        raise HTTPException(status_code=404, detail=f"{target_type.title()} not found")
+    targets = list(dict.fromkeys((target_type, target_id) for target_type, target_id, _ in votes))
+    docs = []
+    for target_type, target_id in targets:
+        docs += [
+            {
+                "_index": TARGET_INDICES[target_type],
+                "_id": target_id,
+                "_source": COUNTER_FIELDS + ["author_id", "forum_id", "question_id"],
+            },
+            {"_index": "votes", "_id": _vote_doc_id(user, target_id), "_source": ["vote_type"]},
+        ]
+    lookup = (await es.mget(docs=docs))["docs"]
 
-    vote_doc_id = f"vote_{user['id']}_{target_id}"
-    new_vote = vote_req.vote
+    stored: dict[tuple, dict | None] = {}
+    authors: dict[tuple, str | None] = {}
+    parents: dict[tuple, dict] = {}
+    existing: dict[tuple, dict] = {}
+    for i, target in enumerate(targets):
+        target_doc, existing_doc = lookup[2 * i], lookup[2 * i + 1]
+        stored[target] = target_doc["_source"] if target_doc.get("found") else None
+        authors[target] = (stored[target] or {}).get("author_id")
+        # Questions know their forum, answers their question (for /ws/feed)
+        source = stored[target] or {}
+        parents[target] = {field: source[field] for field in ("forum_id", "question_id") if field in source}
+        existing[target] = existing_doc
 
-    # Check for existing vote
-    existing_vote = None
-    try:
-        existing_doc = await es.get(index="votes", id=vote_doc_id)
-        existing_vote = existing_doc["_source"]["vote_type"]
-    except Exception:
-        pass
+    results = [
+        VoteBatchItemResult(target_type=target_type.value, target_id=target_id, status=200)
+        for target_type, target_id, _ in votes
+    ]
+    items_by_target: dict[tuple, list[int]] = {target: [] for target in targets}
+    for i, (target_type, target_id, _) in enumerate(votes):
+        if stored[(target_type, target_id)] is None:
+            results[i].status = 404
+            results[i].detail = f"{target_type.value.title()} not found"
+        else:
+            items_by_target[(target_type, target_id)].append(i)
 
-    # Calculate deltas for the denormalized counters
-    upvote_delta = 0
-    downvote_delta = 0
+    # Counter deltas that landed for a vote write that then lost a race
+    compensation = {target: (0, 0) for target in targets}
+    original: dict[tuple, str | None] = {}
+    state: dict[tuple, str | None] = {}
+    deltas: dict[tuple, tuple[int, int]] = {}
+    failed: dict[tuple, int] = {}
+    # Counter deltas in the current _bulk
+    sent: dict[tuple, tuple[int, int]] = {}
+    pending = [target for target in targets if stored[target] is not None]
 
-    if new_vote == VoteType.none:
-        # Removing a vote
-        if existing_vote is None:
-            raise HTTPException(status_code=400, detail="No vote to remove")
-        # Delete the vote document
-        await es.delete(index="votes", id=vote_doc_id, refresh="wait_for")
-        if existing_vote == "up":
-            upvote_delta = -1
-        else:
-            downvote_delta = -1
+    for attempt in range(MAX_VOTE_ATTEMPTS):
+        # Replay the requested votes in order against the state we read
+        for target in pending:
+            doc = existing[target]
+            original[target] = doc["_source"]["vote_type"] if doc.get("found") else None
+            state[target] = original[target]
+            up_total, down_total = 0, 0
+            for i in items_by_target[target]:
+                new_vote = votes[i][2]
+                result = results[i]
+                result.status, result.vote, result.detail = 200, None, None
+                try:
+                    up_delta, down_delta = _vote_deltas(state[target], new_vote)
+                except HTTPException as exc:
+                    result.status = exc.status_code
+                    result.detail = exc.detail
+                    continue
+                up_total += up_delta
+                down_total += down_delta
+                state[target] = None if new_vote == VoteType.none else new_vote.value
+                result.vote = new_vote.value
+            deltas[target] = (up_total, down_total)
 
-    elif existing_vote is None:
-        # New vote (no previous vote exists)
-        vote_doc = {
-            "target_id": target_id,
-            "target_type": target_type,
-            "user_id": user["id"],
-            "vote_type": new_vote.value,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-        }
-        await es.index(
-            index="votes",
-            id=vote_doc_id,
-            document=vote_doc,
-            refresh="wait_for",
+        # One conditional vote write + one counter update per changed target
+        operations = []
+        op_targets = []
+        for target in pending:
+            target_type, target_id = target
+            changed = state[target] != original[target]
+            if changed:
+                operations += _vote_operations(
+                    _vote_doc_id(user, target_id),
+                    existing[target],
+                    state[target],
+                    target_id,
+                    target_type.value,
+                    user,
+                )
+                op_targets.append((target, "vote"))
+            if counters is None:
+                up_delta = (deltas[target][0] if changed else 0) + compensation[target][0]
+                down_delta = (deltas[target][1] if changed else 0) + compensation[target][1]
+                if changed or up_delta or down_delta:
+                    operations += _counter_operations(TARGET_INDICES[target_type], target_id, up_delta, down_delta)
+                    op_targets.append((target, "counter"))
+                    sent[target] = (up_delta, down_delta)
+
+        if not operations:
+            break
+        metrics.inc("vote_transitions_total", sum(1 for _, kind in op_targets if kind == "vote"))
+        response = await es.bulk(operations=operations)
+
+        conflicts = []
+        written = set()
+        orphaned = []
+        for (target, kind), item in zip(op_targets, response["items"]):
+            outcome = next(iter(item.values()))
+            if kind == "vote":
+                if "error" in outcome:
+                    # Usually someone else moved this vote since we read it
+                    # (409, or 404 when it was deleted under us)
+                    conflicts.append(target)
+                else:
+                    written.add(target)
+            elif "error" in outcome and outcome.get("status") == 404:
+                failed.setdefault(target, 404)
+                if target in written:
+                    orphaned.append(target)
+            else:
+                if "error" in outcome:
+                    deferred = _defer_counter(target, stored[target], *sent[target])
+                    if deferred is None:
+                        failed.setdefault(target, 409)
+                        continue
+                    stored[target] = deferred
+                else:
+                    stored[target] = outcome["get"]["_source"]
+                # Whatever we sent has landed (or will); only a lost vote race needs undoing
+                compensation[target] = (0, 0)
+
+        if orphaned:
+            # The target was deleted after we read it: reported as 404, so
+            # the vote written beside its counter update must not stay either
+            await _drop_votes(user, orphaned)
+        conflicts = [target for target in conflicts if target not in failed]
+        for target in conflicts:
+            if counters is None:
+                compensation[target] = (-deltas[target][0], -deltas[target][1])
+
+        if not conflicts:
+            break
+        metrics.inc("vote_conflicts_total", len(conflicts))
+        if attempt == MAX_VOTE_ATTEMPTS - 1:
+            metrics.inc("vote_retries_exhausted_total", len(conflicts))
+            for target in conflicts:
+                failed[target] = 409
+            if counters is None:
+                await _compensate(conflicts, compensation)
+            break
+
+        pending = conflicts
+        reread = await es.mget(
+            docs=[
+                {"_index": "votes", "_id": _vote_doc_id(user, target_id), "_source": ["vote_type"]}
+                for _, target_id in pending
+            ]
         )
-        if new_vote == VoteType.up:
-            upvote_delta = 1
-        else:
-            downvote_delta = 1
+        for target, doc in zip(pending, reread["docs"]):
+            existing[target] = doc
 
-    elif existing_vote == new_vote.value:
-        # Already voted the same way
-        raise HTTPException(status_code=409, detail=f"Already voted {new_vote.value}")
+    # Author reputation follows every vote transition that landed
+    applied = [
+        target for target in targets
+        if stored[target] is not None and target not in failed and state[target] != original[target]
+    ]
+    if reputation is not None:
+        for target_type, target_id in applied:
+            reputation.record_vote(
+                authors[(target_type, target_id)],
+                user["id"],
+                target_type.value,
+                original[(target_type, target_id)],
+                state[(target_type, target_id)],
+            )
 
-    else:
-        # Changing vote direction (up → down or down → up)
-        await es.update(
-            index="votes",
-            id=vote_doc_id,
-            doc={"vote_type": new_vote.value},
-            refresh="wait_for",
+    # Live /stats subscribers see the upvote totals move
+    upvotes = {TargetType.question: 0, TargetType.answer: 0}
+    for target in applied:
+        upvotes[target[0]] += deltas[target][0]
+    if any(upvotes.values()):
+        publish_stats(
+            question_upvotes=upvotes[TargetType.question],
+            answer_upvotes=upvotes[TargetType.answer],
+            total_upvotes=sum(upvotes.values()),
         )
-        if new_vote == VoteType.up:
-            upvote_delta = 1
-            downvote_delta = -1
-        else:
-            upvote_delta = -1
-            downvote_delta = 1
-
-    # Atomic counter update on the target document via Painless script
-    await es.update(
-        index=target_index,
-        id=target_id,
-        script={
-            "source": """
-                ctx._source.upvote_count += params.up_delta;
-                ctx._source.downvote_count += params.down_delta;
-                ctx._source.score = ctx._source.upvote_count - ctx._source.downvote_count;
-            """,
-            "params": {
-                "up_delta": upvote_delta,
-                "down_delta": downvote_delta,
-            },
-        },
-        refresh="wait_for",
+
+    if counters is not None:
+        # Write-behind: the vote docs are durable, the counter deltas are
+        # merged in memory and flushed in bulk — report the eventual counts.
+        for target in applied:
+            target_type, target_id = target
+            counters.add(
+                TARGET_INDICES[target_type],
+                target_id,
+                upvote_count=deltas[target][0],
+                downvote_count=deltas[target][1],
+            )
+        for target in targets:
+            if stored[target] is not None:
+                target_type, target_id = target
+                stored[target] = counters.count(TARGET_INDICES[target_type], target_id, stored[target])
+
+    for result in results:
+        target = (TargetType(result.target_type), result.target_id)
+        if result.status == 200 and target in failed:
+            result.status = failed[target]
+            result.vote = None
+            result.detail = (
+                f"{result.target_type.title()} not found"
+                if failed[target] == 404
+                else "Vote changed concurrently, please retry"
+            )
+        if stored[target] is not None:
+            result.upvote_count = stored[target]["upvote_count"]
+            result.downvote_count = stored[target]["downvote_count"]
+            result.score = stored[target]["score"]
+
+    feed = get_feed_broadcaster()
+    if feed is not None:
+        for target in applied:
+            target_type, target_id = target
+            event = {"type": "vote", "target_type": target_type.value, "target_id": target_id, **parents[target]}
+            feed.publish({**event, **{field: stored[target][field] for field in COUNTER_FIELDS}})
+    return results
+
+
+def _defer_counter(target: tuple, stored: dict, up_delta: int, down_delta: int) -> dict | None:
+    """Queue a counter update that kept conflicting; returns the counts it will produce (None: no queue)."""
+    jobs = get_job_queue()
+    if jobs is None:
+        return None
+    target_type, target_id = target
+    deltas = {"upvote_count": up_delta, "downvote_count": down_delta}
+    jobs.enqueue(
+        "increment",
+        index=TARGET_INDICES[target_type],
+        doc_id=target_id,
+        deltas={field: delta for field, delta in deltas.items() if delta},
     )
+    metrics.inc("vote_counters_deferred_total")
+    upvotes = stored["upvote_count"] + up_delta
+    downvotes = stored["downvote_count"] + down_delta
+    return {"upvote_count": upvotes, "downvote_count": downvotes, "score": upvotes - downvotes}
 
-    # Fetch updated counts to return
-    updated = await es.get(index=target_index, id=target_id)
-    src = updated["_source"]
+
+async def _drop_votes(user: dict, targets: list[tuple]) -> None:
+    """Delete the user's vote documents on targets that no longer exist."""
+    await get_es().bulk(
+        operations=[{"delete": {"_index": "votes", "_id": _vote_doc_id(user, target_id)}} for _, target_id in targets]
+    )
+
+
+async def _compensate(targets: list[tuple], compensation: dict[tuple, tuple[int, int]]) -> None:
+    """Undo counter deltas whose vote write lost the race for good."""
+    operations = []
+    for target in targets:
+        up_delta, down_delta = compensation[target]
+        if up_delta or down_delta:
+            target_type, target_id = target
+            operations += _counter_operations(TARGET_INDICES[target_type], target_id, up_delta, down_delta)
+    if operations:
+        await get_es().bulk(operations=operations)
+
+
+async def _cast_vote(
+    target_id: str,
+    target_type: TargetType,
+    vote_req: VoteRequest,
+    user: dict,
+) -> VoteResponse:
+    """Single vote: a batch of one, with failures surfaced as HTTP errors."""
+    (result,) = await _apply_votes([(target_type, target_id, vote_req.vote)], user)
+    if result.status != 200:
+        raise HTTPException(status_code=result.status, detail=result.detail)
 
     return VoteResponse(
-        vote=new_vote.value,
-        upvote_count=src["upvote_count"],
-        downvote_count=src["downvote_count"],
-        score=src["score"],
+        vote=result.vote,
+        upvote_count=result.upvote_count,
+        downvote_count=result.downvote_count,
+        score=result.score,
     )
 
 
@@ -145,8 +465,7 @@ async def vote_on_question(
     """Upvote, downvote, or remove vote on a question. Requires authentication."""
     return await _cast_vote(
         target_id=question_id,
-        target_type="question",
-        target_index="questions",
+        target_type=TargetType.question,
         vote_req=body,
         user=user,
     )
@@ -166,8 +485,31 @@ async def vote_on_answer(
     """Upvote, downvote, or remove vote on an answer. Requires authentication."""
     return await _cast_vote(
         target_id=answer_id,
-        target_type="answer",
-        target_index="answers",
+        target_type=TargetType.answer,
         vote_req=body,
         user=user,
     )
+
+
+# ──────────────────────────────────────────────────────────────
+# POST /votes/batch  — Cast many votes in one request
+# ──────────────────────────────────────────────────────────────
+
+
+@router.post("/votes/batch", response_model=VoteBatchResponse)
+async def vote_batch(
+    body: VoteBatchRequest,
+    user: dict = Depends(get_current_user),
+):
+    """
+    Cast up to 100 votes on questions and answers in one request. Requires authentication.
+
+    Items are applied in order; each gets its own result with the status it
+    would have had as a single vote (200, 400, 404 or 409). Several votes on
+    the same target are merged before they reach ES.
+    """
+    results = await _apply_votes(
+        [(item.target_type, item.target_id, item.vote) for item in body.votes],
+        user,
+    )
+    return VoteBatchResponse(results=results)
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.database import get_es
+from app.services.cache import WorkerLock
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_INDEX = "activity_rollup"
+ACTIVITY_FIELDS = ["questions", "answers", "votes"]
+COMPOSITE_PAGE_SIZE = 1000
+# Rollup documents written (or deleted) per _bulk
+WRITE_BATCH_SIZE = 1000
+
+HOUR = {"hour": {"date_histogram": {"field": "created_at", "fixed_interval": "1h"}}}
+# The rollup's own (forum, hour) keys, for finding buckets that emptied out
+ROLLUP_KEYS = [
+    {"forum_id": {"terms": {"field": "forum_id"}}},
+    {"hour": {"date_histogram": {"field": "bucket", "fixed_interval": "1h"}}},
+]
+
+# Source index → (rollup field, composite keys before the hour).
+# Answers and votes don't carry forum_id; their parents are resolved per page.
+ROLLUP_SOURCES = [
+    ("questions", "questions", [{"forum_id": {"terms": {"field": "forum_id"}}}]),
+    ("answers", "answers", [{"question_id": {"terms": {"field": "question_id"}}}]),
+    (
+        "votes",
+        "votes",
+        [
+            {"target_type": {"terms": {"field": "target_type"}}},
+            {"target_id": {"terms": {"field": "target_id"}}},
+        ],
+    ),
+]
+
+
+def _floor_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_id(forum_id: str, bucket: datetime) -> str:
+    return f"{forum_id}|{bucket.strftime('%Y-%m-%dT%H')}"
+
+
+class ActivityRollup:
+    """
+    Background job that keeps `activity_rollup` up to date.
+
+    The rollup holds one document per (forum_id, hour) with the number of
+    questions, answers and votes created in that hour. Every `interval`
+    seconds the job re-aggregates the raw indices from `lookback_hours`
+    before its last run up to now (one composite aggregation per source),
+    and overwrites those hours wholesale. Recomputing whole hours keeps it
+    idempotent and lets it absorb late refreshes and retracted votes;
+    buckets that emptied out are deleted. On startup it resumes from the
+    newest bucket already in the rollup, or backfills the retention window
+    when the rollup is empty. Buckets older than the retention are purged
+    once per hour. Reads are paged composite aggregations and writes go
+    out WRITE_BATCH_SIZE documents per _bulk, so a backfill of the whole
+    window costs many bounded requests rather than one huge one.
+
+    Answers and votes are attributed to the forum of their question; the
+    question → forum and answer → question maps are cached since neither
+    ever changes.
+
+    With several workers on a host only the one holding `lock` runs it.
+    """
+
+    def __init__(self, interval: float, lookback_hours: int, retention_days: int):
+        self.interval = interval
+        self.lookback = timedelta(hours=lookback_hours)
+        self.retention = timedelta(days=retention_days)
+        self._watermark: datetime | None = None
+        self._last_purge: datetime | None = None
+        self._forum_of_question: dict[str, str] = {}
+        self._question_of_answer: dict[str, str] = {}
+        self._task: asyncio.Task | None = None
+        self.lock = WorkerLock("activity-rollup")
+
+    # ── aggregation ────────────────────────────────────────────
+
+    async def run_once(self, now: datetime | None = None) -> int:
+        """Recompute the hours since the last run. Returns rollup docs written."""
+        now = now or datetime.now(timezone.utc)
+        if self._watermark is None:
+            self._watermark = await self._resume_point(now)
+        since = _floor_hour(min(self._watermark, now) - self.lookback)
+
+        counts: dict[tuple[str, datetime], dict[str, int]] = defaultdict(
+            lambda: {field: 0 for field in ACTIVITY_FIELDS}
+        )
+        for index, field, keys in ROLLUP_SOURCES:
+            async for buckets in self._hourly_buckets(index, keys, since):
+                forums = await self._resolve_forums(index, buckets)
+                for bucket, forum_id in zip(buckets, forums):
+                    if forum_id is None:
+                        continue
+                    hour = datetime.fromtimestamp(bucket["key"]["hour"] / 1000, tz=timezone.utc)
+                    counts[(forum_id, hour)][field] += bucket["doc_count"]
+
+        written = await self._write(since, counts)
+        self._watermark = now
+        if self._last_purge is None or now - self._last_purge >= timedelta(hours=1):
+            await self.purge(now)
+            self._last_purge = now
+        return written
+
+    async def _resume_point(self, now: datetime) -> datetime:
+        result = await get_es().search(
+            index=ROLLUP_INDEX,
+            sort=[{"bucket": {"order": "desc"}}],
+            source=["bucket"],
+            size=1,
+        )
+        hits = result["hits"]["hits"]
+        if not hits:
+            return now - self.retention
+        return datetime.fromisoformat(hits[0]["_source"]["bucket"])
+
+    def _hourly_buckets(self, index: str, keys: list[dict], since: datetime):
+        """Pages of composite buckets keyed by `keys` + hour, for docs created since `since`."""
+        return _composite_pages(index, {"range": {"created_at": {"gte": since.isoformat()}}}, keys + [HOUR])
+
+    async def _resolve_forums(self, index: str, buckets: list[dict]) -> list[str | None]:
+        if index == "questions":
+            return [bucket["key"]["forum_id"] for bucket in buckets]
+        if index == "answers":
+            question_ids = [bucket["key"]["question_id"] for bucket in buckets]
+        else:
+            answer_ids = [b["key"]["target_id"] for b in buckets if b["key"]["target_type"] == "answer"]
+            await self._load_parents("answers", answer_ids, "question_id", self._question_of_answer)
+            question_ids = [
+                b["key"]["target_id"]
+                if b["key"]["target_type"] == "question"
+                else self._question_of_answer.get(b["key"]["target_id"])
+                for b in buckets
+            ]
+        await self._load_parents(
+            "questions", [q for q in question_ids if q], "forum_id", self._forum_of_question
+        )
+        return [self._forum_of_question.get(q) if q else None for q in question_ids]
+
+    async def _load_parents(self, index: str, ids: list[str], field: str, cache: dict[str, str]) -> None:
+        missing = list({doc_id for doc_id in ids if doc_id not in cache})
+        if not missing:
+            return
+        if len(cache) > 100_000:
+            cache.clear()
+        result = await get_es().mget(index=index, ids=missing, source=[field])
+        for doc in result["docs"]:
+            if doc.get("found"):
+                cache[doc["_id"]] = doc["_source"][field]
+
+    async def _write(self, since: datetime, counts: dict) -> int:
+        es = get_es()
+        batch = []
+        for (forum_id, hour), values in counts.items():
+            batch += [
+                {"index": {"_index": ROLLUP_INDEX, "_id": _rollup_id(forum_id, hour)}},
+                {"forum_id": forum_id, "bucket": hour.isoformat(), **values},
+            ]
+            if len(batch) >= 2 * WRITE_BATCH_SIZE:
+                await es.bulk(operations=batch)
+                batch = []
+
+        # Hours in the window that no longer have any activity
+        query = {"range": {"bucket": {"gte": since.isoformat()}}}
+        async for buckets in _composite_pages(ROLLUP_INDEX, query, ROLLUP_KEYS):
+            for bucket in buckets:
+                hour = datetime.fromtimestamp(bucket["key"]["hour"] / 1000, tz=timezone.utc)
+                if (bucket["key"]["forum_id"], hour) not in counts:
+                    rollup_id = _rollup_id(bucket["key"]["forum_id"], hour)
+                    batch.append({"delete": {"_index": ROLLUP_INDEX, "_id": rollup_id}})
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    await es.bulk(operations=batch)
+                    batch = []
+
+        if batch:
+            await es.bulk(operations=batch)
+        return len(counts)
+
+    async def purge(self, now: datetime) -> None:
+        """Drop rollup buckets older than the retention window."""
+        cutoff = _floor_hour(now - self.retention)
+        await get_es().delete_by_query(
+            index=ROLLUP_INDEX,
+            query={"range": {"bucket": {"lt": cutoff.isoformat()}}},
+        )
+
+    # ── lifecycle ──────────────────────────────────────────────
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.lock.release()
+
+    async def _run(self) -> None:
+        while True:
+            # One worker per host does the rollup; the others keep trying
+            # the lock in case it exits
+            if not self.lock.acquire():
+                await asyncio.sleep(self.interval)
+                continue
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Activity rollup failed")
+            await asyncio.sleep(self.interval)
+
+
+async def _composite_pages(index: str, query: dict, sources: list[dict]):
+    """Every bucket of a composite aggregation, one page (list of buckets) at a time."""
+    after = None
+    while True:
+        composite = {"size": COMPOSITE_PAGE_SIZE, "sources": sources}
+        if after:
+            composite["after"] = after
+        result = await get_es().search(
+            index=index,
+            size=0,
+            query=query,
+            aggs={"activity": {"composite": composite}},
+        )
+        agg = result["aggregations"]["activity"]
+        if agg["buckets"]:
+            yield agg["buckets"]
+        after = agg.get("after_key")
+        if not after or len(agg["buckets"]) < COMPOSITE_PAGE_SIZE:
+            break
+
+
+activity_rollup: ActivityRollup | None = None
+
+
+def init_activity_rollup() -> ActivityRollup:
+    """Start the background rollup job (called at app startup)."""
+    global activity_rollup
+    activity_rollup = ActivityRollup(
+        interval=settings.activity_rollup_interval_seconds,
+        lookback_hours=settings.activity_rollup_lookback_hours,
+        retention_days=settings.activity_rollup_retention_days,
+    )
+    activity_rollup.start()
+    return activity_rollup
+
+
+async def close_activity_rollup():
+    """Stop the rollup job (called at app shutdown)."""
+    global activity_rollup
+    if activity_rollup:
+        await activity_rollup.stop()
+        activity_rollup = None
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from app.config import settings
+from app.services.cache import get_cache
+
+# Recent answers kept per question (more than a long-poll ever returns)
+RECENT_PER_QUESTION = 20
+
+
+class _Waiter:
+    __slots__ = ("question_id", "wakeup")
+
+    def __init__(self, question_id: str):
+        self.question_id = question_id
+        self.wakeup = asyncio.Event()
+
+
+class AnswerNotifier:
+    """
+    Wakes long-polls on GET /questions/{id}/answers/wait when an answer arrives.
+
+    create_answer calls publish() with the new answer, which is also
+    relayed to the other workers on the host (app/services/cache.py).
+    The notifier keeps each question's answers from the last `retention`
+    seconds, so a poll that starts just after an answer (before the next
+    index refresh makes it searchable) still gets it, and wakes the
+    question's waiters. Waiting costs no ES calls: a waiter is an Event,
+    set by publish(). Answers written through another host are not seen
+    here; their long-polls time out and the next list read finds them.
+    Only the last RECENT_PER_QUESTION answers of a question are kept; once
+    older ones have been evicted, covers() says so for any `since` before
+    them, and the caller reads ES instead.
+    """
+
+    def __init__(self, retention: float, max_waiters: int):
+        self.retention = retention
+        self.max_waiters = max_waiters
+        self.started_at = time.time()
+        # question_id → (last publish, deque of (created_at, answer)), oldest first
+        self._recent: OrderedDict[str, tuple[float, deque]] = OrderedDict()
+        # question_id → created_at of the newest answer evicted from its deque
+        self._evicted: dict[str, datetime] = {}
+        self._waiters: dict[str, set[_Waiter]] = {}
+        self._count = 0
+        self.closed = False
+
+    def covers(self, question_id: str, since: datetime) -> bool:
+        """Whether every answer to the question newer than `since` is known here (no ES read needed)."""
+        evicted = self._evicted.get(question_id)
+        if evicted is not None and since < evicted:
+            return False
+        return since.timestamp() >= max(self.started_at, time.time() - self.retention)
+
+    def recent(self, question_id: str, since: datetime) -> list[dict]:
+        """Known answers to a question created after `since`, oldest first."""
+        entry = self._recent.get(question_id)
+        if entry is None:
+            return []
+        return [answer for created_at, answer in entry[1] if created_at > since]
+
+    def publish(self, answer: dict) -> None:
+        """Record a new answer (with its id) and wake its question's waiters, in every worker."""
+        self._record(answer)
+        cache = get_cache()
+        if cache is not None:
+            cache.publish("answers", answer)
+
+    def _record(self, answer: dict) -> None:
+        now = time.time()
+        question_id = answer["question_id"]
+        entry = self._recent.pop(question_id, None)
+        answers = entry[1] if entry else deque(maxlen=RECENT_PER_QUESTION)
+        if len(answers) == answers.maxlen:
+            self._evicted[question_id] = answers[0][0]  # about to be pushed out
+        answers.append((datetime.fromisoformat(answer["created_at"]), answer))
+        self._recent[question_id] = (now, answers)
+        while self._recent:
+            oldest, (published, _) = next(iter(self._recent.items()))
+            if now - published <= self.retention:
+                break
+            del self._recent[oldest]
+            self._evicted.pop(oldest, None)
+        for waiter in self._waiters.get(question_id, ()):
+            waiter.wakeup.set()
+
+    def waiter(self, question_id: str) -> _Waiter | None:
+        """Register interest in a question, or None when at capacity."""
+        if self._count >= self.max_waiters:
+            return None
+        waiter = _Waiter(question_id)
+        self._waiters.setdefault(question_id, set()).add(waiter)
+        self._count += 1
+        return waiter
+
+    def release(self, waiter: _Waiter) -> None:
+        waiters = self._waiters.get(waiter.question_id)
+        if waiters is not None and waiter in waiters:
+            waiters.discard(waiter)
+            self._count -= 1
+            if not waiters:
+                del self._waiters[waiter.question_id]
+
+    async def wait(self, waiter: _Waiter, since: datetime, timeout: float) -> list[dict]:
+        """Answers after `since`: at once if there are any, else the first to arrive within `timeout`."""
+        deadline = time.monotonic() + timeout
+        while True:
+            answers = self.recent(waiter.question_id, since)
+            remaining = deadline - time.monotonic()
+            if answers or remaining <= 0 or self.closed:
+                return answers
+            waiter.wakeup.clear()
+            try:
+                await asyncio.wait_for(waiter.wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self) -> None:
+        """Wake every waiter (so shutdown doesn't wait on them)."""
+        self.closed = True
+        self.max_waiters = 0
+        for waiters in self._waiters.values():
+            for waiter in waiters:
+                waiter.wakeup.set()
+
+
+answer_notifier: AnswerNotifier | None = None
+
+
+def init_answer_notifier() -> AnswerNotifier:
+    """Create the notifier and listen for other workers' answers (called at app startup)."""
+    global answer_notifier
+    answer_notifier = AnswerNotifier(
+        retention=settings.answer_wait_retention_seconds,
+        max_waiters=settings.answer_wait_max_waiters,
+    )
+    cache = get_cache()
+    if cache is not None:
+        cache.subscribe("answers", answer_notifier._record)
+    return answer_notifier
+
+
+def close_answer_notifier():
+    """Release every parked long-poll (called at app shutdown)."""
+    global answer_notifier
+    if answer_notifier:
+        answer_notifier.close()
+        answer_notifier = None
+
+
+def get_answer_notifier() -> AnswerNotifier | None:
+    """The answer notifier, or None outside the app lifespan."""
+    return answer_notifier
@@ -0,0 +1,384 @@
+"""
+A cache shared by the worker processes on one host, plus a message channel
+between them.
+
+With several uvicorn workers (`python -m app.commands.serve --workers N`)
+every in-process structure — the forum catalog, the leaderboard, the
+/stats snapshot — exists once per worker. get_cache() returns the
+process's cache, which gives them a common interface:
+
+    await cache.get(key)            value, or None on a miss
+    cache.set(key, value, ttl)      ttl in seconds, None = until evicted
+    cache.delete(*keys)
+    cache.delete_prefix(prefix)
+    cache.publish(channel, message) deliver to the *other* workers
+    cache.subscribe(channel, fn)    fn(message) for messages from them
+
+Two implementations:
+
+    LocalCache   in-process TTL + LRU dict; publish() has nobody to tell.
+                 The default, and all a single worker needs.
+    SocketCache  a LocalCache (L1) in front of a CacheHub, which the serve
+                 command runs in its parent process on a unix socket. A
+                 miss in L1 asks the hub; set/delete go to the hub, which
+                 relays them to every other worker as invalidations, so
+                 no worker keeps serving a value another one replaced.
+                 publish() is relayed the same way.
+
+Writes and messages are fire-and-forget: nothing on a request path waits
+for another process. If the hub goes away a SocketCache drops its L1
+(invalidations may have been missed), keeps working as a LocalCache and
+reconnects in the background.
+
+Values must be JSON-serializable, and are shared with other callers:
+don't mutate what get() returns.
+"""
+
+import asyncio
+import fcntl
+import itertools
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import Callable
+
+import orjson
+
+from app.config import settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# One frame per line; the largest values are pages of search hits
+MAX_FRAME = 16 * 1024 * 1024
+# A hub client this far behind is disconnected (it drops its L1 and reconnects)
+MAX_CLIENT_BACKLOG = 64 * 1024 * 1024
+HUB_REQUEST_TIMEOUT = 0.5
+RECONNECT_INTERVAL = 1.0
+
+
+class LocalCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key → (expires_at or None, value), least recently used first
+        self._entries: OrderedDict[str, tuple[float | None, object]] = OrderedDict()
+        self._handlers: dict[str, list[Callable]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str):
+        value = self._lookup(key)
+        metrics.inc("cache_misses_total" if value is None else "cache_hits_total")
+        return value
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        self._store(key, value, ttl)
+
+    def delete(self, *keys: str) -> None:
+        self._drop(keys)
+
+    def delete_prefix(self, prefix: str) -> None:
+        self._drop_prefix(prefix)
+
+    def publish(self, channel: str, message) -> None:
+        """Send `message` to the other workers (there are none)."""
+
+    def subscribe(self, channel: str, handler: Callable) -> None:
+        self._handlers[channel].append(handler)
+
+    async def close(self) -> None:
+        pass
+
+    # ── the local store ────────────────────────────────────────
+
+    def _lookup(self, key: str):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _remaining_ttl(self, key: str) -> float | None:
+        expires_at = self._entries[key][0]
+        return None if expires_at is None else max(0.0, expires_at - time.monotonic())
+
+    def _store(self, key: str, value, ttl: float | None) -> None:
+        self._entries[key] = (None if ttl is None else time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _drop(self, keys) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def _drop_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def _deliver(self, channel: str, message) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("Cache message handler for %r failed", channel)
+
+
+def _frame(message: dict) -> bytes:
+    return orjson.dumps(message) + b"\n"
+
+
+class CacheHub:
+    """
+    The shared store behind SocketCache, serving the workers of one host
+    over a unix socket. One JSON object per line, each with an "op":
+
+        get             → {"op": "reply", "id", "value", "ttl"}
+        set, delete,
+        delete_prefix   applied here, relayed to the other clients as
+                        invalidate / invalidate_prefix
+        publish         relayed to the other clients as message
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.store = LocalCache(max_entries)
+        self._clients: set[asyncio.StreamWriter] = set()
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a previous run
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path, limit=MAX_FRAME)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                self._handle(writer, orjson.loads(line))
+        except (ConnectionError, ValueError) as exc:
+            logger.warning("Cache hub dropped a client: %s", exc)
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    def _handle(self, sender: asyncio.StreamWriter, message: dict) -> None:
+        op = message["op"]
+        store = self.store
+        if op == "get":
+            key = message["key"]
+            value = store._lookup(key)
+            ttl = store._remaining_ttl(key) if value is not None else None
+            sender.write(_frame({"op": "reply", "id": message["id"], "value": value, "ttl": ttl}))
+        elif op == "set":
+            store._store(message["key"], message["value"], message.get("ttl"))
+            self._relay(sender, {"op": "invalidate", "keys": [message["key"]]})
+        elif op == "delete":
+            store._drop(message["keys"])
+            self._relay(sender, {"op": "invalidate", "keys": message["keys"]})
+        elif op == "delete_prefix":
+            store._drop_prefix(message["prefix"])
+            self._relay(sender, {"op": "invalidate_prefix", "prefix": message["prefix"]})
+        elif op == "publish":
+            self._relay(sender, {"op": "message", "channel": message["channel"], "message": message["message"]})
+
+    def _relay(self, sender: asyncio.StreamWriter, message: dict) -> None:
+        data = _frame(message)
+        for writer in list(self._clients):
+            if writer is sender:
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BACKLOG:
+                logger.warning("Cache hub client is not reading; disconnecting it")
+                self._clients.discard(writer)
+                writer.close()
+                continue
+            writer.write(data)
+
+
+class SocketCache(LocalCache):
+    """A LocalCache that shares its entries and messages through a CacheHub."""
+
+    def __init__(self, path: str, max_entries: int):
+        super().__init__(max_entries)
+        self.path = path
+        self._writer: asyncio.StreamWriter | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._connected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def get(self, key: str):
+        value = self._lookup(key)
+        if value is None and self._writer is not None:
+            value = await self._fetch(key)
+        metrics.inc("cache_misses_total" if value is None else "cache_hits_total")
+        return value
+
+    async def _fetch(self, key: str):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._send({"op": "get", "id": request_id, "key": key})
+        try:
+            reply = await asyncio.wait_for(future, HUB_REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            return None
+        finally:
+            self._pending.pop(request_id, None)
+        if reply["value"] is not None:
+            self._store(key, reply["value"], reply["ttl"])
+        return reply["value"]
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        self._store(key, value, ttl)
+        self._send({"op": "set", "key": key, "value": value, "ttl": ttl})
+
+    def delete(self, *keys: str) -> None:
+        self._drop(keys)
+        self._send({"op": "delete", "keys": list(keys)})
+
+    def delete_prefix(self, prefix: str) -> None:
+        self._drop_prefix(prefix)
+        self._send({"op": "delete_prefix", "prefix": prefix})
+
+    def publish(self, channel: str, message) -> None:
+        self._send({"op": "publish", "channel": channel, "message": message})
+
+    def _send(self, message: dict) -> None:
+        if self._writer is not None:
+            self._writer.write(_frame(message))
+
+    # ── connection ─────────────────────────────────────────────
+
+    async def connect(self, timeout: float) -> bool:
+        """Start the connection loop; True if the hub answered within `timeout`."""
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME)
+            except OSError:
+                await asyncio.sleep(RECONNECT_INTERVAL)
+                continue
+            self._writer = writer
+            self._connected.set()
+            try:
+                while line := await reader.readline():
+                    self._receive(orjson.loads(line))
+            except (ConnectionError, ValueError) as exc:
+                logger.warning("Lost the cache hub: %s", exc)
+            finally:
+                self._writer = None
+                self._connected.clear()
+                writer.close()
+                # Invalidations sent while we were away are lost
+                self._entries.clear()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("cache hub disconnected"))
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+    def _receive(self, message: dict) -> None:
+        op = message["op"]
+        if op == "reply":
+            future = self._pending.get(message["id"])
+            if future is not None and not future.done():
+                future.set_result(message)
+        elif op == "invalidate":
+            self._drop(message["keys"])
+        elif op == "invalidate_prefix":
+            self._drop_prefix(message["prefix"])
+        elif op == "message":
+            self._deliver(message["channel"], message["message"])
+
+
+class WorkerLock:
+    """
+    A lock held by at most one process on the host (flock on a file in the
+    temp dir), for background jobs that should run once rather than once
+    per worker. Never blocks: try acquire() each time the job is due. The
+    OS releases it when the holder exits, so another worker takes over.
+    """
+
+    def __init__(self, name: str):
+        self.path = os.path.join(tempfile.gettempdir(), f"treehacks-qna-{name}.lock")
+        self._fd: int | None = None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+cache: LocalCache | None = None
+
+
+async def init_cache() -> LocalCache:
+    """Create the process's cache per CACHE_BACKEND (called at app startup)."""
+    global cache
+    if settings.cache_backend == "socket":
+        cache = SocketCache(settings.cache_socket_path, settings.cache_local_max_entries)
+        if not await cache.connect(timeout=2):
+            logger.warning("Cache hub at %s not reachable; running on the local cache", settings.cache_socket_path)
+    else:
+        cache = LocalCache(settings.cache_local_max_entries)
+    return cache
+
+
+async def close_cache():
+    """Disconnect from the cache hub, if any (called at app shutdown)."""
+    global cache
+    if cache:
+        await cache.close()
+        cache = None
+
+
+def get_cache() -> LocalCache | None:
+    """The process's cache, or None outside the app lifespan."""
+    return cache
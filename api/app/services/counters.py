@@ -0,0 +1,220 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from app.config import settings
+from app.database import get_es
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Generic Painless increment: adds every entry of params.deltas to the
+# matching field, then recomputes score for vote-carrying documents.
+INCREMENT_SCRIPT = """
+    for (entry in params.deltas.entrySet()) {
+        def current = ctx._source[entry.getKey()];
+        ctx._source[entry.getKey()] = (current == null ? 0 : current) + entry.getValue();
+    }
+    if (params.rescore) {
+        ctx._source.score = ctx._source.upvote_count - ctx._source.downvote_count;
+    }
+"""
+
+# Indices whose score field is derived from upvote_count - downvote_count
+SCORED_INDICES = {"questions", "answers"}
+
+Key = tuple[str, str]
+
+
+class CounterAggregator:
+    """
+    Write-behind buffer for denormalized counters.
+
+    Deltas are merged per (index, doc_id) in memory, so a burst of N votes
+    on one answer becomes a single scripted update instead of N updates
+    serialized through version conflicts. A background task flushes the
+    merged deltas with one _bulk every `flush_interval` seconds, and stop()
+    flushes whatever is left.
+
+    Staleness bound: a delta recorded at time t is visible in ES by
+    t + flush_interval + one _bulk round-trip. If ES rejects a flush the
+    deltas are put back and retried on the next tick, so during an outage
+    the bound grows with it. Whatever stop() still can't flush is handed
+    to the durable job queue (app/services/jobs.py) as increment jobs,
+    applied once ES takes them — after a restart if need be. Only with no
+    job queue running are leftovers dropped, logged and counted in
+    counter_deltas_dropped_total. Readers that need a fresher number use
+    count(), which folds pending and in-flight deltas into the value they
+    read from ES.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int = 500):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: dict[Key, dict[str, int]] = {}
+        self._inflight: dict[Key, dict[str, int]] = {}
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    # ── recording ──────────────────────────────────────────────
+
+    def add(self, index: str, doc_id: str, **deltas: int) -> None:
+        """Merge counter deltas for one document into the pending buffer."""
+        bucket = self._pending.setdefault((index, doc_id), defaultdict(int))
+        for field, delta in deltas.items():
+            if delta:
+                bucket[field] += delta
+
+    def pending(self, index: str, doc_id: str) -> dict[str, int]:
+        """Deltas recorded for a document that ES has not acknowledged yet."""
+        merged: dict[str, int] = defaultdict(int)
+        for buffer in (self._inflight, self._pending):
+            for field, delta in buffer.get((index, doc_id), {}).items():
+                merged[field] += delta
+        return merged
+
+    def count(self, index: str, doc_id: str, stored: dict) -> dict:
+        """Eventually consistent view: stored counters + unflushed deltas."""
+        view = dict(stored)
+        for field, delta in self.pending(index, doc_id).items():
+            view[field] = view.get(field, 0) + delta
+        if index in SCORED_INDICES:
+            view["score"] = view.get("upvote_count", 0) - view.get("downvote_count", 0)
+        return view
+
+    # ── flushing ───────────────────────────────────────────────
+
+    async def flush(self) -> None:
+        """Write all pending deltas to ES in bulk batches."""
+        async with self._flush_lock:
+            while self._pending:
+                keys = list(self._pending)[: self.max_batch]
+                self._inflight = {key: self._pending.pop(key) for key in keys}
+                try:
+                    failed = await self._write(self._inflight)
+                except Exception:
+                    logger.exception("Counter flush failed; will retry")
+                    failed = list(self._inflight)
+                for key in failed:
+                    self._requeue(key, self._inflight[key])
+                self._inflight = {}
+                if failed:
+                    break
+
+    async def _write(self, batch: dict[Key, dict[str, int]]) -> list[Key]:
+        operations = []
+        keys = []
+        for (index, doc_id), deltas in batch.items():
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if not deltas:
+                continue
+            keys.append((index, doc_id))
+            operations += [
+                {"update": {"_index": index, "_id": doc_id, "retry_on_conflict": 3}},
+                {
+                    "script": {
+                        "source": INCREMENT_SCRIPT,
+                        "params": {
+                            "deltas": deltas,
+                            "rescore": index in SCORED_INDICES,
+                        },
+                    }
+                },
+            ]
+        if not operations:
+            return []
+
+        result = await get_es().bulk(operations=operations)
+        if not result["errors"]:
+            return []
+
+        failed = []
+        for key, item in zip(keys, result["items"]):
+            outcome = item["update"]
+            if "error" not in outcome:
+                continue
+            if outcome.get("status") == 404:
+                # Target is gone — its counters no longer matter
+                continue
+            failed.append(key)
+        return failed
+
+    def _requeue(self, key: Key, deltas: dict[str, int]) -> None:
+        bucket = self._pending.setdefault(key, defaultdict(int))
+        for field, delta in deltas.items():
+            bucket[field] += delta
+
+    # ── lifecycle ──────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and flush everything still buffered (or queue it as jobs)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for attempt in range(3):
+            await self.flush()
+            if not self._pending:
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+        if self._pending:
+            self._hand_off()
+
+    def _hand_off(self) -> None:
+        """Journal the deltas ES wouldn't take as increment jobs."""
+        # Imported here: app.services.jobs imports this module
+        from app.services.jobs import get_job_queue
+
+        leftovers = {
+            key: {field: delta for field, delta in deltas.items() if delta}
+            for key, deltas in self._pending.items()
+        }
+        self._pending = {}
+        jobs = get_job_queue()
+        if jobs is None:
+            logger.error("Dropping %d unflushed counter updates at shutdown", len(leftovers))
+            metrics.inc("counter_deltas_dropped_total", len(leftovers))
+            return
+        for (index, doc_id), deltas in leftovers.items():
+            if deltas:
+                jobs.enqueue("increment", index=index, doc_id=doc_id, deltas=deltas)
+        logger.warning("Queued %d unflushed counter updates as background jobs", len(leftovers))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+vote_counters: CounterAggregator | None = None
+
+
+def init_vote_counters() -> CounterAggregator | None:
+    """Start the write-behind vote pipeline if enabled (called at app startup)."""
+    global vote_counters
+    if settings.vote_write_behind:
+        vote_counters = CounterAggregator(
+            flush_interval=settings.vote_flush_interval_ms / 1000,
+        )
+        vote_counters.start()
+    return vote_counters
+
+
+async def close_vote_counters():
+    """Flush and stop the write-behind vote pipeline (called at app shutdown)."""
+    global vote_counters
+    if vote_counters:
+        await vote_counters.stop()
+        vote_counters = None
+
+
+def get_vote_counters() -> CounterAggregator | None:
+    """The write-behind vote pipeline, or None when votes update counters inline."""
+    return vote_counters
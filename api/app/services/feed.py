@@ -0,0 +1,149 @@
+import asyncio
+from collections import OrderedDict, deque
+
+from app.config import settings
+from app.services.cache import get_cache
+
+# question_id → forum_id, so answer events can be filtered by forum
+FORUM_OF_QUESTION_SIZE = 10000
+
+
+class FeedClient:
+    """One /ws/feed connection: its forum filter and a bounded queue of events."""
+
+    __slots__ = ("forums", "events", "dropped", "wakeup", "closed")
+
+    def __init__(self, forums: set[str], queue_size: int):
+        self.forums = forums
+        self.events: deque[dict] = deque(maxlen=queue_size)
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+        self.closed = False
+
+    def wants(self, event: dict) -> bool:
+        return not self.forums or event.get("forum_id") in self.forums
+
+    def push(self, event: dict) -> None:
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1  # the deque drops the oldest event
+        self.events.append(event)
+        self.wakeup.set()
+
+    async def next(self) -> list[dict] | None:
+        """The events queued since the last call (waiting for one), or None once closed."""
+        while not self.events and not self.closed:
+            self.wakeup.clear()
+            await self.wakeup.wait()
+        if self.closed:
+            return None
+        batch = list(self.events)
+        self.events.clear()
+        if self.dropped:
+            # Tell the client it missed some, so it can re-read what it shows
+            batch.insert(0, {"type": "dropped", "count": self.dropped})
+            self.dropped = 0
+        return batch
+
+
+class FeedBroadcaster:
+    """
+    Fans write events out to every /ws/feed client.
+
+    The write handlers call publish() with a small event — a new
+    question or answer, or a vote with the target's new counts — which
+    is also relayed to the other workers on the host
+    (app/services/cache.py). publish() never blocks or touches ES: each
+    matching client gets the event appended to its own queue of at most
+    `queue_size` events. A client that falls further behind loses its
+    oldest events and is sent a "dropped" event with the count instead
+    of slowing anyone else down.
+
+    Events carry the forum_id they belong to. Votes on answers only know
+    their question, so the forum comes from a map of recent questions
+    learned from question, answer and vote events; a vote on an answer
+    to a question not in the map has no forum_id and only reaches
+    unfiltered clients.
+    """
+
+    def __init__(self, max_clients: int, queue_size: int):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.closed = False
+        self._clients: set[FeedClient] = set()
+        self._forum_of_question: OrderedDict[str, str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def subscribe(self, forums: set[str]) -> FeedClient | None:
+        """Register a client, or return None when at capacity."""
+        if self.closed or len(self._clients) >= self.max_clients:
+            return None
+        client = FeedClient(forums, self.queue_size)
+        self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client: FeedClient) -> None:
+        self._clients.discard(client)
+
+    def publish(self, event: dict) -> None:
+        """Deliver an event to this worker's clients and the other workers'."""
+        self._fanout(event)
+        cache = get_cache()
+        if cache is not None:
+            cache.publish("feed", event)
+
+    def _fanout(self, event: dict) -> None:
+        self._learn(event)
+        for client in self._clients:
+            if client.wants(event):
+                client.push(event)
+
+    def _learn(self, event: dict) -> None:
+        question_id = event["id"] if event["type"] == "question" else event.get("question_id")
+        if not question_id:
+            return
+        forum_id = event.get("forum_id")
+        if forum_id:
+            self._forum_of_question[question_id] = forum_id
+            self._forum_of_question.move_to_end(question_id)
+            if len(self._forum_of_question) > FORUM_OF_QUESTION_SIZE:
+                self._forum_of_question.popitem(last=False)
+        else:
+            event["forum_id"] = self._forum_of_question.get(question_id)
+
+    def close(self) -> None:
+        """End every open feed (so shutdown doesn't wait on them)."""
+        self.closed = True
+        for client in self._clients:
+            client.closed = True
+            client.wakeup.set()
+
+
+feed_broadcaster: FeedBroadcaster | None = None
+
+
+def init_feed() -> FeedBroadcaster:
+    """Create the feed broadcaster and listen for other workers' events (called at app startup)."""
+    global feed_broadcaster
+    feed_broadcaster = FeedBroadcaster(
+        max_clients=settings.feed_max_clients,
+        queue_size=settings.feed_client_queue_size,
+    )
+    cache = get_cache()
+    if cache is not None:
+        cache.subscribe("feed", feed_broadcaster._fanout)
+    return feed_broadcaster
+
+
+def close_feed():
+    """Close every feed connection (called at app shutdown)."""
+    global feed_broadcaster
+    if feed_broadcaster:
+        feed_broadcaster.close()
+        feed_broadcaster = None
+
+
+def get_feed_broadcaster() -> FeedBroadcaster | None:
+    """The live feed broadcaster, or None outside the app lifespan."""
+    return feed_broadcaster
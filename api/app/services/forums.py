@@ -0,0 +1,223 @@
+import asyncio
+import bisect
+import logging
+
+from elasticsearch import NotFoundError
+
+from app.config import settings
+from app.database import get_es
+from app.services.cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+# Forums are a small, rarely changing set; everything fits in one page
+MAX_FORUMS = 10000
+SEARCH_LIMIT = 50
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _by_popularity(forum: dict) -> tuple:
+    return (-forum.get("question_count", 0), forum["name"])
+
+
+class ForumCatalog:
+    """
+    Every forum, held in memory and searchable by name.
+
+    GET /forums, GET /forums/{id} and forum validation in create_question
+    are answered from here. Writes made by this process go through put()
+    and apply(), so they are visible immediately, and are passed to
+    `broadcast` for the other workers on the host (see
+    app/services/cache.py), which fold them in with receive(). reload()
+    pulls the full set from ES every `reload_interval` seconds to pick up
+    changes made anywhere else. A lookup that misses falls back to a
+    single ES get.
+
+    Name search is case-insensitive:
+    - prefix matches come from a sorted list of lowercased names (bisect)
+    - substring matches come from a trigram index, verified against the
+      name; queries shorter than three characters scan the names
+    """
+
+    def __init__(self, reload_interval: float):
+        self.reload_interval = reload_interval
+        self._forums: dict[str, dict] = {}
+        self._by_name: dict[str, str] = {}
+        self._sorted_names: list[tuple[str, str]] = []
+        self._trigrams: dict[str, set[str]] = {}
+        self._task: asyncio.Task | None = None
+        self.broadcast = None  # optional fn(message) -> None, to the other workers
+
+    # ── reads ──────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self._forums)
+
+    def get(self, forum_id: str) -> dict | None:
+        return self._forums.get(forum_id)
+
+    def find_by_name(self, name: str) -> dict | None:
+        forum_id = self._by_name.get(name)
+        return self._forums[forum_id] if forum_id else None
+
+    async def lookup(self, forum_id: str) -> dict | None:
+        """get(), falling back to ES for forums created by another process."""
+        forum = self._forums.get(forum_id)
+        if forum is not None:
+            return forum
+        try:
+            result = await get_es().get(index="forums", id=forum_id)
+        except NotFoundError:
+            return None
+        forum = {"id": result["_id"], **result["_source"]}
+        self._put(forum)
+        return forum
+
+    def search(self, query: str | None = None, limit: int = SEARCH_LIMIT) -> list[dict]:
+        """Forums whose name contains `query`: prefix matches first, each group by question_count."""
+        if not query:
+            return sorted(self._forums.values(), key=_by_popularity)[:limit]
+
+        needle = query.lower()
+        prefix_ids = []
+        start = bisect.bisect_left(self._sorted_names, (needle, ""))
+        for name, forum_id in self._sorted_names[start:]:
+            if not name.startswith(needle):
+                break
+            prefix_ids.append(forum_id)
+
+        if len(needle) >= 3:
+            postings = [self._trigrams.get(gram, set()) for gram in _trigrams(needle)]
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self._forums.keys()
+        prefixed = set(prefix_ids)
+        substring_ids = [
+            forum_id
+            for forum_id in candidates
+            if forum_id not in prefixed and needle in self._forums[forum_id]["name"].lower()
+        ]
+
+        prefix = sorted((self._forums[i] for i in prefix_ids), key=_by_popularity)
+        substring = sorted((self._forums[i] for i in substring_ids), key=_by_popularity)
+        return (prefix + substring)[:limit]
+
+    # ── writes ─────────────────────────────────────────────────
+
+    def put(self, forum: dict) -> None:
+        """Add or replace one forum (with its id)."""
+        self._put(forum)
+        if self.broadcast is not None:
+            self.broadcast({"put": forum})
+
+    def apply(self, forum_id: str, **deltas: int) -> None:
+        """Fold counter deltas into a cached forum."""
+        self._apply(forum_id, deltas)
+        if self.broadcast is not None:
+            self.broadcast({"apply": forum_id, "deltas": deltas})
+
+    def receive(self, message: dict) -> None:
+        """A put() or apply() made by another worker."""
+        if "put" in message:
+            self._put(message["put"])
+        else:
+            self._apply(message["apply"], message["deltas"])
+
+    def _put(self, forum: dict) -> None:
+        old = self._forums.get(forum["id"])
+        if old is not None and old["name"] != forum["name"]:
+            self._unindex(old)
+        self._forums[forum["id"]] = dict(forum)
+        if old is None or old["name"] != forum["name"]:
+            self._index(forum)
+
+    def _apply(self, forum_id: str, deltas: dict[str, int]) -> None:
+        forum = self._forums.get(forum_id)
+        if forum is None:
+            return
+        for field, delta in deltas.items():
+            forum[field] = forum.get(field, 0) + delta
+
+    def _index(self, forum: dict) -> None:
+        name = forum["name"].lower()
+        self._by_name[forum["name"]] = forum["id"]
+        bisect.insort(self._sorted_names, (name, forum["id"]))
+        for gram in _trigrams(name):
+            self._trigrams.setdefault(gram, set()).add(forum["id"])
+
+    def _unindex(self, forum: dict) -> None:
+        name = forum["name"].lower()
+        self._by_name.pop(forum["name"], None)
+        self._sorted_names.remove((name, forum["id"]))
+        for gram in _trigrams(name):
+            self._trigrams.get(gram, set()).discard(forum["id"])
+
+    # ── reloading ──────────────────────────────────────────────
+
+    async def reload(self) -> None:
+        """Replace the catalog with the current contents of the forums index."""
+        result = await get_es().search(index="forums", query={"match_all": {}}, size=MAX_FORUMS)
+        forums = {hit["_id"]: {"id": hit["_id"], **hit["_source"]} for hit in result["hits"]["hits"]}
+        if forums == self._forums:
+            return
+        self._forums = {}
+        self._by_name = {}
+        self._sorted_names = []
+        self._trigrams = {}
+        for forum in forums.values():
+            self._forums[forum["id"]] = forum
+            self._index(forum)
+
+    # ── lifecycle ──────────────────────────────────────────────
+
+    async def start(self) -> None:
+        await self.reload()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("Forum catalog reload failed")
+
+
+forum_catalog: ForumCatalog | None = None
+
+
+async def init_forum_catalog() -> ForumCatalog:
+    """Load every forum and start the reload loop (called at app startup)."""
+    global forum_catalog
+    forum_catalog = ForumCatalog(reload_interval=settings.forum_catalog_reload_interval_seconds)
+    cache = get_cache()
+    if cache is not None:
+        forum_catalog.broadcast = lambda message: cache.publish("forums", message)
+        cache.subscribe("forums", forum_catalog.receive)
+    await forum_catalog.start()
+    return forum_catalog
+
+
+async def close_forum_catalog():
+    """Stop the reload loop (called at app shutdown)."""
+    global forum_catalog
+    if forum_catalog:
+        await forum_catalog.stop()
+        forum_catalog = None
+
+
+def get_forum_catalog() -> ForumCatalog | None:
+    """The in-memory forum catalog, or None outside the app lifespan."""
+    return forum_catalog
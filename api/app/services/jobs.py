@@ -0,0 +1,295 @@
+"""
+Durable background jobs for the side effects of a write.
+
+A write endpoint indexes its primary document, enqueues the follow-up
+work (counter bumps on the parent and author documents, cache
+invalidation) and responds; the work runs here, after the response.
+
+    get_job_queue().enqueue("increment", index="users", doc_id=user_id, deltas={"answer_count": 1})
+
+Every job is journaled to SQLite (JOB_JOURNAL_PATH) before enqueue()
+returns and deleted once its handler succeeds, so jobs survive a crash or
+restart and are replayed at the next startup. The journal runs in WAL
+mode with synchronous=NORMAL: an insert is a small local write, not an
+fsync — durable across process crashes, not across power loss.
+
+- Bounded concurrency: JOB_CONCURRENCY workers per process.
+- Retries: a failed job is retried with exponential backoff (with
+  jitter) up to JOB_MAX_ATTEMPTS, then kept in the journal with
+  status "dead" for inspection.
+- Several processes can share one journal (the workers of
+  `app.commands.serve`): each job is leased to the process that owns
+  it, owners renew their leases while alive, and jobs whose lease ran
+  out — their process died — are claimed by whichever process notices.
+
+Delivery is at least once: a process that dies between a handler's ES
+call and the journal delete replays the job. An increment can then be
+applied twice; `python -m app.commands.reconcile_counters` repairs that.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import sqlite3
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import orjson
+from elasticsearch import NotFoundError
+
+from app.config import settings
+from app.database import get_es
+from app.services import metrics
+from app.services.cache import get_cache
+from app.services.counters import INCREMENT_SCRIPT, SCORED_INDICES
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 60.0
+# A process renews its leases every LEASE / 3 seconds
+LEASE = 60.0
+RECOVER_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    run_at      REAL NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    owner       TEXT,
+    lease_until REAL NOT NULL,
+    last_error  TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_lease ON jobs (status, lease_until);
+"""
+
+
+# ── handlers ──────────────────────────────────────────────────
+
+
+async def _increment(index: str, doc_id: str, deltas: dict[str, int]) -> None:
+    """Add counter deltas to one document."""
+    try:
+        await get_es().update(
+            index=index,
+            id=doc_id,
+            script={
+                "source": INCREMENT_SCRIPT,
+                "params": {"deltas": deltas, "rescore": index in SCORED_INDICES},
+            },
+            retry_on_conflict=3,
+        )
+    except NotFoundError:
+        # Nothing to count on; retrying won't make the document appear
+        logger.warning("Counter increment on missing %s/%s dropped", index, doc_id)
+
+
+async def _invalidate_prefix(prefix: str) -> None:
+    """Drop cached entries under a key prefix."""
+    cache = get_cache()
+    if cache is not None:
+        cache.delete_prefix(prefix)
+
+
+HANDLERS: dict[str, Callable[..., Awaitable[None]]] = {
+    "increment": _increment,
+    "invalidate_prefix": _invalidate_prefix,
+}
+
+
+# ── queue ─────────────────────────────────────────────────────
+
+
+@dataclass(slots=True)
+class Job:
+    id: int
+    kind: str
+    payload: dict
+    attempts: int = 0
+
+
+class JobQueue:
+    def __init__(self, path: str, concurrency: int, max_attempts: int, retry_base_delay: float):
+        self.path = path
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._db: sqlite3.Connection | None = None
+        self._ready: asyncio.Queue[Job] = asyncio.Queue()
+        self._delayed: dict[int, asyncio.TimerHandle] = {}
+        self._running = 0
+        self._tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        """Jobs this process holds: ready, running or waiting for a retry."""
+        return self._ready.qsize() + self._running + len(self._delayed)
+
+    # ── enqueueing ─────────────────────────────────────────────
+
+    def enqueue(self, kind: str, delay: float = 0.0, **payload) -> int:
+        """Journal a job and schedule it to run after `delay` seconds; returns its id."""
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        cursor = self._db.execute(
+            "INSERT INTO jobs (kind, payload, run_at, owner, lease_until, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, orjson.dumps(payload).decode(), now + delay, self.owner, now + LEASE, now),
+        )
+        job = Job(cursor.lastrowid, kind, payload)
+        self._schedule(job, delay)
+        return job.id
+
+    def _schedule(self, job: Job, delay: float) -> None:
+        if delay <= 0:
+            self._ready.put_nowait(job)
+            return
+
+        def due():
+            del self._delayed[job.id]
+            self._ready.put_nowait(job)
+
+        self._delayed[job.id] = asyncio.get_running_loop().call_later(delay, due)
+
+    # ── running ────────────────────────────────────────────────
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._ready.get()
+            self._running += 1
+            try:
+                await self._run(job)
+            finally:
+                self._running -= 1
+                self._ready.task_done()
+
+    async def _run(self, job: Job) -> None:
+        try:
+            await HANDLERS[job.kind](**job.payload)
+        except Exception as exc:
+            self._failed(job, exc)
+        else:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+            metrics.inc("jobs_completed_total")
+
+    def _failed(self, job: Job, exc: Exception) -> None:
+        job.attempts += 1
+        error = f"{type(exc).__name__}: {exc}"
+        if job.attempts >= self.max_attempts:
+            logger.error("Job %s (%s) failed %d times, giving up: %s", job.id, job.kind, job.attempts, error)
+            self._db.execute(
+                "UPDATE jobs SET status = 'dead', attempts = ?, last_error = ?, owner = NULL WHERE id = ?",
+                (job.attempts, error, job.id),
+            )
+            metrics.inc("jobs_dead_total")
+            return
+        delay = min(MAX_RETRY_DELAY, self.retry_base_delay * 2 ** (job.attempts - 1)) * random.uniform(0.5, 1.0)
+        logger.warning("Job %s (%s) failed, retrying in %.1fs: %s", job.id, job.kind, delay, error)
+        self._db.execute(
+            "UPDATE jobs SET attempts = ?, run_at = ?, last_error = ? WHERE id = ?",
+            (job.attempts, time.time() + delay, error, job.id),
+        )
+        metrics.inc("jobs_retried_total")
+        self._schedule(job, delay)
+
+    # ── leases ─────────────────────────────────────────────────
+
+    def _renew(self) -> None:
+        self._db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'pending'",
+            (time.time() + LEASE, self.owner),
+        )
+
+    def _recover(self) -> int:
+        """Claim pending jobs whose lease has run out (including a previous run's); returns how many."""
+        now = time.time()
+        with self._db:  # one IMMEDIATE transaction, so two processes can't claim the same job
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT id, kind, payload, attempts, run_at FROM jobs"
+                " WHERE status = 'pending' AND lease_until < ? LIMIT ?",
+                (now, RECOVER_BATCH),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ?",
+                [(self.owner, now + LEASE, row[0]) for row in rows],
+            )
+        for job_id, kind, payload, attempts, run_at in rows:
+            self._schedule(Job(job_id, kind, orjson.loads(payload), attempts), run_at - now)
+        return len(rows)
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(LEASE / 3)
+            try:
+                self._renew()
+                self._recover()
+            except sqlite3.Error:
+                logger.exception("Job journal maintenance failed")
+
+    # ── lifecycle ──────────────────────────────────────────────
+
+    async def start(self) -> int:
+        """Open the journal, replay what is left in it and start the workers; returns jobs replayed."""
+        # autocommit: every statement is its own transaction unless opened explicitly
+        self._db = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+        replayed = self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        return replayed
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Finish ready jobs (up to `drain_timeout`), then stop; the rest stay journaled."""
+        try:
+            await asyncio.wait_for(self._ready.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %d jobs unfinished; they will be replayed", len(self))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for timer in self._delayed.values():
+            timer.cancel()
+        self._delayed.clear()
+        # Give up our leases so the next process picks the leftovers up at once
+        self._db.execute("UPDATE jobs SET owner = NULL, lease_until = 0 WHERE owner = ?", (self.owner,))
+        self._db.close()
+        self._db = None
+
+
+job_queue: JobQueue | None = None
+
+
+async def init_job_queue() -> int:
+    """Open the journal and start the workers (called at app startup); returns jobs replayed."""
+    global job_queue
+    job_queue = JobQueue(
+        path=settings.job_journal_path,
+        concurrency=settings.job_concurrency,
+        max_attempts=settings.job_max_attempts,
+        retry_base_delay=settings.job_retry_base_delay_ms / 1000,
+    )
+    return await job_queue.start()
+
+
+async def close_job_queue():
+    """Drain ready jobs and stop the workers (called at app shutdown)."""
+    global job_queue
+    if job_queue:
+        await job_queue.stop()
+        job_queue = None
+
+
+def get_job_queue() -> JobQueue | None:
+    """The background job queue, or None outside the app lifespan."""
+    return job_queue
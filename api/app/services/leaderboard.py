@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.database import get_es
+from app.services.cache import get_cache
+from app.services.reputation import get_reputation
+
+logger = logging.getLogger(__name__)
+
+USER_FIELDS = ["username", "question_count", "answer_count", "reputation", "created_at"]
+
+
+def _rank_key(entry: dict) -> tuple:
+    return (-entry.get("reputation", 0), -entry.get("question_count", 0), entry["id"])
+
+
+class Leaderboard:
+    """
+    Materialized top-K of users ordered by reputation, then question_count.
+
+    /users/top is served straight from this list. It is kept fresh two ways:
+    - incrementally: apply() folds counter changes into members as they
+      happen; a non-member whose score went up becomes a candidate, and
+      candidates are fetched with one mget and promoted if they now beat
+      the K-th entry.
+    - across workers: apply() and offer() are passed to `broadcast`, and
+      the other workers on the host replay them through receive().
+    - periodically: reconcile() reloads the top `size` from ES every
+      `reconcile_interval` seconds, which also catches changes made by
+      other processes and members that fell below a non-member.
+
+    `size` is kept well above the largest page we serve (50) so that
+    members dropping out between reconciles rarely leave a visible gap.
+    """
+
+    def __init__(self, size: int, reconcile_interval: float):
+        self.size = size
+        self.reconcile_interval = reconcile_interval
+        self._entries: dict[str, dict] = {}
+        self._ranked: list[dict] = []
+        self._candidates: set[str] = set()
+        self._last_reconcile = 0.0
+        self._task: asyncio.Task | None = None
+        self.pending_deltas = None  # optional fn(user_id) -> dict of unflushed deltas
+        self.broadcast = None  # optional fn(message) -> None, to the other workers
+
+    # ── reads ──────────────────────────────────────────────────
+
+    def top(self, limit: int) -> list[dict]:
+        return self._ranked[:limit]
+
+    # ── incremental updates ────────────────────────────────────
+
+    def apply(self, user_id: str, **deltas: int) -> None:
+        """Fold counter deltas for one user into the ranking."""
+        self._apply(user_id, deltas)
+        if self.broadcast is not None:
+            self.broadcast({"apply": user_id, "deltas": deltas})
+
+    def offer(self, user: dict) -> None:
+        """Consider a user (with all public fields) for a place on the board."""
+        self._offer(user)
+        if self.broadcast is not None:
+            self.broadcast({"offer": user})
+
+    def receive(self, message: dict) -> None:
+        """An apply() or offer() made by another worker."""
+        if "offer" in message:
+            self._offer(message["offer"])
+        else:
+            self._apply(message["apply"], message["deltas"])
+
+    def _apply(self, user_id: str, deltas: dict[str, int]) -> None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            if any(delta > 0 for delta in deltas.values()):
+                self._candidates.add(user_id)
+            return
+        for field, delta in deltas.items():
+            entry[field] = entry.get(field, 0) + delta
+        self._rerank()
+
+    def _offer(self, user: dict) -> None:
+        if user["id"] in self._entries:
+            self._entries[user["id"]].update(user)
+        elif len(self._ranked) >= self.size and _rank_key(user) >= _rank_key(self._ranked[-1]):
+            return
+        else:
+            self._entries[user["id"]] = dict(user)
+        self._rerank()
+
+    def _rerank(self) -> None:
+        ranked = sorted(self._entries.values(), key=_rank_key)[: self.size]
+        self._entries = {entry["id"]: entry for entry in ranked}
+        self._ranked = ranked
+
+    async def _promote_candidates(self) -> None:
+        candidates, self._candidates = list(self._candidates), set()
+        result = await get_es().mget(index="users", ids=candidates, source=USER_FIELDS)
+        for doc in result["docs"]:
+            if doc.get("found"):
+                self._offer(self._with_pending({"id": doc["_id"], **doc["_source"]}))
+
+    # ── reconciliation ─────────────────────────────────────────
+
+    async def reconcile(self) -> None:
+        """Reload the top `size` users from ES."""
+        result = await get_es().search(
+            index="users",
+            query={"match_all": {}},
+            sort=[
+                {"reputation": {"order": "desc"}},
+                {"question_count": {"order": "desc"}},
+            ],
+            source=USER_FIELDS,
+            size=self.size,
+        )
+        ranked = sorted(
+            (self._with_pending({"id": hit["_id"], **hit["_source"]}) for hit in result["hits"]["hits"]),
+            key=_rank_key,
+        )
+        self._entries = {entry["id"]: entry for entry in ranked}
+        self._ranked = ranked
+        self._last_reconcile = time.monotonic()
+
+    def _with_pending(self, entry: dict) -> dict:
+        # Values in ES may still be missing deltas buffered for a bulk flush
+        if self.pending_deltas is not None:
+            for field, delta in self.pending_deltas(entry["id"]).items():
+                entry[field] = entry.get(field, 0) + delta
+        return entry
+
+    # ── lifecycle ──────────────────────────────────────────────
+
+    async def start(self) -> None:
+        await self.reconcile()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            try:
+                if self._candidates:
+                    await self._promote_candidates()
+                if time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                    await self.reconcile()
+            except Exception:
+                logger.exception("Leaderboard refresh failed")
+
+
+leaderboard: Leaderboard | None = None
+
+
+async def init_leaderboard() -> Leaderboard:
+    """Load the leaderboard and start its refresh loop (called at app startup)."""
+    global leaderboard
+    leaderboard = Leaderboard(
+        size=settings.leaderboard_size,
+        reconcile_interval=settings.leaderboard_reconcile_interval_seconds,
+    )
+    reputation = get_reputation()
+    if reputation is not None:
+        leaderboard.pending_deltas = lambda user_id: reputation.buffer.pending("users", user_id)
+    cache = get_cache()
+    if cache is not None:
+        leaderboard.broadcast = lambda message: cache.publish("leaderboard", message)
+        cache.subscribe("leaderboard", leaderboard.receive)
+    await leaderboard.start()
+    return leaderboard
+
+
+async def close_leaderboard():
+    """Stop the leaderboard refresh loop (called at app shutdown)."""
+    global leaderboard
+    if leaderboard:
+        await leaderboard.stop()
+        leaderboard = None
+
+
+def get_leaderboard() -> Leaderboard | None:
+    """The in-memory leaderboard, or None outside the app lifespan."""
+    return leaderboard
@@ -0,0 +1,48 @@
+"""
+Process-local counters exposed at GET /metrics in Prometheus text format.
+
+Counters only ever go up; rates and ratios (e.g. vote OCC retries per
+vote write: rate(vote_conflicts_total) / rate(vote_transitions_total))
+are left to the scraper.
+"""
+
+from collections import defaultdict
+
+_counters: dict[str, int] = defaultdict(int)
+
+HELP = {
+    "vote_transitions_total": "Conditional vote document writes attempted",
+    "vote_conflicts_total": "Vote writes that lost an optimistic concurrency race and were retried",
+    "vote_retries_exhausted_total": "Vote writes that still conflicted after the last retry (returned 409)",
+    "vote_counters_deferred_total": "Vote counter updates that kept conflicting and were queued as background increments",
+    "rate_limited_search_total": "Search requests refused with 429 by the per-caller rate limiter",
+    "rate_limited_write_total": "Write requests refused with 429 by the per-caller rate limiter",
+    "rate_limited_read_total": "Read requests refused with 429 by the per-caller rate limiter",
+    "cache_hits_total": "Shared cache lookups answered from this process or the cache hub",
+    "cache_misses_total": "Shared cache lookups that found nothing",
+    "jobs_completed_total": "Background jobs whose handler succeeded",
+    "jobs_retried_total": "Background job attempts that failed and were rescheduled",
+    "jobs_dead_total": "Background jobs that failed every attempt and were parked",
+    "counter_deltas_dropped_total": "Buffered counter updates dropped at shutdown with no job queue to hand them to",
+}
+
+
+def inc(name: str, amount: int = 1) -> None:
+    """Increment a counter by `amount`."""
+    _counters[name] += amount
+
+
+def snapshot() -> dict[str, int]:
+    """Current value of every counter."""
+    return dict(_counters)
+
+
+def render() -> str:
+    """All counters in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(set(HELP) | set(_counters)):
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {_counters.get(name, 0)}")
+    return "\n".join(lines) + "\n"
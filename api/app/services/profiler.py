@@ -0,0 +1,160 @@
+"""
+Sampling profiler for single requests, and the profiles it leaves on disk.
+
+A SamplingProfiler runs a thread that, every `interval`, looks at the
+event loop thread's current stack — but only counts it when the task
+being profiled is the one running. Samples taken while the task is
+suspended (awaiting ES, or another request holding the loop) are counted
+as waiting, so a profile shows where this request spent CPU, and how
+much of its wall time it spent off the CPU.
+
+Profiles are saved one JSON file per request: request details plus the
+sampled stacks in folded form ("outer;inner;leaf": count), which flame
+graph tools (flamegraph.pl, speedscope) read directly.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+
+# Trimmed from file names so frames read app/routers/questions.py, fastapi/routing.py
+_PATH_ROOTS = sorted(
+    {str(Path(p).resolve()) + os.sep for p in sys.path if p} | {str(Path(__file__).resolve().parents[2]) + os.sep},
+    key=len,
+    reverse=True,
+)
+
+
+# The sampler thread only runs when the loop thread releases the GIL,
+# which a busy loop does every sys.getswitchinterval() (5 ms by default);
+# while any profile is running the interval is lowered to the sampling one
+_switch_lock = threading.Lock()
+_active_profilers = 0
+_saved_switch_interval = 0.0
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    for root in _PATH_ROOTS:
+        if filename.startswith(root):
+            filename = filename[len(root):]
+            break
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.waiting = 0
+        self._labels: dict = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start sampling the calling task (must be called from inside it)."""
+        global _active_profilers, _saved_switch_interval
+        with _switch_lock:
+            if _active_profilers == 0:
+                _saved_switch_interval = sys.getswitchinterval()
+            _active_profilers += 1
+            sys.setswitchinterval(min(self.interval, _saved_switch_interval))
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._loop_thread = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        global _active_profilers
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with _switch_lock:
+            _active_profilers -= 1
+            if _active_profilers == 0:
+                sys.setswitchinterval(_saved_switch_interval)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            # The task the loop is running right now (read from this thread)
+            if asyncio.current_task(self._loop) is not self._task:
+                self.waiting += 1
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+def hottest_frames(stacks: dict[str, int], limit: int) -> list[dict]:
+    """Frames by self samples (time spent in the frame itself), with inclusive samples."""
+    own, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    return [
+        {"frame": frame, "self_samples": count, "total_samples": inclusive[frame]}
+        for frame, count in own.most_common(limit)
+    ]
+
+
+def new_profile_id() -> str:
+    """Sortable by creation time."""
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def save_profile(directory: str, profile_id: str, profiler: SamplingProfiler, duration: float, **request) -> None:
+    """Write one profile file: request details, sample counts and folded stacks."""
+    record = {
+        "id": profile_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration * 1000, 1),
+        "interval_ms": profiler.interval * 1000,
+        "samples": sum(profiler.stacks.values()),
+        "waiting_samples": profiler.waiting,
+        **request,
+        "stacks": dict(profiler.stacks.most_common()),
+    }
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / f"{profile_id}.json").write_bytes(orjson.dumps(record))
+
+
+def prune_profiles(directory: str, retention: int) -> None:
+    """Delete all but the newest `retention` profiles."""
+    files = sorted(Path(directory).glob("*.json"), reverse=True)
+    for stale in files[retention:]:
+        stale.unlink(missing_ok=True)
+
+
+def load_profiles(directory: str, limit: int) -> list[dict]:
+    """The newest profiles, newest first (ids sort by time)."""
+    path = Path(directory)
+    if not path.is_dir():
+        return []
+    return [orjson.loads(file.read_bytes()) for file in sorted(path.glob("*.json"), reverse=True)[:limit]]
+
+
+def load_profile(directory: str, profile_id: str) -> dict | None:
+    file = Path(directory) / f"{profile_id}.json"
+    # Ids are generated by save_profile; anything else is not a profile
+    if file.parent != Path(directory) or not file.is_file():
+        return None
+    return orjson.loads(file.read_bytes())
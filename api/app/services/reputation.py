@@ -0,0 +1,89 @@
+from app.config import settings
+from app.services.counters import CounterAggregator
+
+# Reputation earned by a content author for each vote on their content.
+# Votes on your own questions/answers never earn reputation.
+REPUTATION_WEIGHTS = {
+    ("question", "up"): 5,
+    ("question", "down"): -2,
+    ("answer", "up"): 10,
+    ("answer", "down"): -2,
+}
+
+
+def vote_reputation(target_type: str, vote_type: str | None) -> int:
+    """Reputation a single vote is worth to the author of the target."""
+    if vote_type is None:
+        return 0
+    return REPUTATION_WEIGHTS[(target_type, vote_type)]
+
+
+class ReputationEngine:
+    """
+    Keeps users.reputation up to date incrementally from vote transitions.
+
+    Every created, flipped or removed vote moves its target's author by
+    weight(new vote) - weight(old vote). Deltas are merged per user in a
+    CounterAggregator and written to the users index in bulk, so a burst
+    of votes on one author's content costs a single scripted update.
+
+    For a full rebuild from the votes index see
+    `python -m app.commands.recompute_reputation`.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.buffer = CounterAggregator(flush_interval=flush_interval)
+
+    def record_vote(
+        self,
+        author_id: str | None,
+        voter_id: str,
+        target_type: str,
+        old_vote: str | None,
+        new_vote: str | None,
+    ) -> int:
+        """Apply the reputation change for one vote transition; returns the delta."""
+        if not author_id or author_id == voter_id:
+            return 0
+        delta = vote_reputation(target_type, new_vote) - vote_reputation(target_type, old_vote)
+        if delta:
+            self.buffer.add("users", author_id, reputation=delta)
+            # Imported here: the leaderboard module depends on this one
+            from app.services.leaderboard import get_leaderboard
+
+            leaderboard = get_leaderboard()
+            if leaderboard is not None:
+                leaderboard.apply(author_id, reputation=delta)
+        return delta
+
+    def start(self) -> None:
+        self.buffer.start()
+
+    async def stop(self) -> None:
+        await self.buffer.stop()
+
+
+reputation_engine: ReputationEngine | None = None
+
+
+def init_reputation() -> ReputationEngine:
+    """Start the reputation engine (called at app startup)."""
+    global reputation_engine
+    reputation_engine = ReputationEngine(
+        flush_interval=settings.reputation_flush_interval_ms / 1000,
+    )
+    reputation_engine.start()
+    return reputation_engine
+
+
+async def close_reputation():
+    """Flush pending reputation deltas (called at app shutdown)."""
+    global reputation_engine
+    if reputation_engine:
+        await reputation_engine.stop()
+        reputation_engine = None
+
+
+def get_reputation() -> ReputationEngine | None:
+    """The running reputation engine, or None outside the app lifespan."""
+    return reputation_engine
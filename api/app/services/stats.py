@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+
+from app.config import settings
+from app.database import get_es
+from app.services.cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+COUNTED_INDICES = ["users", "questions", "answers", "forums"]
+UPVOTED_INDICES = {"questions", "answers"}
+
+
+async def compute_stats() -> dict:
+    """Platform totals from one msearch: a hit count per index plus upvote sums."""
+    searches = []
+    for index_name in COUNTED_INDICES:
+        body = {"size": 0, "track_total_hits": True}
+        if index_name in UPVOTED_INDICES:
+            body["aggs"] = {"total_upvotes": {"sum": {"field": "upvote_count"}}}
+        searches += [{"index": index_name}, body]
+    responses = (await get_es().msearch(searches=searches))["responses"]
+
+    counts, upvotes = {}, {}
+    for index_name, response in zip(COUNTED_INDICES, responses):
+        if "error" in response:
+            raise RuntimeError(f"Stats query on {index_name} failed: {response['error']}")
+        counts[index_name] = response["hits"]["total"]["value"]
+        if index_name in UPVOTED_INDICES:
+            upvotes[index_name] = int(response["aggregations"]["total_upvotes"]["value"])
+
+    # Upvotes split by type (answers save more compute than questions)
+    return {
+        "total_users": counts["users"],
+        "total_questions": counts["questions"],
+        "total_answers": counts["answers"],
+        "total_forums": counts["forums"],
+        "question_upvotes": upvotes["questions"],
+        "answer_upvotes": upvotes["answers"],
+        "total_upvotes": upvotes["questions"] + upvotes["answers"],
+    }
+
+
+class StatsCache:
+    """
+    One shared /stats snapshot, refreshed at most once per `ttl` seconds.
+
+    - fresh snapshot: returned as is
+    - stale snapshot: returned as is while a background refresh runs
+      (stale-while-revalidate)
+    - no snapshot yet: the caller waits for the first refresh
+    Concurrent refreshes are coalesced into one in-flight task, so a burst
+    of requests at expiry costs a single msearch. A failed refresh keeps
+    serving the last good snapshot. Deltas applied while a refresh is in
+    flight are folded into the snapshot it brings back, so they aren't
+    lost when it replaces the old one. `generation` counts the refreshes
+    that landed, so /stats/stream can resend the snapshot after each.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.generation = 0
+        self._snapshot: dict | None = None
+        self._fetched_at = 0.0
+        self._refresh: asyncio.Task | None = None
+        self._inflight_deltas: dict[str, int] | None = None
+
+    async def get(self) -> dict:
+        if self._snapshot is not None:
+            if time.monotonic() - self._fetched_at >= self.ttl:
+                self._start_refresh()
+            return self._snapshot
+        await asyncio.shield(self._start_refresh())
+        return self._snapshot
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh is None or self._refresh.done():
+            self._inflight_deltas = {}
+            self._refresh = asyncio.create_task(self._do_refresh())
+        return self._refresh
+
+    async def _do_refresh(self) -> dict:
+        try:
+            snapshot = await compute_stats()
+        except Exception:
+            if self._snapshot is None:
+                raise
+            logger.exception("Stats refresh failed; serving the previous snapshot")
+            return self._snapshot
+        finally:
+            inflight, self._inflight_deltas = self._inflight_deltas, None
+        self._snapshot = _added(snapshot, inflight)
+        self._fetched_at = time.monotonic()
+        self.generation += 1
+        return self._snapshot
+
+    def apply(self, deltas: dict[str, int]) -> None:
+        """Fold live counter deltas into the snapshot until the next refresh."""
+        if self._snapshot is not None:
+            self._snapshot = _added(self._snapshot, deltas)
+        if self._inflight_deltas is not None:
+            for field, delta in deltas.items():
+                self._inflight_deltas[field] = self._inflight_deltas.get(field, 0) + delta
+
+    async def close(self) -> None:
+        if self._refresh is not None and not self._refresh.done():
+            self._refresh.cancel()
+            try:
+                await self._refresh
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+def _added(snapshot: dict, deltas: dict[str, int]) -> dict:
+    return {field: value + deltas.get(field, 0) for field, value in snapshot.items()}
+
+
+class _Subscriber:
+    __slots__ = ("pending", "wakeup")
+
+    def __init__(self):
+        self.pending: dict[str, int] = {}
+        self.wakeup = asyncio.Event()
+
+
+class StatsBroadcaster:
+    """
+    Fans counter deltas out to every /stats/stream subscriber.
+
+    publish() is called by the write handlers and never blocks or touches
+    ES: it merges the deltas into each subscriber's pending dict and wakes
+    it. A subscriber therefore holds at most one entry per stats field no
+    matter how far behind its client is — a slow client gets fewer, larger
+    deltas instead of an ever-growing queue. Each stream also waits
+    `min_interval` between events, so bursts of writes are coalesced.
+
+    Deltas only cover writes through this host's workers, so each stream
+    also resends the whole `snapshot` whenever the StatsCache refreshes
+    (the stream itself asks for one every `ttl`), which pulls open tabs
+    back to the true totals: other hosts' writes, deletes, reconciles.
+    """
+
+    def __init__(self, max_subscribers: int, min_interval: float, heartbeat: float):
+        self.max_subscribers = max_subscribers
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self.closed = False
+        self._subscribers: set[_Subscriber] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> _Subscriber | None:
+        """Register a subscriber, or return None when at capacity."""
+        if self.closed or len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscriber = _Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, deltas: dict[str, int]) -> None:
+        for subscriber in self._subscribers:
+            for field, delta in deltas.items():
+                subscriber.pending[field] = subscriber.pending.get(field, 0) + delta
+            subscriber.wakeup.set()
+
+    async def stream(self, subscriber: _Subscriber, cache: StatsCache) -> AsyncIterator[str]:
+        """SSE events: a `snapshot` (again after every refresh), and a `delta` whenever counters move."""
+        try:
+            generation = None
+            last_sent = time.monotonic()
+            while not self.closed:
+                # Kicks off a refresh when the snapshot is older than its TTL
+                snapshot = await cache.get()
+                if cache.generation != generation:
+                    # The snapshot already holds every delta applied so far
+                    generation = cache.generation
+                    subscriber.pending = {}
+                    yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+                    last_sent = time.monotonic()
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout=min(self.heartbeat, cache.ttl))
+                except asyncio.TimeoutError:
+                    if time.monotonic() - last_sent >= self.heartbeat:
+                        yield ": ping\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                subscriber.wakeup.clear()
+                deltas, subscriber.pending = subscriber.pending, {}
+                deltas = {field: delta for field, delta in deltas.items() if delta}
+                if deltas:
+                    yield f"event: delta\ndata: {json.dumps(deltas)}\n\n"
+                    last_sent = time.monotonic()
+                await asyncio.sleep(self.min_interval)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def close(self) -> None:
+        """End every open stream (so shutdown doesn't wait on them)."""
+        self.closed = True
+        for subscriber in self._subscribers:
+            subscriber.wakeup.set()
+
+
+stats_cache: StatsCache | None = None
+stats_broadcaster: StatsBroadcaster | None = None
+
+
+def init_stats_cache() -> StatsCache:
+    """Create the shared stats cache and live broadcaster (called at app startup)."""
+    global stats_cache, stats_broadcaster
+    stats_cache = StatsCache(ttl=settings.stats_cache_ttl_seconds)
+    cache = get_cache()
+    if cache is not None:
+        cache.subscribe("stats", _apply_stats)
+    stats_broadcaster = StatsBroadcaster(
+        max_subscribers=settings.stats_stream_max_subscribers,
+        min_interval=settings.stats_stream_min_interval_ms / 1000,
+        heartbeat=settings.stats_stream_heartbeat_seconds,
+    )
+    return stats_cache
+
+
+async def close_stats_cache():
+    """End live streams and cancel any in-flight refresh (called at app shutdown)."""
+    global stats_cache, stats_broadcaster
+    if stats_broadcaster:
+        stats_broadcaster.close()
+        stats_broadcaster = None
+    if stats_cache:
+        await stats_cache.close()
+        stats_cache = None
+
+
+def get_stats_cache() -> StatsCache | None:
+    """The shared stats cache, or None outside the app lifespan."""
+    return stats_cache
+
+
+def get_stats_broadcaster() -> StatsBroadcaster | None:
+    """The live stats broadcaster, or None outside the app lifespan."""
+    return stats_broadcaster
+
+
+def publish_stats(**deltas: int) -> None:
+    """Record counter changes made through the API (e.g. total_answers=1), in every worker."""
+    _apply_stats(deltas)
+    cache = get_cache()
+    if cache is not None:
+        cache.publish("stats", deltas)
+
+
+def _apply_stats(deltas: dict[str, int]) -> None:
+    if stats_cache is not None:
+        stats_cache.apply(deltas)
+    if stats_broadcaster is not None:
+        stats_broadcaster.publish(deltas)
@@ -0,0 +1,215 @@
+"""
+Lightweight per-request tracing.
+
+TracingMiddleware (app/middleware/tracing.py) opens a Trace for each
+request and keeps it in a context variable; code on the request's path
+marks the interesting parts with `with span("name"):`. The spans we
+record today:
+
+    auth    API key validation (get_current_user / get_optional_user)
+    es      every Elasticsearch round-trip, via TracedElasticsearch
+            (semantic search and reranking run inside ES, so inference
+            time shows up here, on the search call)
+    render  encoding the response body
+    wait    parked in a long-poll (GET /questions/{id}/answers/wait)
+
+Spans outside a request (background flushers, reload loops) are no-ops.
+A span's *self* time excludes its children, so the Server-Timing
+breakdown — self time per span name plus "app" for everything else
+(handler code, validation, middleware) — adds up to the total.
+
+Completed traces can be exported as OTLP/JSON (one
+ExportTraceServiceRequest per line) for offline analysis with any tool
+that reads the OpenTelemetry format.
+"""
+
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+
+from app.config import settings
+
+SERVICE_NAME = "treehacks-qna-api"
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    span_id: str
+    parent_id: str | None
+    start: float
+    start_ns: int
+    end: float = 0.0
+    attributes: dict = field(default_factory=dict)
+    child_time: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> float:
+        return max(0.0, self.duration - self.child_time)
+
+
+class Trace:
+    def __init__(self, name: str, **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, os.urandom(8).hex(), None, time.perf_counter(), time.time_ns(), attributes=attributes)
+        self.spans: list[Span] = []
+
+    def finish(self) -> None:
+        self.root.end = time.perf_counter()
+
+    def breakdown(self, now: float | None = None) -> list[tuple[str, float, int]]:
+        """(name, self time in seconds, span count) per span name, then "app" for the rest."""
+        elapsed = (now or time.perf_counter()) - self.root.start
+        totals: dict[str, list] = defaultdict(lambda: [0.0, 0])
+        for s in self.spans:
+            totals[s.name][0] += s.self_time
+            totals[s.name][1] += 1
+        accounted = sum(seconds for seconds, _ in totals.values())
+        out = [(name, seconds, count) for name, (seconds, count) in totals.items()]
+        out.append(("app", max(0.0, elapsed - accounted), 1))
+        return out
+
+
+_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_parent: ContextVar[Span | None] = ContextVar("trace_parent", default=None)
+
+
+def start_trace(name: str, **attributes) -> tuple[Trace, object]:
+    """Begin a trace for the current request; returns it and a token for end_trace()."""
+    trace = Trace(name, **attributes)
+    return trace, _trace.set(trace)
+
+
+def end_trace(token) -> None:
+    _trace.reset(token)
+
+
+def current_trace() -> Trace | None:
+    return _trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span. No-op outside a trace."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _parent.get() or trace.root
+    s = Span(name, os.urandom(8).hex(), parent.span_id, time.perf_counter(), time.time_ns(), attributes=attributes)
+    token = _parent.set(s)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        _parent.reset(token)
+        if parent is not trace.root:
+            parent.child_time += s.duration
+        trace.spans.append(s)
+
+
+class TracedElasticsearch(AsyncElasticsearch):
+    """AsyncElasticsearch that records every round-trip as an "es" span."""
+
+    async def perform_request(self, method, path, *, endpoint_id=None, path_parts=None, **kwargs):
+        attributes = {"db.system": "elasticsearch", "db.operation": endpoint_id or method}
+        if path_parts and "index" in path_parts:
+            attributes["db.elasticsearch.index"] = str(path_parts["index"])
+        with span("es", **attributes):
+            return await super().perform_request(
+                method, path, endpoint_id=endpoint_id, path_parts=path_parts, **kwargs
+            )
+
+
+# ── export ────────────────────────────────────────────────────
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    out = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        out.append({"key": key, "value": typed})
+    return out
+
+
+def _otlp_span(trace: Trace, s: Span, kind: int) -> dict:
+    start_ns = s.start_ns
+    end_ns = start_ns + int(s.duration * 1e9)
+    out = {
+        "traceId": trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        # SPAN_KIND_SERVER = 2, SPAN_KIND_CLIENT = 3, SPAN_KIND_INTERNAL = 1
+        "kind": kind,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _otlp_attributes(s.attributes),
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+class OtlpJsonFileExporter:
+    """Appends each trace to a file as one OTLP/JSON ExportTraceServiceRequest per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Buffered: a write is a memory copy, the OS sees full blocks
+        self._file = open(path, "ab")
+
+    def export(self, trace: Trace) -> None:
+        spans = [_otlp_span(trace, trace.root, 2)]
+        spans += [_otlp_span(trace, s, 3 if s.name == "es" else 1) for s in trace.spans]
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+        self._file.write(orjson.dumps(request) + b"\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+trace_exporter: OtlpJsonFileExporter | None = None
+
+
+def init_trace_exporter() -> OtlpJsonFileExporter | None:
+    """Open the OTLP/JSON trace file if TRACE_EXPORT_PATH is set (called at app startup)."""
+    global trace_exporter
+    if settings.trace_export_path:
+        trace_exporter = OtlpJsonFileExporter(settings.trace_export_path)
+    return trace_exporter
+
+
+def close_trace_exporter():
+    """Flush and close the trace file (called at app shutdown)."""
+    global trace_exporter
+    if trace_exporter:
+        trace_exporter.close()
+        trace_exporter = None
+
+
+def get_trace_exporter() -> OtlpJsonFileExporter | None:
+    return trace_exporter
@@ -1,7 +1,13 @@
-from fastapi import Depends, HTTPException
+import hmac
+
+from fastapi import Depends, Header, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app.config import settings
 from app.database import get_es
+from app.middleware.rate_limit import mark_verified
+from app.services.cache import get_cache
+from app.services.tracing import span
 
 # HTTPBearer extracts the token from "Authorization: Bearer <token>"
 security = HTTPBearer()
@@ -20,11 +26,16 @@ async def get_current_user(
     3. ES validates the key (checks it's not expired/invalidated)
     4. We get the key ID from the auth response
     5. We fetch the key's metadata via the admin client (get_api_key)
-       — this contains our user_id and username
+       — this contains our user_id and username. Metadata never changes,
+       so it is cached by key ID (shared across workers)
     6. We fetch the full user document from the users index
     """
+    with span("auth"):
+        return await _authenticate(credentials.credentials)
+
+
+async def _authenticate(encoded_key: str) -> dict:
     es = get_es()
-    encoded_key = credentials.credentials
 
     # Step 1: Validate the API key against Elasticsearch's native security
     try:
@@ -39,15 +50,21 @@ async def get_current_user(
 
     # Step 3: Fetch the key's metadata via the admin client
     # (Serverless doesn't return metadata in authenticate(), so we use get_api_key)
-    try:
-        key_info = await es.security.get_api_key(id=api_key_id)
-        metadata = key_info["api_keys"][0]["metadata"]
-    except Exception:
-        raise HTTPException(status_code=401, detail="Could not retrieve API key metadata")
+    cache = get_cache()
+    metadata = await cache.get(f"apikey:{api_key_id}") if cache is not None else None
+    if metadata is None:
+        try:
+            key_info = await es.security.get_api_key(id=api_key_id)
+            metadata = key_info["api_keys"][0]["metadata"]
+        except Exception:
+            raise HTTPException(status_code=401, detail="Could not retrieve API key metadata")
+        if cache is not None and metadata.get("user_id"):
+            cache.set(f"apikey:{api_key_id}", metadata)
 
     user_id = metadata.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid API key: missing user metadata")
+    mark_verified(encoded_key)
 
     # Step 4: Fetch the full user profile from the users index
     try:
@@ -72,3 +89,15 @@ async def get_optional_user(
         return await get_current_user(credentials)
     except HTTPException:
         return None
+
+
+async def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    """
+    Gate operator endpoints on the X-Admin-Token header.
+
+    Without ADMIN_TOKEN configured the endpoints don't exist (404).
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
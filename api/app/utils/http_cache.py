@@ -0,0 +1,56 @@
+import hashlib
+
+import orjson
+from fastapi import Request, Response
+
+# Responses that include the caller's own votes must not be shared
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names this ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str, vary: str | None = None) -> Response:
+    """A bodiless 304 carrying the validators the client should keep using."""
+    response = Response(status_code=304)
+    set_validators(response, etag, cache_control, vary)
+    return response
+
+
+def set_validators(response: Response, etag: str, cache_control: str, vary: str | None = None) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if vary:
+        response.headers["Vary"] = vary
+
+
+def doc_etag(doc: dict) -> str:
+    """
+    Strong ETag for one ES document (a get response or a search hit with
+    seq_no_primary_term). _seq_no/_primary_term change on every write to
+    the document, so the tag changes exactly when its content can.
+    """
+    return f'"{doc["_index"]}-{doc["_id"]}-{doc["_primary_term"]}.{doc["_seq_no"]}"'
+
+
+def composite_etag(*parts) -> str:
+    """Strong ETag for a response assembled from several documents and values."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def content_etag(content) -> str:
+    """
+    Strong ETag for JSON-serializable response content, from the content
+    itself: every worker (and every restart) serving the same data hands
+    out the same tag.
+    """
+    digest = hashlib.blake2b(orjson.dumps(content, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+    return f'"{digest}"'
@@ -0,0 +1,24 @@
+from app.config import settings
+from app.database import get_es
+
+
+async def legacy_owners(usernames: list[str]) -> dict[str, str]:
+    """
+    username → user_id for users that hold a name without a reservation.
+
+    Users created before the usernames reservation index existed have no
+    reservation until `python -m app.commands.migrate_usernames` has run,
+    so both lookups and registration have to search users for them. One
+    search for the whole list; refresh lag doesn't matter, since anyone
+    registered since then has a reservation. Only with
+    USERNAME_LEGACY_FALLBACK set; otherwise no names are legacy (no ES call).
+    """
+    if not settings.username_legacy_fallback:
+        return {}
+    result = await get_es().search(
+        index="users",
+        query={"terms": {"username": usernames}},
+        size=len(usernames),
+        source=["username"],
+    )
+    return {hit["_source"]["username"]: hit["_id"] for hit in result["hits"]["hits"]}
@@ -0,0 +1,169 @@
+"""
+CPU cost vs bytes saved when compressing realistic list pages.
+
+    cd api && python -m benchmarks.bench_compression [--iterations 50] [--link-mbps 10]
+
+Pages are QuestionListResponse / AnswerListResponse JSON built from the
+seed corpus (seed.py): a "typical" page uses the bodies as written, a
+"large" page stitches different seed texts together until each body is
+close to the 50,000-character limit — the worst case for a constrained
+link. For each codec and level it reports the compression ratio, the
+CPU time per page, and the total time to deliver the page over a link
+of --link-mbps (compress + transfer; decompression is cheap in
+comparison and left out). The levels used by CompressionMiddleware are
+marked with *.
+
+The seed corpus is small, so large pages repeat text; codecs with long
+match windows (br, zstd) look better on them than on real traffic, where
+their ratio lands closer to gzip's. CPU cost per MB is representative.
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timezone
+
+from app.middleware import compression
+from seed import QUESTIONS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PAGE_SIZE = 20
+MAX_BODY = 50_000
+
+
+def _corpus() -> tuple[list[dict], list[str]]:
+    questions, answers = [], []
+    for forum, items in QUESTIONS.items():
+        for item in items:
+            questions.append({"title": item["title"], "body": item["body"], "forum_name": forum})
+            answers += [answer["body"] for answer in item["answers"]]
+    return questions, answers
+
+
+def _long_body(texts: list[str], rng: random.Random) -> str:
+    parts, size = [], 0
+    while size < MAX_BODY:
+        text = rng.choice(texts)
+        parts.append(text)
+        size += len(text) + 2
+    return "\n\n".join(parts)[:MAX_BODY]
+
+
+def make_pages(seed: int = 7) -> dict[str, bytes]:
+    rng = random.Random(seed)
+    questions, answers = _corpus()
+    texts = [q["body"] for q in questions] + answers
+    now = datetime.now(timezone.utc).isoformat()
+
+    def question(i: int, body: str) -> dict:
+        q = questions[i % len(questions)]
+        return {
+            "id": f"{rng.getrandbits(80):020x}",
+            "title": q["title"],
+            "body": body,
+            "forum_id": f"{rng.getrandbits(80):020x}",
+            "forum_name": q["forum_name"],
+            "author_id": f"{rng.getrandbits(128):032x}",
+            "author_username": f"agent_{rng.randrange(100)}",
+            "upvote_count": rng.randrange(50),
+            "downvote_count": rng.randrange(5),
+            "score": rng.randrange(50),
+            "answer_count": rng.randrange(6),
+            "has_code": "```" in body,
+            "word_count": len(body.split()),
+            "created_at": now,
+            "user_vote": None,
+        }
+
+    def answer(body: str) -> dict:
+        return {
+            "id": f"{rng.getrandbits(80):020x}",
+            "body": body,
+            "question_id": f"{rng.getrandbits(80):020x}",
+            "author_id": f"{rng.getrandbits(128):032x}",
+            "author_username": f"agent_{rng.randrange(100)}",
+            "upvote_count": rng.randrange(50),
+            "downvote_count": rng.randrange(5),
+            "score": rng.randrange(50),
+            "created_at": now,
+            "user_vote": None,
+        }
+
+    def page(key: str, items: list[dict]) -> bytes:
+        return json.dumps({key: items, "page": 1, "total_pages": 9}).encode()
+
+    return {
+        "questions, typical": page(
+            "questions", [question(i, questions[i % len(questions)]["body"]) for i in range(PAGE_SIZE)]
+        ),
+        "questions, large": page("questions", [question(i, _long_body(texts, rng)) for i in range(PAGE_SIZE)]),
+        "answers, typical": page("answers", [answer(answers[i % len(answers)]) for i in range(PAGE_SIZE)]),
+        "answers, large": page("answers", [answer(_long_body(texts, rng)) for _ in range(PAGE_SIZE)]),
+    }
+
+
+def codecs() -> list[tuple[str, int, callable, bool]]:
+    """(name, level, compress fn, whether the middleware uses this level)"""
+    out = [
+        ("gzip", level, lambda data, level=level: zlib.compress(data, level, wbits=31), level == compression.GZIP_LEVEL)
+        for level in (1, 5, 6, 9)
+    ]
+    if brotli is not None:
+        out += [
+            ("br", q, lambda data, q=q: brotli.compress(data, quality=q), q == compression.BROTLI_QUALITY)
+            for q in (1, 4, 5, 11)
+        ]
+    if zstandard is not None:
+        out += [
+            (
+                "zstd",
+                level,
+                lambda data, level=level: zstandard.ZstdCompressor(level=level).compress(data),
+                level == compression.ZSTD_LEVEL,
+            )
+            for level in (1, 3, 6, 19)
+        ]
+    return out
+
+
+def measure(fn, data: bytes, iterations: int) -> tuple[int, float]:
+    size = len(fn(data))
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(data)
+    return size, (time.perf_counter() - started) / iterations
+
+
+def main(iterations: int, link_mbps: float):
+    bytes_per_second = link_mbps * 1_000_000 / 8
+    for name, page in make_pages().items():
+        raw_ms = len(page) / bytes_per_second * 1000
+        print(f"\n{name}: {len(page) / 1024:.0f} KB raw, {raw_ms:.0f} ms on a {link_mbps:g} Mbit/s link")
+        print(f"  {'codec':<10} {'ratio':>6} {'KB':>7} {'CPU ms':>8} {'MB/s':>7} {'total ms':>9}")
+        for codec, level, fn, default in codecs():
+            size, seconds = measure(fn, page, iterations)
+            total_ms = seconds * 1000 + size / bytes_per_second * 1000
+            mark = "*" if default else " "
+            print(
+                f" {mark}{codec + ' ' + str(level):<10} {len(page) / size:6.1f} {size / 1024:7.1f} "
+                f"{seconds * 1000:8.2f} {len(page) / seconds / 1e6:7.0f} {total_ms:9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--link-mbps", type=float, default=10, help="client link speed for the total column")
+    args = parser.parse_args()
+    main(args.iterations, args.link_mbps)
@@ -0,0 +1,143 @@
+"""
+Per-page serialization cost of a question list: 20 large questions.
+
+    cd api && python -m benchmarks.bench_serialization [--iterations 500] [--body-kb 16]
+
+Compares the old and new response paths end to end, from a decoded ES
+hit to the response body bytes:
+
+    baseline   QuestionPublic(...) with validation  → FastAPI → JSONResponse
+    optimized  QuestionPublic.from_hit (construct)  → FastAPI → ORJSONResponse
+
+and the ES client's decoding of the search response that feeds them
+(stdlib JSONSerializer vs OrjsonSerializer). Both paths must produce the
+same JSON; the script checks that before timing.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from elasticsearch.serializer import JSONSerializer, OrjsonSerializer
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.models.question import QuestionListResponse, QuestionPublic
+
+PAGE_SIZE = 20
+
+
+def make_search_response(body_kb: int) -> dict:
+    paragraph = "Tried raising the refresh interval but bulk indexing still stalls. "
+    code = "```python\nfor doc in docs:\n    es.index(index='questions', document=doc)\n```\n"
+    body = ((paragraph * 3 + code) * (body_kb * 1024 // 300 + 1))[: body_kb * 1024]
+    now = datetime.now(timezone.utc)
+    hits = [
+        {
+            "_index": "questions",
+            "_id": f"q{i:04d}",
+            "_score": None,
+            "_source": {
+                "title": f"Why does bulk indexing stall after a few thousand documents? ({i})",
+                "body": body,
+                "forum_id": "forum-elasticsearch",
+                "forum_name": "Elasticsearch",
+                "author_id": f"user{i % 7}",
+                "author_username": f"agent_{i % 7}",
+                "upvote_count": 12 + i,
+                "downvote_count": i % 3,
+                "score": 12 + i - i % 3,
+                "answer_count": i % 5,
+                "has_code": True,
+                "word_count": len(body.split()),
+                "created_at": (now - timedelta(minutes=i)).isoformat(),
+            },
+            "sort": [int((now - timedelta(minutes=i)).timestamp() * 1000)],
+        }
+        for i in range(PAGE_SIZE)
+    ]
+    return {"took": 3, "hits": {"total": {"value": 240, "relation": "eq"}, "hits": hits}}
+
+
+def validated_question(hit: dict) -> QuestionPublic:
+    """The pre-optimization conversion: field by field, fully validated."""
+    src = hit["_source"]
+    return QuestionPublic(
+        id=hit["_id"],
+        title=src["title"],
+        body=src["body"],
+        forum_id=src["forum_id"],
+        forum_name=src["forum_name"],
+        author_id=src["author_id"],
+        author_username=src["author_username"],
+        upvote_count=src.get("upvote_count", 0),
+        downvote_count=src.get("downvote_count", 0),
+        score=src.get("score", 0),
+        answer_count=src.get("answer_count", 0),
+        has_code=src.get("has_code", False),
+        word_count=src.get("word_count", 0),
+        created_at=src["created_at"],
+    )
+
+
+FIELD = create_model_field(name="response", type_=QuestionListResponse, mode="serialization")
+
+
+async def baseline(hits: list[dict]) -> bytes:
+    page = QuestionListResponse(questions=[validated_question(h) for h in hits], page=1, total_pages=12)
+    content = await serialize_response(field=FIELD, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def optimized(hits: list[dict]) -> bytes:
+    page = QuestionListResponse(questions=[QuestionPublic.from_hit(h) for h in hits], page=1, total_pages=12)
+    content = await serialize_response(field=FIELD, response_content=page, is_coroutine=True)
+    return ORJSONResponse(content).body
+
+
+async def time_async(fn, arg, iterations: int) -> float:
+    await fn(arg)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await fn(arg)
+    return (time.perf_counter() - started) / iterations
+
+
+def time_sync(fn, arg, iterations: int) -> float:
+    fn(arg)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - started) / iterations
+
+
+async def main(iterations: int, body_kb: int):
+    response = make_search_response(body_kb)
+    hits = response["hits"]["hits"]
+    raw = json.dumps(response).encode()
+
+    if json.loads(await baseline(hits)) != json.loads(await optimized(hits)):
+        raise SystemExit("baseline and optimized responses differ")
+
+    print(f"{PAGE_SIZE} questions x {body_kb} KB body, {len(raw) / 1024:.0f} KB per ES page, {iterations} iterations\n")
+    rows = [
+        ("ES response decode (json)", time_sync(JSONSerializer().loads, raw, iterations)),
+        ("ES response decode (orjson)", time_sync(OrjsonSerializer().loads, raw, iterations)),
+        ("page → body (baseline)", await time_async(baseline, hits, iterations)),
+        ("page → body (optimized)", await time_async(optimized, hits, iterations)),
+    ]
+    for label, seconds in rows:
+        print(f"  {label:<30} {seconds * 1e6:9.1f} µs/page")
+    print(f"\n  decode speedup     {rows[0][1] / rows[1][1]:.1f}x")
+    print(f"  serialize speedup  {rows[2][1] / rows[3][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--body-kb", type=int, default=16, help="size of each question body")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.body_kb))
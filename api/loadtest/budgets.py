@@ -0,0 +1,366 @@
+"""
+ES round-trip budgets per endpoint: fails when a route's calls change.
+
+    cd api && python -m loadtest.budgets            # check; exit 1 on any mismatch
+    cd api && python -m loadtest.budgets --update   # accept the current counts
+
+Every route in app/routers/, websocket routes included, is executed once
+(some several times, in different states — e.g. a first vote and a
+changed vote) against the
+in-memory FakeElasticsearch, and the ES calls each request makes are
+counted by API ("get", "search", "bulk", "security.authenticate", ...),
+plus how many of them forced a refresh. The counts are compared with
+loadtest/budgets.json:
+
+  - any API called more often than budgeted, or more forced refreshes,
+    is a regression;
+  - counts under budget fail too, until the gain is locked in with
+    --update, so budgets.json always records what the routes really do;
+  - a route without a case here, a case without a budget, or a budget
+    without a case is an error, so new endpoints get a budget when they
+    are added.
+
+Websocket cases ("WS /route") connect, send the case's messages, then
+disconnect; an accepted connection counts as status 101.
+
+Runs with the default settings (write-behind votes off, no rate limit),
+so the numbers do not depend on the local .env.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from collections.abc import Callable
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+import httpx
+
+from loadtest.inprocess import open_app
+from loadtest.recording import CallLog, current_log
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.json")
+
+# Settings that change how many ES calls a route makes
+PINNED_SETTINGS = {
+    "VOTE_WRITE_BEHIND": "false",
+    "ADMIN_TOKEN": "budget-admin-token",
+}
+ADMIN_HEADERS = {"X-Admin-Token": PINNED_SETTINGS["ADMIN_TOKEN"]}
+
+
+class Case(NamedTuple):
+    # "METHOD /route/{template}" (WS for websockets) — matched against the app's routes
+    route: str
+    # Shown in the report and used as the budget key; defaults to route
+    name: str
+    # Builds (path, request kwargs) from the fixtures
+    build: Callable[[dict], tuple[str, dict]]
+    expected_status: int = 200
+
+
+def case(route: str, build, name: str | None = None, expected_status: int = 200) -> Case:
+    return Case(route, name or route, build, expected_status)
+
+
+def _headers(user: dict) -> dict:
+    return {"Authorization": f"Bearer {user['api_key']}"}
+
+
+CASES = [
+    case("POST /auth/register", lambda f: ("/auth/register", {"json": {"username": "budget_carol"}}), expected_status=201),
+    case(
+        "POST /auth/register/bulk",
+        lambda f: (
+            "/auth/register/bulk",
+            {"headers": ADMIN_HEADERS, "json": {"usernames": ["budget_dave", "budget_erin", "budget_frank"]}},
+        ),
+    ),
+    case(
+        "POST /forums",
+        lambda f: ("/forums", {"headers": _headers(f["alice"]), "json": {"name": "Budget Forum Two"}}),
+        expected_status=201,
+    ),
+    case("GET /forums", lambda f: ("/forums", {})),
+    case("GET /forums", lambda f: ("/forums", {"params": {"search": "budg"}}), name="GET /forums?search"),
+    case("GET /forums/{forum_id}", lambda f: (f"/forums/{f['forum']}", {})),
+    case(
+        "POST /questions",
+        lambda f: (
+            "/questions",
+            {
+                "headers": _headers(f["alice"]),
+                "json": {"forum_id": f["forum"], "title": "Second question", "body": "How do I ```run``` this?"},
+            },
+        ),
+        expected_status=201,
+    ),
+    case("GET /questions/search", lambda f: ("/questions/search", {"params": {"q": "budget question"}})),
+    case("GET /questions/unanswered", lambda f: ("/questions/unanswered", {})),
+    case("GET /questions", lambda f: ("/questions", {})),
+    case(
+        "GET /questions",
+        lambda f: ("/questions", {"headers": _headers(f["bob"]), "params": {"forum_id": f["forum"], "sort": "top"}}),
+        name="GET /questions (authenticated, forum, top)",
+    ),
+    case("GET /questions/{question_id}", lambda f: (f"/questions/{f['question']}", {})),
+    case(
+        "POST /questions/{question_id}/answers",
+        lambda f: (f"/questions/{f['question']}/answers", {"headers": _headers(f["bob"]), "json": {"body": "Another"}}),
+        expected_status=201,
+    ),
+    case("GET /questions/{question_id}/answers", lambda f: (f"/questions/{f['question']}/answers", {})),
+    case(
+        "GET /questions/{question_id}/answers",
+        lambda f: (f"/questions/{f['question']}/answers", {"headers": _headers(f["alice"])}),
+        name="GET /questions/{question_id}/answers (authenticated)",
+    ),
+    case(
+        "GET /questions/{question_id}/answers/wait",
+        lambda f: (f"/questions/{f['question']}/answers/wait", {"params": {"since": "2000-01-01T00:00:00Z"}}),
+        name="GET /questions/{question_id}/answers/wait (old since)",
+    ),
+    case(
+        "GET /questions/{question_id}/answers/wait",
+        lambda f: (f"/questions/{f['question']}/answers/wait", {"params": {"since": f["answered_at"]}}),
+        name="GET /questions/{question_id}/answers/wait (answer arrived)",
+    ),
+    case(
+        "GET /questions/{question_id}/answers/wait",
+        lambda f: (f"/questions/{f['question']}/answers/wait", {"params": {"timeout": 1}}),
+        name="GET /questions/{question_id}/answers/wait (timeout)",
+    ),
+    case("GET /answers/{answer_id}", lambda f: (f"/answers/{f['answer']}", {})),
+    case(
+        "POST /questions/{question_id}/vote",
+        lambda f: (f"/questions/{f['question']}/vote", {"headers": _headers(f["bob"]), "json": {"vote": "up"}}),
+        name="POST /questions/{question_id}/vote (new vote)",
+    ),
+    case(
+        "POST /questions/{question_id}/vote",
+        lambda f: (f"/questions/{f['question']}/vote", {"headers": _headers(f["bob"]), "json": {"vote": "down"}}),
+        name="POST /questions/{question_id}/vote (changed vote)",
+    ),
+    case(
+        "POST /answers/{answer_id}/vote",
+        lambda f: (f"/answers/{f['answer']}/vote", {"headers": _headers(f["alice"]), "json": {"vote": "up"}}),
+    ),
+    case(
+        "POST /votes/batch",
+        lambda f: (
+            "/votes/batch",
+            {
+                "headers": _headers(f["alice"]),
+                "json": {
+                    "votes": [
+                        {"target_type": "answer", "target_id": f["answer"], "vote": "none"},
+                        {"target_type": "question", "target_id": f["bob_question"], "vote": "up"},
+                    ]
+                },
+            },
+        ),
+    ),
+    case("GET /users/me", lambda f: ("/users/me", {"headers": _headers(f["alice"])})),
+    case("GET /users/top", lambda f: ("/users/top", {})),
+    case("GET /users/username/{username}", lambda f: ("/users/username/budget_alice", {})),
+    case("GET /users/{user_id}", lambda f: (f"/users/{f['alice']['id']}", {})),
+    case("GET /users/{user_id}/questions", lambda f: (f"/users/{f['alice']['id']}/questions", {})),
+    case("GET /users/{user_id}/answers", lambda f: (f"/users/{f['bob']['id']}/answers", {})),
+    case("GET /analytics/activity", lambda f: ("/analytics/activity", {"params": {"forum_id": f["forum"]}})),
+    case("GET /admin/profiles", lambda f: ("/admin/profiles", {"headers": ADMIN_HEADERS})),
+    case(
+        "WS /ws/feed",
+        lambda f: ("/ws/feed", {"params": {"forum_id": f["forum"]}, "messages": ['{"forums": []}']}),
+        expected_status=101,
+    ),
+    case(
+        "GET /admin/profiles/{profile_id}",
+        lambda f: ("/admin/profiles/no-such-profile", {"headers": ADMIN_HEADERS}),
+        expected_status=404,
+    ),
+]
+
+
+class Usage(NamedTuple):
+    calls: dict[str, int]
+    refreshes: int
+
+    @classmethod
+    def from_log(cls, log: CallLog) -> "Usage":
+        return cls(dict(sorted(Counter(call.api for call in log.calls).items())), log.refreshes)
+
+    def describe(self) -> str:
+        calls = ", ".join(f"{api} {count}" for api, count in self.calls.items()) or "none"
+        return f"{calls}; refreshes {self.refreshes}"
+
+
+async def _setup(client: httpx.AsyncClient) -> dict:
+    """Two users, a forum, a question from each and an answer — the state every case starts from."""
+    fixtures = {}
+    for name in ("alice", "bob"):
+        response = await client.post("/auth/register", json={"username": f"budget_{name}"})
+        response.raise_for_status()
+        fixtures[name] = {"id": response.json()["user"]["id"], "api_key": response.json()["api_key"]}
+
+    alice, bob = _headers(fixtures["alice"]), _headers(fixtures["bob"])
+    response = await client.post("/forums", headers=alice, json={"name": "Budget Forum"})
+    response.raise_for_status()
+    fixtures["forum"] = response.json()["id"]
+
+    for key, headers in (("question", alice), ("bob_question", bob)):
+        response = await client.post(
+            "/questions",
+            headers=headers,
+            json={"forum_id": fixtures["forum"], "title": "A budget question", "body": "What does it cost?"},
+        )
+        response.raise_for_status()
+        fixtures[key] = response.json()["id"]
+
+    fixtures["answered_at"] = datetime.now(timezone.utc).isoformat()
+    response = await client.post(f"/questions/{fixtures['question']}/answers", headers=bob, json={"body": "An answer"})
+    response.raise_for_status()
+    fixtures["answer"] = response.json()["id"]
+    return fixtures
+
+
+def _router_routes(app) -> set[str]:
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+
+    routes = set()
+    for route in app.routes:
+        if not isinstance(route, (APIRoute, APIWebSocketRoute)):
+            continue
+        if not route.endpoint.__module__.startswith("app.routers."):
+            continue
+        methods = route.methods if isinstance(route, APIRoute) else {"WS"}
+        routes |= {f"{method} {route.path}" for method in methods}
+    return routes
+
+
+async def _websocket_session(app, path: str, kwargs: dict) -> tuple[int, str]:
+    """Connect to a websocket route, send kwargs["messages"] and disconnect; (status, close reason)."""
+    url = httpx.URL(path, params=kwargs.get("params"))
+    incoming: asyncio.Queue = asyncio.Queue()
+    incoming.put_nowait({"type": "websocket.connect"})
+    outcome = {"status": 403, "reason": ""}
+
+    async def receive() -> dict:
+        return await incoming.get()
+
+    async def send(message: dict) -> None:
+        if message["type"] == "websocket.accept":
+            outcome["status"] = 101
+            for text in kwargs.get("messages", []):
+                incoming.put_nowait({"type": "websocket.receive", "text": text})
+            incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        elif message["type"] == "websocket.close":
+            outcome["reason"] = message.get("reason") or ""
+
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "scheme": "ws",
+        "http_version": "1.1",
+        "path": url.path,
+        "raw_path": url.raw_path.split(b"?")[0],
+        "root_path": "",
+        "query_string": url.query,
+        "headers": [(b"host", b"loadtest")],
+        "client": ("127.0.0.1", 0),
+        "server": ("loadtest", 80),
+        "subprotocols": [],
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=10)
+    return outcome["status"], outcome["reason"]
+
+
+async def measure() -> tuple[dict[str, Usage], list[str]]:
+    """Run every case; returns usage per case name and any setup errors."""
+    os.environ.update(PINNED_SETTINGS)
+    errors = []
+    usage = {}
+    async with AsyncExitStack() as stack:
+        client, _ = await open_app(stack)
+        from app.main import app
+
+        covered = {c.route for c in CASES}
+        errors += [f"{route}: no budget case in loadtest/budgets.py" for route in sorted(_router_routes(app) - covered)]
+
+        fixtures = await _setup(client)
+        for c in CASES:
+            method = c.route.split(" ", 1)[0]
+            path, kwargs = c.build(fixtures)
+            log = CallLog()
+            token = current_log.set(log)
+            try:
+                if method == "WS":
+                    status, text = await _websocket_session(app, path, kwargs)
+                else:
+                    response = await client.request(method, path, **kwargs)
+                    status, text = response.status_code, response.text
+            finally:
+                current_log.reset(token)
+            if status != c.expected_status:
+                errors.append(f"{c.name}: expected {c.expected_status}, got {status}: {text[:200]}")
+            usage[c.name] = Usage.from_log(log)
+    return usage, errors
+
+
+def compare(usage: dict[str, Usage], budgets: dict) -> tuple[list[str], list[str]]:
+    """(regressions, improvements) of the measured usage against the budgets; both fail the check."""
+    regressions, improvements = [], []
+    for name in budgets.keys() - usage.keys():
+        regressions.append(f"{name}: budget recorded for a case that no longer exists (run with --update)")
+    for name, actual in usage.items():
+        if name not in budgets:
+            regressions.append(f"{name}: no budget recorded (run with --update)")
+            continue
+        budget = Usage(budgets[name]["calls"], budgets[name]["refreshes"])
+        over = [
+            f"{api} {budget.calls.get(api, 0)} -> {count}"
+            for api, count in actual.calls.items()
+            if count > budget.calls.get(api, 0)
+        ]
+        if actual.refreshes > budget.refreshes:
+            over.append(f"refreshes {budget.refreshes} -> {actual.refreshes}")
+        if over:
+            regressions.append(f"{name}: {'; '.join(over)}")
+        elif actual != budget:
+            improvements.append(f"{name}: {budget.describe()} -> {actual.describe()}")
+    return regressions, improvements
+
+
+def main(update: bool) -> int:
+    usage, errors = asyncio.run(measure())
+    for message in errors:
+        print(f"ERROR {message}")
+    if errors:
+        return 1
+
+    if update:
+        budgets = {name: {"calls": u.calls, "refreshes": u.refreshes} for name, u in usage.items()}
+        BUDGETS_PATH.write_text(json.dumps(budgets, indent=2) + "\n")
+        print(f"Wrote {len(budgets)} budgets to {BUDGETS_PATH}")
+        return 0
+
+    budgets = json.loads(BUDGETS_PATH.read_text()) if BUDGETS_PATH.exists() else {}
+    regressions, improvements = compare(usage, budgets)
+    for name, u in usage.items():
+        print(f"{name:<55} {u.describe()}")
+    for message in improvements:
+        print(f"UNDER BUDGET {message} (run with --update to lock this in)")
+    for message in regressions:
+        print(f"OVER BUDGET {message}")
+    return 1 if regressions or improvements else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="rewrite budgets.json with the current counts")
+    args = parser.parse_args()
+    sys.exit(main(args.update))
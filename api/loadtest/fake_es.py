@@ -0,0 +1,880 @@
+"""
+In-memory stand-in for the parts of AsyncElasticsearch this API uses.
+
+Good enough to drive every route end-to-end without a cluster: documents
+are stored per index as plain dicts, queries cover the DSL subset the
+routers build (term/terms/range/bool/wildcard/match/semantic/retrievers),
+and the Painless scripts we ship are emulated by a tiny statement
+interpreter. It is NOT a search engine — relevance is a token overlap
+count and semantic queries are treated as keyword matches.
+"""
+
+import base64
+import copy
+import itertools
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import ConflictError, NotFoundError
+
+_NODE = NodeConfig("http", "localhost", 9200)
+
+
+def _meta(status: int) -> ApiResponseMeta:
+    return ApiResponseMeta(
+        status=status,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0.0,
+        node=_NODE,
+    )
+
+
+def _not_found(index: str, doc_id: str | None = None) -> NotFoundError:
+    what = f"[{doc_id}]" if doc_id else f"index [{index}]"
+    return NotFoundError(message=f"{what} not found", meta=_meta(404), body={"found": False})
+
+
+def _conflict(index: str, doc_id: str) -> ConflictError:
+    return ConflictError(
+        message=f"[{doc_id}]: version conflict in [{index}]",
+        meta=_meta(409),
+        body={"error": {"type": "version_conflict_engine_exception"}},
+    )
+
+
+def _parse_date(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    text = str(value)
+    if text.startswith("now"):
+        return _date_math(text)
+    return datetime.fromisoformat(text.replace("Z", "+00:00"))
+
+
+def _date_math(expr: str) -> datetime:
+    """Evaluate the `now-1h` / `now-7d/d` style expressions we send."""
+    now = datetime.now(timezone.utc)
+    match = re.fullmatch(r"now(?:([+-])(\d+)([smhd]))?(?:/([hd]))?", expr)
+    if not match:
+        return now
+    sign, amount, unit, rounding = match.groups()
+    if amount:
+        delta = timedelta(**{{"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}[unit]: int(amount)})
+        now = now + delta if sign == "+" else now - delta
+    if rounding == "h":
+        now = now.replace(minute=0, second=0, microsecond=0)
+    elif rounding == "d":
+        now = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return now
+
+
+def _get_field(src: dict, field: str):
+    if field in src:
+        return src[field]
+    node = src
+    for part in field.split("."):
+        if not isinstance(node, dict) or part not in node:
+            if field.endswith(".keyword"):
+                return _get_field(src, field[: -len(".keyword")])
+            return None
+        node = node[part]
+    return node
+
+
+def _tokens(text) -> set[str]:
+    return set(re.findall(r"\w+", str(text).lower()))
+
+
+def _filter_source(src: dict, spec) -> dict | None:
+    if spec is False:
+        return None
+    if spec is None or spec is True:
+        return copy.deepcopy(src)
+    if isinstance(spec, str):
+        spec = [spec]
+    if isinstance(spec, dict):
+        includes = spec.get("includes") or spec.get("include") or []
+        excludes = spec.get("excludes") or spec.get("exclude") or []
+        out = {k: v for k, v in src.items() if not includes or k in includes}
+        return {k: copy.deepcopy(v) for k, v in out.items() if k not in excludes}
+    return {k: copy.deepcopy(src[k]) for k in spec if k in src}
+
+
+# ── Painless emulation ──────────────────────────────────────────────
+
+_STATEMENT = re.compile(
+    r"ctx\._source\.(\w+)\s*(\+=|-=|=)\s*(.+)"
+)
+
+
+class _ScriptContext:
+    def __init__(self, source: dict | None, op: str):
+        self.source = source
+        self.op = op
+
+
+def _eval_expr(expr: str, ctx: _ScriptContext, params: dict):
+    expr = expr.strip()
+    if " - " in expr:
+        left, right = expr.split(" - ", 1)
+        return _eval_expr(left, ctx, params) - _eval_expr(right, ctx, params)
+    if " + " in expr:
+        left, right = expr.split(" + ", 1)
+        return _eval_expr(left, ctx, params) + _eval_expr(right, ctx, params)
+    if expr.startswith("params."):
+        return params[expr[len("params."):]]
+    if expr.startswith("ctx._source."):
+        return ctx.source.get(expr[len("ctx._source."):], 0)
+    if expr.startswith("'") or expr.startswith('"'):
+        return expr[1:-1]
+    if expr in ("true", "false"):
+        return expr == "true"
+    return int(expr)
+
+
+class ScriptRegistry:
+    """
+    Maps script sources to Python callables.
+
+    Scripts that are straight-line `ctx._source.x += ...` statements are
+    interpreted directly; anything with control flow must be registered
+    with an equivalent Python function `fn(ctx, params)`.
+    """
+
+    def __init__(self):
+        self._scripts: dict[str, object] = {}
+
+    def register(self, source: str, fn) -> None:
+        self._scripts[self._key(source)] = fn
+
+    @staticmethod
+    def _key(source: str) -> str:
+        return re.sub(r"\s+", " ", source).strip()
+
+    def run(self, script: dict, ctx: _ScriptContext) -> None:
+        source = script.get("source", "")
+        params = script.get("params", {})
+        fn = self._scripts.get(self._key(source))
+        if fn is not None:
+            fn(ctx, params)
+            return
+        for statement in source.split(";"):
+            statement = statement.strip()
+            if not statement:
+                continue
+            match = _STATEMENT.fullmatch(statement)
+            if not match:
+                raise ValueError(f"FakeElasticsearch cannot interpret script: {statement!r}")
+            field, op, expr = match.groups()
+            value = _eval_expr(expr, ctx, params)
+            if op == "+=":
+                ctx.source[field] = ctx.source.get(field, 0) + value
+            elif op == "-=":
+                ctx.source[field] = ctx.source.get(field, 0) - value
+            else:
+                ctx.source[field] = value
+
+
+# ── Query evaluation ────────────────────────────────────────────────
+
+
+def _matches(query: dict | None, doc_id: str, src: dict) -> bool:
+    if not query:
+        return True
+    (kind, body), = query.items()
+    if kind == "match_all":
+        return True
+    if kind == "match_none":
+        return False
+    if kind == "ids":
+        return doc_id in body["values"]
+    if kind == "term":
+        (field, value), = body.items()
+        if isinstance(value, dict):
+            value = value["value"]
+        actual = doc_id if field == "_id" else _get_field(src, field)
+        if isinstance(actual, list):
+            return value in actual
+        return actual == value
+    if kind == "terms":
+        (field, values), = ((k, v) for k, v in body.items() if k != "boost")
+        actual = doc_id if field == "_id" else _get_field(src, field)
+        return actual in values
+    if kind == "exists":
+        return _get_field(src, body["field"]) is not None
+    if kind == "range":
+        (field, bounds), = body.items()
+        actual = _get_field(src, field)
+        if actual is None:
+            return False
+        is_date = isinstance(actual, str)
+        value = _parse_date(actual) if is_date else actual
+        for op, bound in bounds.items():
+            if op == "format":
+                continue
+            bound = _parse_date(bound) if is_date else bound
+            if op == "gte" and not value >= bound:
+                return False
+            if op == "gt" and not value > bound:
+                return False
+            if op == "lte" and not value <= bound:
+                return False
+            if op == "lt" and not value < bound:
+                return False
+        return True
+    if kind == "wildcard":
+        (field, spec), = body.items()
+        pattern = spec["value"] if isinstance(spec, dict) else spec
+        flags = re.IGNORECASE if isinstance(spec, dict) and spec.get("case_insensitive") else 0
+        regex = "".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern)
+        return re.fullmatch(regex, str(_get_field(src, field) or ""), flags) is not None
+    if kind == "prefix":
+        (field, spec), = body.items()
+        value = spec["value"] if isinstance(spec, dict) else spec
+        return str(_get_field(src, field) or "").startswith(value)
+    if kind in ("match", "match_phrase"):
+        (field, spec), = body.items()
+        text = spec["query"] if isinstance(spec, dict) else spec
+        return bool(_tokens(text) & _tokens(_get_field(src, field) or ""))
+    if kind == "multi_match":
+        fields = [f.split("^")[0] for f in body.get("fields", [])]
+        return any(_tokens(body["query"]) & _tokens(_get_field(src, f) or "") for f in fields)
+    if kind == "semantic":
+        field = body["field"]
+        return bool(_tokens(body["query"]) & _tokens(_get_field(src, field) or ""))
+    if kind == "bool":
+        for clause in ("must", "filter"):
+            clauses = body.get(clause, [])
+            clauses = clauses if isinstance(clauses, list) else [clauses]
+            if not all(_matches(c, doc_id, src) for c in clauses):
+                return False
+        must_not = body.get("must_not", [])
+        must_not = must_not if isinstance(must_not, list) else [must_not]
+        if any(_matches(c, doc_id, src) for c in must_not):
+            return False
+        should = body.get("should", [])
+        should = should if isinstance(should, list) else [should]
+        if should and not body.get("must") and not body.get("filter"):
+            return any(_matches(c, doc_id, src) for c in should)
+        return True
+    raise ValueError(f"FakeElasticsearch does not support query type {kind!r}")
+
+
+def _score(query: dict | None, src: dict) -> float:
+    """Crude relevance: number of query tokens found in text fields."""
+    text_query = _find_text_query(query)
+    if not text_query:
+        return 1.0
+    words = _tokens(text_query)
+    haystack = _tokens(" ".join(str(v) for v in src.values() if isinstance(v, str)))
+    return float(len(words & haystack))
+
+
+def _find_text_query(query) -> str | None:
+    if isinstance(query, dict):
+        for kind, body in query.items():
+            if kind in ("multi_match", "semantic") and isinstance(body, dict):
+                return body.get("query")
+            found = _find_text_query(body)
+            if found:
+                return found
+    elif isinstance(query, list):
+        for item in query:
+            found = _find_text_query(item)
+            if found:
+                return found
+    return None
+
+
+def _retriever_query(retriever: dict) -> dict:
+    """Flatten a retriever tree into one bool query (fusion order is approximated)."""
+    (kind, body), = retriever.items()
+    if kind == "standard":
+        query = body.get("query", {"match_all": {}})
+        if body.get("filter"):
+            query = {"bool": {"must": [query], "filter": [body["filter"]]}}
+        return query
+    if kind == "rrf":
+        should = [_retriever_query(r) for r in body["retrievers"]]
+        query = {"bool": {"should": should}}
+        if body.get("filter"):
+            query = {"bool": {"must": [query], "filter": [body["filter"]]}}
+        return query
+    if kind == "text_similarity_reranker":
+        return _retriever_query(body["retriever"])
+    raise ValueError(f"FakeElasticsearch does not support retriever {kind!r}")
+
+
+def _sort_key(sort_spec: list, doc: dict):
+    keys = []
+    for clause in sort_spec:
+        if isinstance(clause, str):
+            field, order = clause, "asc"
+        else:
+            (field, opts), = clause.items()
+            order = opts.get("order", "asc") if isinstance(opts, dict) else opts
+        if field == "_score":
+            value = doc["_score"]
+        elif field in ("_shard_doc", "_doc"):
+            value = doc["_seq"]
+        elif field == "_id":
+            value = doc["_id"]
+        else:
+            value = _get_field(doc["_source"], field)
+        keys.append((value, order))
+    return keys
+
+
+class _Reverse:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _orderable(keys):
+    out = []
+    for value, order in keys:
+        # Missing values sort last regardless of direction
+        item = (value is None, value if value is not None else 0)
+        out.append(_Reverse(item) if order == "desc" else item)
+    return out
+
+
+# ── Aggregations ────────────────────────────────────────────────────
+
+_INTERVALS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _interval_seconds(spec: dict) -> int:
+    interval = spec.get("fixed_interval") or spec.get("calendar_interval") or spec.get("interval")
+    named = {"second": "1s", "minute": "1m", "hour": "1h", "day": "1d"}
+    interval = named.get(interval, interval)
+    match = re.fullmatch(r"(\d+)([smhd])", interval)
+    return int(match.group(1)) * _INTERVALS[match.group(2)]
+
+
+def _bucket_date(value, seconds: int) -> int:
+    ts = _parse_date(value).timestamp()
+    return int(ts // seconds * seconds) * 1000
+
+
+def _run_aggs(aggs: dict, docs: list[dict]) -> dict:
+    out = {}
+    for name, spec in aggs.items():
+        sub = spec.get("aggs") or spec.get("aggregations")
+        (kind, body), = ((k, v) for k, v in spec.items() if k not in ("aggs", "aggregations"))
+        if kind in ("sum", "max", "min", "avg", "value_count"):
+            values = [_get_field(d["_source"], body["field"]) for d in docs]
+            values = [v for v in values if v is not None]
+            if kind == "sum":
+                out[name] = {"value": float(sum(values))}
+            elif kind == "value_count":
+                out[name] = {"value": len(values)}
+            elif kind == "avg":
+                out[name] = {"value": (sum(values) / len(values)) if values else None}
+            else:
+                fn = max if kind == "max" else min
+                out[name] = {"value": fn(values) if values else None}
+        elif kind == "terms":
+            groups: dict = {}
+            for d in docs:
+                key = _get_field(d["_source"], body["field"])
+                if key is not None:
+                    groups.setdefault(key, []).append(d)
+            ordered = sorted(groups.items(), key=lambda kv: (-len(kv[1]), str(kv[0])))
+            out[name] = {
+                "buckets": [
+                    {"key": k, "doc_count": len(v), **(_run_aggs(sub, v) if sub else {})}
+                    for k, v in ordered[: body.get("size", 10)]
+                ]
+            }
+        elif kind == "date_histogram":
+            seconds = _interval_seconds(body)
+            groups = {}
+            for d in docs:
+                value = _get_field(d["_source"], body["field"])
+                if value is not None:
+                    groups.setdefault(_bucket_date(value, seconds), []).append(d)
+            out[name] = {
+                "buckets": [
+                    {
+                        "key": k,
+                        "key_as_string": datetime.fromtimestamp(k / 1000, tz=timezone.utc).isoformat(),
+                        "doc_count": len(v),
+                        **(_run_aggs(sub, v) if sub else {}),
+                    }
+                    for k, v in sorted(groups.items())
+                ]
+            }
+        elif kind == "filter":
+            matched = [d for d in docs if _matches(body, d["_id"], d["_source"])]
+            out[name] = {"doc_count": len(matched), **(_run_aggs(sub, matched) if sub else {})}
+        elif kind == "composite":
+            out[name] = _composite(body, sub, docs)
+        else:
+            raise ValueError(f"FakeElasticsearch does not support aggregation {kind!r}")
+    return out
+
+
+def _composite(body: dict, sub: dict | None, docs: list[dict]) -> dict:
+    sources = body["sources"]
+    groups: dict = {}
+    for d in docs:
+        key = []
+        skip = False
+        for source in sources:
+            (source_name, source_spec), = source.items()
+            (kind, opts), = source_spec.items()
+            value = _get_field(d["_source"], opts["field"])
+            if value is not None and kind == "date_histogram":
+                value = _bucket_date(value, _interval_seconds(opts))
+            if value is None and not opts.get("missing_bucket"):
+                skip = True
+                break
+            key.append((source_name, value))
+        if not skip:
+            groups.setdefault(tuple(key), []).append(d)
+
+    def order(item):
+        return tuple((v is not None, v if v is not None else 0) for _, v in item[0])
+
+    ordered = sorted(groups.items(), key=order)
+    after = body.get("after")
+    if after:
+        after_key = tuple((v is not None, v if v is not None else 0) for v in after.values())
+        ordered = [item for item in ordered if order(item) > after_key]
+    page = ordered[: body.get("size", 10)]
+    result = {
+        "buckets": [
+            {"key": dict(k), "doc_count": len(v), **(_run_aggs(sub, v) if sub else {})}
+            for k, v in page
+        ]
+    }
+    if page:
+        result["after_key"] = dict(page[-1][0])
+    return result
+
+
+# ── Client ──────────────────────────────────────────────────────────
+
+
+class _Namespace:
+    def __init__(self, client: "FakeElasticsearch"):
+        self._client = client
+
+
+class _Indices(_Namespace):
+    async def exists(self, index: str, **_):
+        return index in self._client._indices
+
+    async def create(self, index: str, **config):
+        self._client._indices.setdefault(index, {})
+        self._client._mappings[index] = config.get("mappings", {})
+        return {"acknowledged": True, "index": index}
+
+    async def refresh(self, index: str | None = None, **_):
+        return {"_shards": {"successful": 1}}
+
+    async def delete(self, index: str, **_):
+        self._client._indices.pop(index, None)
+        return {"acknowledged": True}
+
+
+class _Ingest(_Namespace):
+    async def put_pipeline(self, id: str, **pipeline):
+        self._client._pipelines[id] = pipeline
+        return {"acknowledged": True}
+
+
+class _Security(_Namespace):
+    async def create_api_key(self, name: str, metadata: dict | None = None, **_):
+        key_id = uuid.uuid4().hex[:20]
+        secret = uuid.uuid4().hex
+        self._client._api_keys[key_id] = {"id": key_id, "name": name, "metadata": metadata or {}}
+        encoded = base64.b64encode(f"{key_id}:{secret}".encode()).decode()
+        self._client._encoded_keys[encoded] = key_id
+        return {"id": key_id, "name": name, "api_key": secret, "encoded": encoded}
+
+    async def authenticate(self, **_):
+        return await self._client._authenticate()
+
+    async def get_api_key(self, id: str, **_):
+        if id not in self._client._api_keys:
+            raise _not_found("api_keys", id)
+        return {"api_keys": [self._client._api_keys[id]]}
+
+
+class FakeElasticsearch:
+    """Async in-memory Elasticsearch double. See module docstring."""
+
+    def __init__(self, *, scripts: ScriptRegistry | None = None, _shared=None):
+        if _shared is None:
+            _shared = {
+                "indices": {},
+                "mappings": {},
+                "pipelines": {},
+                "api_keys": {},
+                "encoded_keys": {},
+                "pits": {},
+                "seq": itertools.count(),
+                "scripts": scripts or ScriptRegistry(),
+            }
+        self._shared = _shared
+        self._indices = _shared["indices"]
+        self._mappings = _shared["mappings"]
+        self._pipelines = _shared["pipelines"]
+        self._api_keys = _shared["api_keys"]
+        self._encoded_keys = _shared["encoded_keys"]
+        self._pits = _shared["pits"]
+        self._seq = _shared["seq"]
+        self.scripts: ScriptRegistry = _shared["scripts"]
+        self._auth_key: str | None = None
+        self.indices = _Indices(self)
+        self.ingest = _Ingest(self)
+        self.security = _Security(self)
+
+    # -- plumbing --------------------------------------------------
+
+    def options(self, *, api_key: str | None = None, **_):
+        clone = FakeElasticsearch(_shared=self._shared)
+        clone._auth_key = api_key
+        return clone
+
+    async def _authenticate(self, **_):
+        key_id = self._encoded_keys.get(self._auth_key)
+        if key_id is None:
+            from elasticsearch import AuthenticationException
+
+            raise AuthenticationException(message="invalid api key", meta=_meta(401), body={})
+        return {"username": "agent", "api_key": {"id": key_id}}
+
+    async def info(self, **_):
+        return {"version": {"number": "8.17.1-fake"}, "tagline": "You Know, for Search"}
+
+    async def close(self):
+        return None
+
+    def _index(self, index: str, create: bool = True) -> dict:
+        if index not in self._indices:
+            if not create:
+                raise _not_found(index)
+            self._indices[index] = {}
+        return self._indices[index]
+
+    def _stored(self, index: str, doc_id: str) -> dict | None:
+        return self._indices.get(index, {}).get(doc_id)
+
+    def _write(self, index: str, doc_id: str, source: dict, existing: dict | None) -> dict:
+        stored = {
+            "_source": source,
+            "_seq_no": next(self._seq),
+            "_primary_term": 1,
+            "_version": (existing["_version"] + 1) if existing else 1,
+            "_seq": existing["_seq"] if existing else next(self._seq),
+        }
+        self._index(index)[doc_id] = stored
+        return stored
+
+    def _apply_pipeline(self, pipeline: str | None, source: dict) -> dict:
+        if pipeline == "question_pipeline" and "body" in source:
+            source["word_count"] = len(source["body"].split(" "))
+            source["has_code"] = "```" in source["body"]
+        return source
+
+    @staticmethod
+    def _check_version(index, doc_id, existing, if_seq_no, if_primary_term):
+        if if_seq_no is None:
+            return
+        if existing is None or existing["_seq_no"] != if_seq_no or existing["_primary_term"] != if_primary_term:
+            raise _conflict(index, doc_id)
+
+    def _result(self, index: str, doc_id: str, stored: dict, result: str) -> dict:
+        return {
+            "_index": index,
+            "_id": doc_id,
+            "_version": stored["_version"],
+            "_seq_no": stored["_seq_no"],
+            "_primary_term": stored["_primary_term"],
+            "result": result,
+        }
+
+    # -- document APIs ---------------------------------------------
+
+    async def index(self, index: str, document: dict, id: str | None = None,
+                    pipeline: str | None = None, op_type: str | None = None,
+                    if_seq_no: int | None = None, if_primary_term: int | None = None, **_):
+        doc_id = id or uuid.uuid4().hex[:20]
+        existing = self._stored(index, doc_id)
+        if op_type == "create" and existing is not None:
+            raise _conflict(index, doc_id)
+        self._check_version(index, doc_id, existing, if_seq_no, if_primary_term)
+        source = self._apply_pipeline(pipeline, copy.deepcopy(dict(document)))
+        stored = self._write(index, doc_id, source, existing)
+        return self._result(index, doc_id, stored, "updated" if existing else "created")
+
+    async def create(self, index: str, id: str, document: dict, **kwargs):
+        return await self.index(index=index, id=id, document=document, op_type="create", **kwargs)
+
+    async def get(self, index: str, id: str, source=None, source_includes=None,
+                  source_excludes=None, _source=None, **_):
+        stored = self._stored(index, id)
+        if stored is None:
+            raise _not_found(index, id)
+        spec = _source if _source is not None else source
+        if source_includes is not None:
+            spec = {"includes": source_includes if isinstance(source_includes, list) else [source_includes]}
+        response = {**self._result(index, id, stored, "found"), "found": True}
+        response.pop("result")
+        src = _filter_source(stored["_source"], spec)
+        if src is not None:
+            response["_source"] = src
+        return response
+
+    async def exists(self, index: str, id: str, **_):
+        return self._stored(index, id) is not None
+
+    async def mget(self, docs: list | None = None, index: str | None = None,
+                   ids: list | None = None, source=None, **_):
+        specs = docs or [{"_id": doc_id} for doc_id in ids or []]
+        out = []
+        for spec in specs:
+            doc_index = spec.get("_index", index)
+            doc_id = spec["_id"]
+            stored = self._stored(doc_index, doc_id)
+            if stored is None:
+                out.append({"_index": doc_index, "_id": doc_id, "found": False})
+                continue
+            entry = {**self._result(doc_index, doc_id, stored, ""), "found": True}
+            entry.pop("result")
+            src = _filter_source(stored["_source"], spec.get("_source", source))
+            if src is not None:
+                entry["_source"] = src
+            out.append(entry)
+        return {"docs": out}
+
+    async def update(self, index: str, id: str, doc: dict | None = None,
+                     script: dict | None = None, upsert: dict | None = None,
+                     scripted_upsert: bool = False, doc_as_upsert: bool = False,
+                     source=None, if_seq_no: int | None = None,
+                     if_primary_term: int | None = None, **_):
+        existing = self._stored(index, id)
+        self._check_version(index, id, existing, if_seq_no, if_primary_term)
+        if existing is None:
+            if script is not None and scripted_upsert:
+                base = copy.deepcopy(upsert or {})
+            elif upsert is not None:
+                stored = self._write(index, id, copy.deepcopy(upsert), None)
+                return self._update_result(index, id, stored, "created", source)
+            elif doc is not None and doc_as_upsert:
+                stored = self._write(index, id, copy.deepcopy(doc), None)
+                return self._update_result(index, id, stored, "created", source)
+            else:
+                raise _not_found(index, id)
+        else:
+            base = copy.deepcopy(existing["_source"])
+
+        if script is not None:
+            ctx = _ScriptContext(base, "create" if existing is None else "index")
+            self.scripts.run(script, ctx)
+            if ctx.op == "noop":
+                return self._update_result(index, id, existing or {"_version": 0, "_seq_no": -1, "_primary_term": 1, "_source": base}, "noop", source)
+            if ctx.op == "delete":
+                if existing is None:
+                    return self._update_result(index, id, {"_version": 0, "_seq_no": -1, "_primary_term": 1, "_source": base}, "noop", source)
+                del self._indices[index][id]
+                return self._update_result(index, id, existing, "deleted", None)
+            new_source = ctx.source
+        else:
+            new_source = {**base, **copy.deepcopy(doc or {})}
+            if existing is not None and new_source == existing["_source"]:
+                return self._update_result(index, id, existing, "noop", source)
+
+        stored = self._write(index, id, new_source, existing)
+        return self._update_result(index, id, stored, "created" if existing is None else "updated", source)
+
+    def _update_result(self, index, doc_id, stored, result, source_spec) -> dict:
+        response = self._result(index, doc_id, stored, result)
+        if source_spec not in (None, False):
+            response["get"] = {"found": True, "_source": _filter_source(stored["_source"], source_spec)}
+        return response
+
+    async def delete(self, index: str, id: str, if_seq_no: int | None = None,
+                     if_primary_term: int | None = None, **_):
+        existing = self._stored(index, id)
+        if existing is None:
+            raise _not_found(index, id)
+        self._check_version(index, id, existing, if_seq_no, if_primary_term)
+        del self._indices[index][id]
+        return self._result(index, id, existing, "deleted")
+
+    async def bulk(self, operations: list, index: str | None = None, **_):
+        items = []
+        errors = False
+        lines = iter(operations)
+        for action in lines:
+            (op, meta), = action.items()
+            doc_index = meta.get("_index", index)
+            doc_id = meta.get("_id")
+            versioned = {
+                "if_seq_no": meta.get("if_seq_no"),
+                "if_primary_term": meta.get("if_primary_term"),
+            }
+            try:
+                if op in ("index", "create"):
+                    body = next(lines)
+                    result = await self.index(
+                        index=doc_index, id=doc_id, document=body,
+                        op_type="create" if op == "create" else meta.get("op_type"),
+                        pipeline=meta.get("pipeline"), **versioned,
+                    )
+                    status = 201 if result["result"] == "created" else 200
+                elif op == "update":
+                    body = next(lines)
+                    result = await self.update(
+                        index=doc_index, id=doc_id,
+                        doc=body.get("doc"), script=body.get("script"),
+                        upsert=body.get("upsert"),
+                        scripted_upsert=body.get("scripted_upsert", False),
+                        doc_as_upsert=body.get("doc_as_upsert", False),
+                        source=body.get("_source"), **versioned,
+                    )
+                    status = 201 if result["result"] == "created" else 200
+                elif op == "delete":
+                    result = await self.delete(index=doc_index, id=doc_id, **versioned)
+                    status = 200
+                else:
+                    raise ValueError(f"unsupported bulk op {op!r}")
+                items.append({op: {**result, "status": status}})
+            except (NotFoundError, ConflictError) as exc:
+                errors = True
+                status = exc.meta.status
+                error_type = (
+                    "version_conflict_engine_exception" if status == 409
+                    else "document_missing_exception"
+                )
+                items.append({op: {
+                    "_index": doc_index, "_id": doc_id, "status": status,
+                    "error": {"type": error_type, "reason": str(exc)},
+                }})
+        return {"took": 0, "errors": errors, "items": items}
+
+    # -- search APIs -----------------------------------------------
+
+    def _candidates(self, index: str | list | None) -> list[dict]:
+        names = index if isinstance(index, list) else (index or "").split(",")
+        docs = []
+        for name in names:
+            for doc_id, stored in self._indices.get(name.strip(), {}).items():
+                docs.append({"_index": name.strip(), "_id": doc_id, **stored})
+        return docs
+
+    async def search(self, index=None, query: dict | None = None, retriever: dict | None = None,
+                     sort: list | None = None, from_: int = 0, size: int = 10,
+                     aggs: dict | None = None, aggregations: dict | None = None,
+                     search_after: list | None = None, pit: dict | None = None,
+                     source=None, _source=None, seq_no_primary_term: bool = False,
+                     track_total_hits=None, **_):
+        if pit is not None:
+            index = self._pits[pit["id"]]
+        if retriever is not None:
+            query = _retriever_query(retriever)
+        docs = [d for d in self._candidates(index) if _matches(query, d["_id"], d["_source"])]
+        for d in docs:
+            d["_score"] = _score(query, d["_source"])
+
+        if sort:
+            sort = sort if isinstance(sort, list) else [sort]
+            docs.sort(key=lambda d: _orderable(_sort_key(sort, d)))
+        else:
+            docs.sort(key=lambda d: (-d["_score"], d["_seq"]))
+
+        if search_after is not None and sort:
+            after = _orderable(list(zip(search_after, (o for _, o in _sort_key(sort, docs[0])))) if docs else [])
+            docs = [d for d in docs if after < _orderable(_sort_key(sort, d))]
+
+        total = len(docs)
+        spec = _source if _source is not None else source
+        hits = []
+        for d in docs[from_: from_ + size]:
+            hit = {"_index": d["_index"], "_id": d["_id"], "_score": d["_score"]}
+            src = _filter_source(d["_source"], spec)
+            if src is not None:
+                hit["_source"] = src
+            if sort:
+                hit["sort"] = [v for v, _ in _sort_key(sort, d)]
+            if seq_no_primary_term:
+                hit["_seq_no"] = d["_seq_no"]
+                hit["_primary_term"] = d["_primary_term"]
+            hits.append(hit)
+
+        response = {
+            "took": 0,
+            "timed_out": False,
+            "hits": {"total": {"value": total, "relation": "eq"}, "hits": hits},
+        }
+        aggs = aggs or aggregations
+        if aggs:
+            response["aggregations"] = _run_aggs(aggs, docs)
+        if pit is not None:
+            response["pit_id"] = pit["id"]
+        return response
+
+    async def count(self, index=None, query: dict | None = None, **_):
+        docs = [d for d in self._candidates(index) if _matches(query, d["_id"], d["_source"])]
+        return {"count": len(docs)}
+
+    async def msearch(self, searches: list, index: str | None = None, **_):
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            body = dict(body)
+            if "from" in body:
+                body["from_"] = body.pop("from")
+            responses.append(await self.search(index=header.get("index", index), **body))
+        return {"took": 0, "responses": responses}
+
+    async def open_point_in_time(self, index: str, keep_alive: str, **_):
+        pit_id = uuid.uuid4().hex
+        self._pits[pit_id] = index
+        return {"id": pit_id}
+
+    async def close_point_in_time(self, id: str, **_):
+        self._pits.pop(id, None)
+        return {"succeeded": True}
+
+    async def delete_by_query(self, index: str, query: dict, **_):
+        store = self._indices.get(index, {})
+        doomed = [doc_id for doc_id, stored in store.items() if _matches(query, doc_id, stored["_source"])]
+        for doc_id in doomed:
+            del store[doc_id]
+        return {"deleted": len(doomed)}
+
+    # -- helpers for harnesses ---------------------------------------
+
+    def documents(self, index: str) -> dict[str, dict]:
+        """Snapshot of an index as {id: _source}."""
+        return {k: copy.deepcopy(v["_source"]) for k, v in self._indices.get(index, {}).items()}
+
+
+def register_app_scripts(registry: ScriptRegistry) -> None:
+    """Register Python equivalents of the app's Painless scripts that use control flow."""
+    from app.services.counters import INCREMENT_SCRIPT
+
+    def increment(ctx, params):
+        for field, delta in params["deltas"].items():
+            ctx.source[field] = (ctx.source.get(field) or 0) + delta
+        if params.get("rescore"):
+            ctx.source["score"] = ctx.source["upvote_count"] - ctx.source["downvote_count"]
+
+    registry.register(INCREMENT_SCRIPT, increment)
@@ -0,0 +1,52 @@
+"""
+Run the app in-process (lifespan included) behind an httpx client, with
+every ES call going through a RecordingElasticsearch.
+"""
+
+import os
+import tempfile
+from contextlib import AsyncExitStack
+
+import httpx
+
+from loadtest.recording import RecordingElasticsearch
+
+
+async def open_app(
+    stack: AsyncExitStack,
+    backend: str = "fake",
+    latency: float = 0.0,
+    rate_limit: bool = False,
+) -> tuple[httpx.AsyncClient, RecordingElasticsearch]:
+    """
+    Start the app on `stack` and return a client for it plus the recorder.
+
+    backend is "fake" (in-memory FakeElasticsearch) or "es" (the cluster
+    configured in .env). Settings are read when app.main is first
+    imported, so environment overrides must be in place before this runs.
+    """
+    if backend == "fake":
+        os.environ.setdefault("ELASTICSEARCH_URL", "http://fake-elasticsearch:9200")
+        os.environ.setdefault("ELASTICSEARCH_API_KEY", "unused")
+        # Jobs left from an earlier run would point at documents this fake never had
+        journal_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        os.environ.setdefault("JOB_JOURNAL_PATH", os.path.join(journal_dir, "jobs.sqlite3"))
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if rate_limit else "false"
+
+    from app import database
+    from app.main import app
+
+    if backend == "fake":
+        from loadtest.fake_es import FakeElasticsearch, register_app_scripts
+
+        client = FakeElasticsearch()
+        register_app_scripts(client.scripts)
+    else:
+        client = database.create_es_client()
+    recorder = RecordingElasticsearch(client, latency=latency)
+    database.client_factory = lambda: recorder
+
+    await stack.enter_async_context(app.router.lifespan_context(app))
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest")
+    await stack.enter_async_context(http)
+    return http, recorder
@@ -0,0 +1,107 @@
+"""
+An Elasticsearch client wrapper that records every API call.
+
+    client = RecordingElasticsearch(AsyncElasticsearch(...) or FakeElasticsearch())
+    log = CallLog()
+    token = current_log.set(log)
+    ...                       # handle one request
+    current_log.reset(token)
+    log.calls                 # [Call(api="get", index="users", refresh=None), ...]
+
+Calls are attributed through a context variable, so concurrent requests
+in one event loop each see only their own calls; calls made outside any
+request (flushers, reload loops) land in `client.background`. Namespaced
+APIs are recorded with their prefix ("indices.refresh",
+"security.authenticate"), and clients derived with .options() record into
+the same logs.
+
+`latency` (seconds) is slept before every call, to put a realistic
+round-trip under an in-memory backend.
+"""
+
+import asyncio
+from contextvars import ContextVar
+from typing import NamedTuple
+
+
+class Call(NamedTuple):
+    api: str
+    index: str | None
+    # The refresh parameter the call forced, if any ("wait_for", "true", ...)
+    refresh: str | None
+
+
+class CallLog:
+    def __init__(self):
+        self.calls: list[Call] = []
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    @property
+    def refreshes(self) -> int:
+        """Calls that forced a refresh, explicit indices.refresh included."""
+        return sum(1 for call in self.calls if call.refresh or call.api == "indices.refresh")
+
+
+current_log: ContextVar[CallLog | None] = ContextVar("es_call_log", default=None)
+
+# Client plumbing that is not an API call of its own
+_UNRECORDED = {"perform_request"}
+
+
+def _call(api: str, kwargs: dict) -> Call:
+    index = kwargs.get("index")
+    if isinstance(index, (list, tuple)):
+        index = ",".join(index)
+    refresh = kwargs.get("refresh")
+    if refresh is not None and refresh is not False:
+        refresh = str(refresh).lower()
+    else:
+        refresh = None
+    return Call(api, index, refresh)
+
+
+class _Recorder:
+    def __init__(self, target, prefix: str, background: CallLog, latency: float):
+        self._target = target
+        self._prefix = prefix
+        self._background = background
+        self._latency = latency
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or name in _UNRECORDED:
+            return attr
+        if not callable(attr):
+            return _Recorder(attr, f"{self._prefix}{name}.", self._background, self._latency)
+
+        api = f"{self._prefix}{name}"
+
+        async def recorded(*args, **kwargs):
+            log = current_log.get()
+            (log if log is not None else self._background).calls.append(_call(api, kwargs))
+            # Always yield, as a network round-trip would: an in-memory
+            # backend otherwise never suspends and one request starves the rest
+            await asyncio.sleep(self._latency)
+            return await attr(*args, **kwargs)
+
+        return recorded
+
+
+class RecordingElasticsearch(_Recorder):
+    """Wraps an (Async)Elasticsearch-compatible client. See module docstring."""
+
+    def __init__(self, client, latency: float = 0.0, background: CallLog | None = None):
+        super().__init__(client, "", background or CallLog(), latency)
+        self.client = client
+
+    @property
+    def background(self) -> CallLog:
+        return self._background
+
+    def options(self, **kwargs) -> "RecordingElasticsearch":
+        return RecordingElasticsearch(self.client.options(**kwargs), self._latency, self._background)
+
+    async def close(self):
+        await self.client.close()
@@ -0,0 +1,218 @@
+"""
+Load test the API with a mix of agent operations and report per-route
+throughput, latency percentiles and Elasticsearch calls per request.
+
+    cd api && python -m loadtest.run [--mix agents] [--concurrency 32] [--duration 30]
+    cd api && python -m loadtest.run --target http://localhost:8000 --mix browse
+
+By default the app runs in-process (httpx over ASGI, lifespan included)
+against the in-memory FakeElasticsearch, so it needs no cluster; add
+--es-latency-ms to put a round-trip under every ES call. --backend es
+runs in-process against the configured cluster (.env) instead. With
+--target URL the requests go over HTTP to a running server; ES calls are
+then not visible and those columns are left out.
+
+Mixes are named (see scenarios.MIXES) or explicit weights:
+--mix "list=5,read=3,search=1". Setup (users, forums, a starting set of
+questions and answers) runs before the clock starts and is not reported.
+Setup registers users through the operator-only bulk endpoint, so a
+--target server needs --admin-token (default $ADMIN_TOKEN); in-process
+the app is given one. Rate limiting is off in-process unless
+--rate-limit is given.
+
+Absolute numbers against the fake measure the API's own CPU cost, not
+ES's; compare runs, and watch the ES calls per request column.
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+
+import httpx
+
+from loadtest.inprocess import open_app
+from loadtest.recording import CallLog, current_log
+from loadtest.scenarios import OPERATIONS, Workload, parse_mix
+
+BULK_REGISTER_SIZE = 500
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.client_errors = 0
+        self.server_errors = 0
+        self.es_calls = 0
+        self.refreshes = 0
+
+
+class Session:
+    """Issues requests and records latency, status and ES calls per route."""
+
+    def __init__(self, client: httpx.AsyncClient, record_es: bool):
+        self.client = client
+        self.record_es = record_es
+        self.routes: dict[str, RouteStats] = defaultdict(RouteStats)
+        self.measuring = False
+
+    async def request(self, route: str, method: str, path: str, **kwargs) -> httpx.Response | None:
+        log = CallLog()
+        token = current_log.set(log)
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        finally:
+            elapsed = time.perf_counter() - started
+            current_log.reset(token)
+
+        if self.measuring:
+            stats = self.routes[route]
+            stats.latencies.append(elapsed)
+            if response is None or response.status_code >= 500:
+                stats.server_errors += 1
+            elif response.status_code >= 400:
+                stats.client_errors += 1
+            stats.es_calls += len(log)
+            stats.refreshes += log.refreshes
+        return response
+
+
+async def prepare(session: Session, workload: Workload, admin_token: str, users: int, forums: int, questions: int):
+    """Create the users, forums, questions and answers the operations target."""
+    for start in range(0, users, BULK_REGISTER_SIZE):
+        names = [workload.next_username() for _ in range(min(BULK_REGISTER_SIZE, users - start))]
+        response = await session.request(
+            "setup",
+            "POST",
+            "/auth/register/bulk",
+            headers={"X-Admin-Token": admin_token},
+            json={"usernames": names},
+        )
+        response.raise_for_status()
+        for result in response.json()["results"]:
+            if result["status"] == 201:
+                workload.add_user(result)
+
+    for n in range(forums):
+        response = await session.request(
+            "setup", "POST", "/forums", headers=workload.auth(), json={"name": f"loadtest-{workload.run_id}-{n}"}
+        )
+        response.raise_for_status()
+        workload.forums.append(response.json()["id"])
+
+    for _ in range(questions):
+        await OPERATIONS["post"](session, workload)
+        await OPERATIONS["answer"](session, workload)
+    if not workload.questions:
+        raise RuntimeError("setup could not create any questions")
+
+
+async def worker(session: Session, workload: Workload, weights: dict[str, float], deadline: float, budget: list[int]):
+    names, values = list(weights), list(weights.values())
+    while time.perf_counter() < deadline and budget[0] > 0:
+        budget[0] -= 1
+        operation = workload.rng.choices(names, values)[0]
+        await OPERATIONS[operation](session, workload)
+
+
+def report(session: Session, elapsed: float, background: CallLog | None):
+    requests = sum(len(stats.latencies) for stats in session.routes.values())
+    print(f"\n{requests} requests in {elapsed:.1f}s: {requests / elapsed:.0f} req/s\n")
+
+    header = f"{'route':<30} {'count':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'4xx':>5} {'5xx':>5}"
+    if session.record_es:
+        header += f" {'ES/req':>7} {'refresh/req':>11}"
+    print(header)
+
+    total_calls = 0
+    for route in sorted(session.routes):
+        stats = session.routes[route]
+        ordered = sorted(stats.latencies)
+        count = len(ordered)
+        line = (
+            f"{route:<30} {count:>6} {count / elapsed:>7.1f} "
+            f"{percentile(ordered, 50) * 1000:>8.1f} {percentile(ordered, 95) * 1000:>8.1f} "
+            f"{percentile(ordered, 99) * 1000:>8.1f} {stats.client_errors:>5} {stats.server_errors:>5}"
+        )
+        if session.record_es:
+            line += f" {stats.es_calls / count:>7.2f} {stats.refreshes / count:>11.2f}"
+        total_calls += stats.es_calls
+        print(line)
+
+    if session.record_es and requests:
+        print(f"\n{total_calls / requests:.2f} ES calls per request; {len(background)} more from background tasks")
+
+
+async def main(args):
+    weights = parse_mix(args.mix)
+    workload = Workload(run_id=uuid.uuid4().hex[:6], rng=random.Random(args.seed))
+    background = None
+    admin_token = args.admin_token
+
+    async with AsyncExitStack() as stack:
+        if args.target == "asgi":
+            admin_token = admin_token or uuid.uuid4().hex
+            os.environ["ADMIN_TOKEN"] = admin_token
+            client, recorder = await open_app(stack, args.backend, args.es_latency_ms / 1000, args.rate_limit)
+            background = recorder.background
+        else:
+            client = httpx.AsyncClient(base_url=args.target, timeout=60)
+            await stack.enter_async_context(client)
+
+        session = Session(client, record_es=args.target == "asgi")
+        print(f"Setting up {args.users} users, {args.forums} forums, {args.questions} questions...")
+        await prepare(session, workload, admin_token, args.users, args.forums, args.questions)
+
+        print(f"Running mix {args.mix!r} with {args.concurrency} workers...")
+        background_before = len(background) if background is not None else 0
+        session.measuring = True
+        started = time.perf_counter()
+        budget = [args.requests or math.inf]
+        await asyncio.gather(*(
+            worker(session, workload, weights, started + args.duration, budget) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+        if background is not None:
+            background.calls = background.calls[background_before:]
+        report(session, elapsed, background)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="asgi", help='"asgi" (in-process, default) or a base URL')
+    parser.add_argument("--backend", choices=["fake", "es"], default="fake", help="ES backend for --target asgi")
+    parser.add_argument("--es-latency-ms", type=float, default=0, help="simulated latency per ES call (asgi only)")
+    parser.add_argument("--mix", default="agents", help="named mix or weights like list=5,search=1")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many operations (0 = no limit)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--forums", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=50, help="questions (each with one answer) created in setup")
+    parser.add_argument("--rate-limit", action="store_true", help="turn the per-caller rate limiter on (asgi only)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable operation sequence")
+    parser.add_argument(
+        "--admin-token",
+        default=os.environ.get("ADMIN_TOKEN"),
+        help="the server's ADMIN_TOKEN, for bulk user setup (default: $ADMIN_TOKEN)",
+    )
+    args = parser.parse_args()
+    if args.target != "asgi" and not args.admin_token:
+        parser.error("--admin-token (or $ADMIN_TOKEN) is required with --target URL")
+    asyncio.run(main(args))
@@ -0,0 +1,150 @@
+"""
+The agent workload: operations, the shared state they draw targets from,
+and named mixes of operations.
+
+Each operation is an `async fn(session, workload)` that issues one API
+request through `session.request(route, method, path, ...)` (route is the
+label the report groups by) and records whatever it created so later
+operations can target it. Text comes from the seed corpus (seed.py).
+"""
+
+import random
+from dataclasses import dataclass, field
+
+from seed import QUESTIONS
+
+VOTES = ("up", "up", "up", "down", "none")
+
+
+@dataclass
+class Workload:
+    run_id: str
+    rng: random.Random
+    users: list[dict] = field(default_factory=list)
+    forums: list[str] = field(default_factory=list)
+    questions: list[str] = field(default_factory=list)
+    answers: list[str] = field(default_factory=list)
+    titles: list[str] = field(default_factory=list)
+    bodies: list[str] = field(default_factory=list)
+    registered: int = 0
+
+    def __post_init__(self):
+        for items in QUESTIONS.values():
+            for item in items:
+                self.titles.append(item["title"])
+                self.bodies.append(item["body"])
+                self.bodies += [answer["body"] for answer in item["answers"]]
+
+    def next_username(self) -> str:
+        self.registered += 1
+        return f"lt_{self.run_id}_{self.registered}"
+
+    def auth(self) -> dict:
+        return self.rng.choice(self.users)["headers"]
+
+    def add_user(self, response_json: dict) -> None:
+        self.users.append({
+            "id": response_json["user"]["id"],
+            "headers": {"Authorization": f"Bearer {response_json['api_key']}"},
+        })
+
+
+async def register(session, workload: Workload):
+    response = await session.request(
+        "POST /auth/register", "POST", "/auth/register", json={"username": workload.next_username()}
+    )
+    if response is not None and response.status_code == 201:
+        workload.add_user(response.json())
+
+
+async def post_question(session, workload: Workload):
+    response = await session.request(
+        "POST /questions",
+        "POST",
+        "/questions",
+        headers=workload.auth(),
+        json={
+            "forum_id": workload.rng.choice(workload.forums),
+            "title": workload.rng.choice(workload.titles),
+            "body": workload.rng.choice(workload.bodies),
+        },
+    )
+    if response is not None and response.status_code == 201:
+        workload.questions.append(response.json()["id"])
+
+
+async def post_answer(session, workload: Workload):
+    question_id = workload.rng.choice(workload.questions)
+    response = await session.request(
+        "POST /questions/{id}/answers",
+        "POST",
+        f"/questions/{question_id}/answers",
+        headers=workload.auth(),
+        json={"body": workload.rng.choice(workload.bodies)},
+    )
+    if response is not None and response.status_code == 201:
+        workload.answers.append(response.json()["id"])
+
+
+async def vote(session, workload: Workload):
+    if workload.answers and workload.rng.random() < 0.5:
+        route, path = "POST /answers/{id}/vote", f"/answers/{workload.rng.choice(workload.answers)}/vote"
+    else:
+        route, path = "POST /questions/{id}/vote", f"/questions/{workload.rng.choice(workload.questions)}/vote"
+    # Repeating a vote the user already cast is a 409 — part of real traffic
+    await session.request(route, "POST", path, headers=workload.auth(), json={"vote": workload.rng.choice(VOTES)})
+
+
+async def list_questions(session, workload: Workload):
+    params = {"sort": workload.rng.choice(["newest", "newest", "top"])}
+    if workload.rng.random() < 0.5:
+        params["forum_id"] = workload.rng.choice(workload.forums)
+    await session.request("GET /questions", "GET", "/questions", params=params)
+
+
+async def get_question(session, workload: Workload):
+    question_id = workload.rng.choice(workload.questions)
+    await session.request("GET /questions/{id}", "GET", f"/questions/{question_id}")
+    await session.request("GET /questions/{id}/answers", "GET", f"/questions/{question_id}/answers")
+
+
+async def search(session, workload: Workload):
+    words = workload.rng.choice(workload.titles).split()
+    query = " ".join(workload.rng.sample(words, min(len(words), 3)))
+    await session.request("GET /questions/search", "GET", "/questions/search", params={"q": query})
+
+
+OPERATIONS = {
+    "register": register,
+    "post": post_question,
+    "answer": post_answer,
+    "vote": vote,
+    "list": list_questions,
+    "read": get_question,
+    "search": search,
+}
+
+# Relative weights per operation
+MIXES = {
+    # Agents working the forum: mostly reading, some posting and voting
+    "agents": {"register": 1, "post": 8, "answer": 12, "vote": 20, "list": 25, "read": 20, "search": 14},
+    # Dashboard and lurker traffic
+    "browse": {"list": 45, "read": 35, "search": 15, "vote": 5},
+    # Write paths only: counters, reputation, refreshes
+    "writes": {"register": 5, "post": 30, "answer": 35, "vote": 30},
+    "search": {"search": 1},
+}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """A named mix, or explicit weights such as "list=5,search=1"."""
+    if spec in MIXES:
+        return MIXES[spec]
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation {name!r} (choose from {', '.join(OPERATIONS)})")
+        weights[name] = float(weight or 1)
+    return weights
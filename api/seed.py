@@ -64,7 +64,7 @@ def es_request(method, path, body=None):
 def cleanup():
     """Delete all documents from all indices to start fresh."""
     print("\n[0/6] Cleaning existing data...")
-    for index in ["votes", "answers", "questions", "forums", "users"]:
+    for index in ["votes", "answers", "questions", "forums", "users", "usernames"]:
         result = es_request("POST", f"/{index}/_delete_by_query?refresh=true", {"query": {"match_all": {}}})
         if result:
             deleted = result.get("deleted", 0)
@@ -377,13 +377,13 @@ def main():
 
     # ── 1. Register agents ───────────────────────────────────
     print("\n[1/6] Registering agents...")
-    for username in AGENTS:
-        result = api("POST", "/auth/register", {"username": username})
-        if result:
-            agent_keys[username] = result["api_key"]
-            print(f"  + {username}")
+    result = api("POST", "/auth/register/bulk", {"usernames": AGENTS})
+    for item in result["results"] if result else []:
+        if item["status"] == 201:
+            agent_keys[item["username"]] = item["api_key"]
+            print(f"  + {item['username']}")
         else:
-            print(f"  - {username} (may already exist)")
+            print(f"  - {item['username']} ({item['detail']})")
 
     if not agent_keys:
         print("\nERROR: No agents registered. Is the server running on localhost:8001?")
@@ -451,6 +451,7 @@ def main():
     # ── 5. Cast votes ────────────────────────────────────────
     print("\n[5/6] Casting votes...")
     vote_count = 0
+    votes_by_voter = {}
 
     for qid, forum_name, q_index in question_ids:
         q_data = QUESTIONS[forum_name][q_index]
@@ -459,18 +460,25 @@ def main():
         n = random.randint(2, min(7, len(voters)))
         for voter in random.sample(voters, n):
             vtype = "up" if random.random() < 0.85 else "down"
-            r = api("POST", f"/questions/{qid}/vote", {"vote": vtype}, api_key=agent_keys[voter])
-            if r:
-                vote_count += 1
+            votes_by_voter.setdefault(voter, []).append(
+                {"target_type": "question", "target_id": qid, "vote": vtype}
+            )
 
     for aid, qid in answer_ids:
         voters = list(agent_keys.keys())
         n = random.randint(1, min(5, len(voters)))
         for voter in random.sample(voters, n):
             vtype = "up" if random.random() < 0.80 else "down"
-            r = api("POST", f"/answers/{aid}/vote", {"vote": vtype}, api_key=agent_keys[voter])
+            votes_by_voter.setdefault(voter, []).append(
+                {"target_type": "answer", "target_id": aid, "vote": vtype}
+            )
+
+    # One /votes/batch call per voter (100 votes max per call)
+    for voter, votes in votes_by_voter.items():
+        for i in range(0, len(votes), 100):
+            r = api("POST", "/votes/batch", {"votes": votes[i:i + 100]}, api_key=agent_keys[voter])
             if r:
-                vote_count += 1
+                vote_count += sum(1 for item in r["results"] if item["status"] == 200)
 
     print(f"\n  -> {vote_count} votes cast")
 
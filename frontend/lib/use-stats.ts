@@ -42,10 +42,32 @@ export function useStats() {
   const [stats, setStats] = useState<PlatformStats | null>(null)
 
   useEffect(() => {
-    fetch("/api/stats")
-      .then((r) => r.json())
-      .then(setStats)
-      .catch(console.error)
+    if (typeof EventSource === "undefined") {
+      fetch("/api/stats")
+        .then((r) => r.json())
+        .then(setStats)
+        .catch(console.error)
+      return
+    }
+
+    // One stream per tab: a full snapshot first, then counter deltas as
+    // agents post and vote (EventSource reconnects on its own)
+    const source = new EventSource("/api/stats/stream")
+    source.addEventListener("snapshot", (e) => {
+      setStats(JSON.parse((e as MessageEvent).data))
+    })
+    source.addEventListener("delta", (e) => {
+      const deltas: Partial<PlatformStats> = JSON.parse((e as MessageEvent).data)
+      setStats((prev) => {
+        if (!prev) return prev
+        const next = { ...prev }
+        for (const [key, delta] of Object.entries(deltas)) {
+          next[key as keyof PlatformStats] += delta ?? 0
+        }
+        return next
+      })
+    })
+    return () => source.close()
   }, [])
 
   return stats
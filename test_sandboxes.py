@@ -253,17 +253,21 @@ def run_batch(batch, batch_num, sandbox_offset, api_key, force_success=False):
     print()
     print_sandbox_boxes(batch_results)
 
-    # Vote immediately
-    for r in batch_results:
-        vote_type = "up" if r.success else "down"
-        vote_resp = api("POST", f"/answers/{r.answer_id}/vote", {"vote": vote_type}, api_key=api_key)
+    # Vote immediately — one request for the whole batch
+    votes = [
+        {"target_type": "answer", "target_id": r.answer_id, "vote": "up" if r.success else "down"}
+        for r in batch_results
+    ]
+    vote_resp = api("POST", "/votes/batch", {"votes": votes}, api_key=api_key)
+    vote_results = vote_resp["results"] if vote_resp else [None] * len(batch_results)
+    for r, vote_result in zip(batch_results, vote_results):
         if r.success:
             icon = f"{GREEN}\u2713{RESET}"
             action = f"{GREEN}UPVOTED{RESET}"
         else:
             icon = f"{RED}\u2717{RESET}"
             action = f"{RED}DOWNVOTED{RESET}"
-        status = "applied" if vote_resp else "failed"
+        status = "applied" if vote_result and vote_result["status"] == 200 else "failed"
         print(f"    {icon}  Sandbox #{r.sandbox_id}  {action}  {r.answer_author}'s answer ({status})")
 
     has_success = any(r.success for r in batch_results)